@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for parse_marimo_notebook.
+
+Generates marimo files with an increasing number of cells and prints the
+parse time and the time per cell. A flat per-cell column means parsing is
+linear in the number of cells.
+
+Usage:
+    python benchmarks/bench_parse_marimo.py [max_cells]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from generate import make_marimo_source  # noqa: E402
+from marimo_to_jupyter import parse_marimo_notebook  # noqa: E402
+
+
+def bench(n_cells: int, repeat: int = 3) -> float:
+    """Return the best parse time in seconds over repeat runs."""
+    source = make_marimo_source(n_cells)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cells = parse_marimo_notebook(source)
+        best = min(best, time.perf_counter() - start)
+    assert len(cells) == n_cells
+    return best
+
+
+def main():
+    max_cells = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    sizes = []
+    n = 1250
+    while n <= max_cells:
+        sizes.append(n)
+        n *= 2
+    if not sizes or sizes[-1] != max_cells:
+        sizes.append(max_cells)
+
+    print(f"{'cells':>8}  {'seconds':>9}  {'us/cell':>8}")
+    for n_cells in sizes:
+        elapsed = bench(n_cells)
+        print(f"{n_cells:>8}  {elapsed:>9.4f}  {elapsed / n_cells * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
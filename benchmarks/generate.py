@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Synthetic notebook generator for benchmarks.
+
+Usage:
+    python benchmarks/generate.py output.ipynb [--cells N] [--lines N]
+        [--output-bytes N] [--markdown-ratio R] [--seed N]
+"""
+
+import argparse
+import base64
+import json
+import random
+from typing import Any, Dict
+
+
+def make_code_source(index: int, lines: int) -> list:
+    """Source lines for a code cell that defines and uses a few names."""
+    source = [f"import math as m{index}\n"] if index % 10 == 0 else []
+    previous = f"v{index - 1}" if index else "0"
+    for j in range(lines - 1):
+        source.append(f"t{index}_{j} = [k * {j} for k in range(10)]\n")
+    source.append(f"v{index} = {previous} + {index}")
+    return source
+
+
+def make_markdown_source(index: int, lines: int) -> list:
+    """Source lines for a markdown cell."""
+    source = [f"## Section {index}\n"]
+    for j in range(lines - 1):
+        source.append(f"Some *explanatory* text, line {j}, with `code` and a [link](https://example.com/{index}).\n")
+    return source
+
+
+def make_output(size: int, rng: random.Random) -> list:
+    """A display_data output carrying roughly size bytes of base64 PNG data."""
+    if size <= 0:
+        return []
+    payload = base64.b64encode(rng.randbytes(size * 3 // 4)).decode('ascii')
+    return [{
+        "output_type": "display_data",
+        "data": {"image/png": payload, "text/plain": ["<Figure>"]},
+        "metadata": {},
+    }]
+
+
+def make_notebook(cells: int = 100, lines: int = 5, output_bytes: int = 0,
+                  markdown_ratio: float = 0.2, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build an nbformat 4 notebook.
+
+    Every code cell carries an output of output_bytes bytes, and roughly
+    markdown_ratio of the cells are markdown. The result is deterministic
+    for a given seed.
+    """
+    rng = random.Random(seed)
+    notebook_cells = []
+    for i in range(cells):
+        cell_id = f"{i:08x}-0000-4000-8000-{rng.getrandbits(48):012x}"
+        if rng.random() < markdown_ratio:
+            notebook_cells.append({
+                "cell_type": "markdown",
+                "id": cell_id,
+                "metadata": {},
+                "source": make_markdown_source(i, lines),
+            })
+        else:
+            notebook_cells.append({
+                "cell_type": "code",
+                "execution_count": i + 1,
+                "id": cell_id,
+                "metadata": {},
+                "outputs": make_output(output_bytes, rng),
+                "source": make_code_source(i, lines),
+            })
+    return {
+        "cells": notebook_cells,
+        "metadata": {
+            "kernelspec": {"display_name": "Python 3", "language": "python", "name": "python3"},
+            "language_info": {"name": "python"},
+        },
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+
+
+def make_marimo_source(cells: int, lines: int = 5) -> str:
+    """Build a marimo notebook with the given number of code cells."""
+    parts = ['import marimo', '', 'app = marimo.App()', '']
+    for i in range(cells):
+        parts.append('@app.cell')
+        parts.append(f'def _(x{i - 1 if i else 0}):')
+        for j in range(lines):
+            parts.append(f'    x{i}_{j} = [k * {j} for k in range(10)]')
+        parts.append(f'    x{i} = x{i}_0')
+        parts.append(f'    return (x{i},)')
+        parts.append('')
+    parts.extend(['', 'if __name__ == "__main__":', '    app.run()', ''])
+    return '\n'.join(parts)
+
+
+def write_notebook(path: str, **params) -> None:
+    """Generate a notebook with make_notebook(**params) and write it to path."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(make_notebook(**params), f, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Jupyter notebook.")
+    parser.add_argument('output', help="Path of the .ipynb file to write.")
+    parser.add_argument('--cells', type=int, default=100)
+    parser.add_argument('--lines', type=int, default=5, help="Lines per cell.")
+    parser.add_argument('--output-bytes', type=int, default=0, help="Output payload per code cell.")
+    parser.add_argument('--markdown-ratio', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    write_notebook(args.output, cells=args.cells, lines=args.lines,
+                   output_bytes=args.output_bytes,
+                   markdown_ratio=args.markdown_ratio, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the converters and the tidy_nb CLI.
+
+Generates a synthetic notebook (and its marimo counterpart), then times
+and memory-profiles convert_jupyter_to_marimo, convert_marimo_to_jupyter,
+analyze_notebook and an end-to-end CLI run. Results are written as JSON;
+pass a stored result with --baseline to fail on regressions.
+
+Usage:
+    python benchmarks/run.py [--cells N] [--lines N] [--output-bytes N]
+        [--markdown-ratio R] [--repeat N] [--save results.json]
+        [--baseline baseline.json] [--threshold 0.25]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from generate import make_marimo_source, write_notebook  # noqa: E402
+from jupyter_to_marimo import analyze_cell, analyze_notebook, convert_jupyter_to_marimo  # noqa: E402
+from marimo_to_jupyter import convert_marimo_to_jupyter  # noqa: E402
+
+# Metrics compared against a baseline; larger is worse for all of them.
+METRICS = ('seconds', 'peak_bytes')
+
+
+def _quiet(func: Callable[[], Any]) -> Any:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func()
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Best wall time over repeat runs, then one traced run for peak memory.
+
+    The cell-analysis cache is cleared before every run so each one does
+    the full amount of work.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        analyze_cell.cache_clear()
+        start = time.perf_counter()
+        _quiet(func)
+        best = min(best, time.perf_counter() - start)
+
+    analyze_cell.cache_clear()
+    tracemalloc.start()
+    try:
+        _quiet(func)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def measure_cli(args: list, repeat: int) -> Dict[str, float]:
+    """Best wall time and peak RSS of the CLI run in a fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT / 'src'))
+    best = float('inf')
+    peak = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'tidy_nb', *args],
+            env=env, stdout=subprocess.DEVNULL,
+        )
+        # wait4 gives the resource usage of this child alone
+        _, status, usage = os.wait4(proc.pid, 0)
+        elapsed = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            raise RuntimeError(f"CLI exited with status {proc.returncode}")
+        best = min(best, elapsed)
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        peak = max(peak, usage.ru_maxrss * scale)
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+def run_suite(params: Dict[str, Any], repeat: int) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark on a notebook generated from params."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        notebook = tmp / 'bench.ipynb'
+        write_notebook(str(notebook), **params)
+        marimo = tmp / 'bench_marimo.py'
+        marimo.write_text(make_marimo_source(params['cells'], params['lines']))
+
+        results['jupyter_to_marimo'] = measure(
+            lambda: convert_jupyter_to_marimo(str(notebook), str(tmp / 'out.py')), repeat)
+        results['marimo_to_jupyter'] = measure(
+            lambda: convert_marimo_to_jupyter(str(marimo), str(tmp / 'out.ipynb')), repeat)
+        results['analyze_notebook'] = measure(
+            lambda: analyze_notebook(str(notebook)), repeat)
+        results['cli'] = measure_cli([str(notebook), '--no-cache', '--jobs', '1'], repeat)
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> list:
+    """Return a description of every metric that regressed past threshold."""
+    regressions = []
+    for name, metrics in results['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append(f"{name}.{metric}: {old:.4g} -> {new:.4g} (+{change:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tidy-nb conversions.")
+    parser.add_argument('--cells', type=int, default=500)
+    parser.add_argument('--lines', type=int, default=5, help="Lines per cell.")
+    parser.add_argument('--output-bytes', type=int, default=20_000, help="Output payload per code cell.")
+    parser.add_argument('--markdown-ratio', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help="Write results as JSON to this path.")
+    parser.add_argument('--baseline', help="Compare against results stored by --save.")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed relative slowdown or memory growth (default: 0.25).")
+    args = parser.parse_args()
+
+    params = {
+        'cells': args.cells,
+        'lines': args.lines,
+        'output_bytes': args.output_bytes,
+        'markdown_ratio': args.markdown_ratio,
+    }
+    results = {
+        'params': params,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run_suite(params, args.repeat),
+    }
+
+    print(f"{'benchmark':<20} {'seconds':>9} {'peak MB':>9}")
+    for name, metrics in results['results'].items():
+        print(f"{name:<20} {metrics['seconds']:>9.4f} {metrics['peak_bytes'] / 1e6:>9.1f}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('params') != params:
+            print("Warning: baseline was recorded with different parameters.")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions above {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions above {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,28 @@
 Convert Jupyter notebook (.ipynb) to marimo notebook (.py) format.
 
 Usage:
-    python jupyter_to_marimo.py input.ipynb output.py
+    python jupyter_to_marimo.py [--dataflow] [--cells A:B] [--profile TRACE] [--blob-store DIR] input.ipynb output.py
+    python jupyter_to_marimo.py --analyze [--cells A:B] input.ipynb
 """
 
-import json
+import ast
 import re
 import sys
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Any, Set
+from typing import (TYPE_CHECKING, List, Dict, Any, BinaryIO, FrozenSet, Iterable, Iterator,
+                    Optional, Set, TextIO, Tuple)
+
+from tidy_nb.dataflow import DataflowGraph
+from tidy_nb.profile import NULL_PROFILER
+from tidy_nb.reader import SKIPPED_KEYS, NotebookFormatError, iter_cells, iter_stream_cells
+from tidy_nb.writers import LineWriter, atomic_output
+
+if TYPE_CHECKING:
+    from tidy_nb.blobs import BlobStore
+    from tidy_nb.cache import ConversionCache
+    from tidy_nb.profile import Profiler
 
 
 def sanitize_function_name(name: str) -> str:
@@ -26,86 +40,354 @@ def sanitize_function_name(name: str) -> str:
     return name
 
 
-def extract_variables(code: str) -> Set[str]:
+# Lines written before the first cell and after the last one.
+MARIMO_HEADER = [
+    "import marimo",
+    "",
+    "__generated_with = \"0.8.0\"",
+    "app = marimo.App(width=\"medium\")",
+    "",
+]
+MARIMO_FOOTER = [
+    "",
+    "if __name__ == \"__main__\":",
+    "    app.run()",
+]
+
+# Cell that makes mo available to the markdown cells, written after the
+# header when the notebook has any.
+MO_IMPORT_CELL = [
+    "@app.cell",
+    "def imports():",
+    "    import marimo as mo",
+    "    return mo,",
+    "",
+]
+
+# Keys the reader skips when only the cell types are needed.
+TYPE_ONLY_SKIP = SKIPPED_KEYS | {'source', 'metadata', 'id'}
+
+
+# Names that are treated as scratch variables and never returned from a cell.
+TEMP_PATTERNS = frozenset({'_', 'temp', 'tmp', 'i', 'j', 'k', 'idx', 'index'})
+
+
+class CellAnalysis:
     """
-    Extract variable names that are assigned in the code.
-    This helps determine what should be returned from the cell.
+    Everything the converter needs to know about a code cell, gathered
+    from a single parse and a single pass over its AST.
+
+    Attributes:
+        definitions: names bound by assignment (plain, annotated or augmented).
+        imports: names bound by import statements.
+        references: names that are read somewhere in the cell.
+        temporaries: definitions treated as scratch values (``tmp``, ``_x``...).
+        bound: names bound at the cell's top level by any statement
+            (assignment, import, def, class, loop target...).
+        free: names the cell reads but does not bind itself, or reads
+            before it first binds them (``df = df.dropna()``, ``x += 1``),
+            so they must come from other cells (or builtins). Names local
+            to functions, lambdas, classes and comprehensions inside the
+            cell are excluded.
+        valid: False when the cell could not be parsed.
+    """
+
+    __slots__ = ('definitions', 'imports', 'references', 'temporaries',
+                 'bound', 'free', 'valid')
+
+    def __init__(self, definitions: FrozenSet[str], imports: FrozenSet[str],
+                 references: FrozenSet[str], valid: bool = True,
+                 bound: FrozenSet[str] = frozenset(),
+                 free: FrozenSet[str] = frozenset()):
+        self.definitions = definitions
+        self.imports = imports
+        self.references = references
+        self.bound = bound
+        self.free = free
+        self.temporaries = frozenset(
+            name for name in definitions
+            if name in TEMP_PATTERNS or name.startswith('_')
+        )
+        self.valid = valid
+
+    @property
+    def return_variables(self) -> List[str]:
+        """Sorted names that the marimo cell should return."""
+        return sorted(
+            var for var in self.definitions
+            if var not in self.imports and
+            var not in self.temporaries and
+            not var.isupper()  # Skip constants
+        )
+
+    def __repr__(self) -> str:
+        return (f"CellAnalysis(definitions={sorted(self.definitions)}, "
+                f"imports={sorted(self.imports)}, "
+                f"references={sorted(self.references)}, "
+                f"bound={sorted(self.bound)}, free={sorted(self.free)}, "
+                f"valid={self.valid})")
+
+
+class _CellVisitor(ast.NodeVisitor):
+    """
+    Collect definitions, imports and references in one traversal.
+
+    Alongside, a stack of (loads, stores) scopes tracks which names are
+    bound at the cell's top level and which are read without being bound
+    in any enclosing scope; the module scope is always at the bottom.
+    Statements are visited in the order Python evaluates them, so a name
+    the top level reads before it first binds it, as in ``df = df.dropna()``
+    or ``x += 1``, is free too.
+    """
+
+    def __init__(self):
+        self.definitions: Set[str] = set()
+        self.imports: Set[str] = set()
+        self.references: Set[str] = set()
+        self._scopes: List[Tuple[Set[str], Set[str]]] = [(set(), set())]
+        self._read_first: Set[str] = set()
+
+    @property
+    def bound(self) -> Set[str]:
+        return self._scopes[0][1]
+
+    @property
+    def free(self) -> Set[str]:
+        loads, stores = self._scopes[0]
+        return (loads - stores) | self._read_first
+
+    def _bind(self, name: str) -> None:
+        self._scopes[-1][1].add(name)
+
+    def _load(self, name: str) -> None:
+        loads, stores = self._scopes[-1]
+        loads.add(name)
+        if len(self._scopes) == 1 and name not in stores:
+            self._read_first.add(name)
+
+    def _visit_scope(self, params: Iterable[str], body: Iterable[ast.AST],
+                     deferred: bool = False) -> None:
+        """
+        Visit body in a new scope; its unbound reads pass to the parent,
+        as reads made now unless the body is deferred (a function's).
+        """
+        self._scopes.append((set(), set(params)))
+        for node in body:
+            self.visit(node)
+        loads, stores = self._scopes.pop()
+        if deferred:
+            self._scopes[-1][0].update(loads - stores)
+        else:
+            for name in loads - stores:
+                self._load(name)
+
+    def _add_target(self, target: ast.expr) -> None:
+        if isinstance(target, ast.Name):
+            self.definitions.add(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                if isinstance(elt, ast.Name):
+                    self.definitions.add(elt.id)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        for target in node.targets:
+            self._add_target(target)
+        # The value is evaluated before the targets are bound
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        if isinstance(node.target, ast.Name):
+            self.definitions.add(node.target.id)
+        self.visit(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        if isinstance(node.target, ast.Name):
+            self.definitions.add(node.target.id)
+            # x += 1 reads x as well as writing it
+            self.references.add(node.target.id)
+            self._load(node.target.id)
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr) -> None:
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_For(self, node: ast.For) -> None:
+        self.visit(node.iter)
+        self.visit(node.target)
+        for child in node.body + node.orelse:
+            self.visit(child)
+
+    visit_AsyncFor = visit_For
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            name = alias.asname if alias.asname else alias.name
+            self.imports.add(name.split('.')[0])  # Get the top-level module
+            self._bind(name.split('.')[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        for alias in node.names:
+            name = alias.asname if alias.asname else alias.name
+            if name != '*':
+                self.imports.add(name)
+                self._bind(name)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self.references.add(node.id)
+            self._load(node.id)
+        elif isinstance(node.ctx, ast.Store):
+            self._bind(node.id)
+        else:  # del x needs x to exist
+            self._load(node.id)
+
+    def _visit_function(self, node, body: Iterable[ast.AST]) -> None:
+        # Decorators, defaults and annotations are evaluated outside the
+        # function; parameters are local to it.
+        for decorator in getattr(node, 'decorator_list', ()):
+            self.visit(decorator)
+        self.visit(node.args)
+        if getattr(node, 'returns', None) is not None:
+            self.visit(node.returns)
+        args = node.args
+        params = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+        params.extend(a.arg for a in (args.vararg, args.kwarg) if a is not None)
+        self._visit_scope(params, body, deferred=True)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._bind(node.name)
+        self._visit_function(node, node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        self._visit_function(node, [node.body])
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._bind(node.name)
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self._visit_scope((), node.body)
+
+    def _visit_comprehension(self, node, *parts: ast.AST) -> None:
+        self._visit_scope((), [*node.generators, *parts])
+
+    def visit_ListComp(self, node: ast.ListComp) -> None:
+        self._visit_comprehension(node, node.elt)
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node: ast.DictComp) -> None:
+        self._visit_comprehension(node, node.key, node.value)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node) -> None:
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    visit_MatchStar = visit_MatchAs
+
+
+@lru_cache(maxsize=4096)
+def analyze_cell(code: str) -> CellAnalysis:
+    """
+    Parse a code cell once and return its CellAnalysis.
+
+    Results are cached by source text, so repeated lookups for the same
+    cell (return variables, notebook analysis, later passes) are free.
     """
-    import ast
-    
-    variables = set()
     try:
         tree = ast.parse(code)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        variables.add(target.id)
-                    elif isinstance(target, ast.Tuple) or isinstance(target, ast.List):
-                        for elt in target.elts:
-                            if isinstance(elt, ast.Name):
-                                variables.add(elt.id)
-            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
-                variables.add(node.target.id)
-            elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
-                variables.add(node.target.id)
     except SyntaxError:
-        pass
-    
-    return variables
+        return CellAnalysis(frozenset(), frozenset(), frozenset(), valid=False)
+
+    visitor = _CellVisitor()
+    visitor.visit(tree)
+    return CellAnalysis(
+        frozenset(visitor.definitions),
+        frozenset(visitor.imports),
+        frozenset(visitor.references),
+        bound=frozenset(visitor.bound),
+        free=frozenset(visitor.free),
+    )
+
+
+def extract_variables(code: str) -> Set[str]:
+    """
+    Extract variable names that are assigned in the code.
+    This helps determine what should be returned from the cell.
+    """
+    return set(analyze_cell(code).definitions)
 
 
 def detect_imports(code: str) -> Set[str]:
     """Detect import statements and imported names."""
-    import ast
-    
-    imports = set()
-    try:
-        tree = ast.parse(code)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    name = alias.asname if alias.asname else alias.name
-                    imports.add(name.split('.')[0])  # Get the top-level module
-            elif isinstance(node, ast.ImportFrom):
-                for alias in node.names:
-                    name = alias.asname if alias.asname else alias.name
-                    if name != '*':
-                        imports.add(name)
-    except SyntaxError:
-        pass
-    
-    return imports
+    return set(analyze_cell(code).imports)
 
 
 def determine_return_variables(code: str, cell_index: int) -> List[str]:
     """
     Determine what variables should be returned from a marimo cell.
     """
-    variables = extract_variables(code)
-    imports = detect_imports(code)
-    
-    # Filter out common temporary variables and imports
-    filtered_vars = []
-    temp_patterns = {'_', 'temp', 'tmp', 'i', 'j', 'k', 'idx', 'index'}
-    
-    for var in variables:
-        if (var not in imports and 
-            var not in temp_patterns and 
-            not var.startswith('_') and
-            not var.isupper()):  # Skip constants
-            filtered_vars.append(var)
+    return analyze_cell(code).return_variables
+
+
+def _code_text(source: Any) -> str:
+    """A code cell's text: a source string as is, a list of lines joined."""
+    return source if isinstance(source, str) else '\n'.join(source)
+
+
+def build_dataflow_graph(cells: Iterable[Dict[str, Any]],
+                         profiler: Optional["Profiler"] = None) -> DataflowGraph:
+    """
+    Build the dependency graph between the code cells of a notebook.
     
-    # Sort for consistency
-    return sorted(filtered_vars)
+    Cells are numbered by their position among the code cells, the same
+    numbering process_code_cell uses for cell_N. Whether any cell is
+    markdown is recorded on the graph, so writing needs no extra pass.
+    """
+    span = (profiler or NULL_PROFILER).span
+    markdown = False
+    
+    def analyses():
+        nonlocal markdown
+        for cell in cells:
+            cell_type = cell.get('cell_type', 'code')
+            if cell_type == 'code':
+                with span('analyze'):
+                    analysis = analyze_cell(_code_text(cell.get('source', [])).strip())
+                yield analysis
+            elif cell_type == 'markdown':
+                markdown = True
+    
+    graph = DataflowGraph(analyses())
+    graph.has_markdown = markdown
+    return graph
 
 
-def process_code_cell(source: List[str], cell_index: int) -> str:
+def process_code_cell(source: List[str], cell_index: int,
+                      graph: Optional[DataflowGraph] = None) -> str:
     """
     Convert a Jupyter code cell to a marimo cell function.
+    
+    With a graph, the function takes the names the cell reads from other
+    cells as parameters and returns the names other cells read from it.
+    Without one, it takes no parameters and returns what the cell defines.
     """
     # Join source lines
-    code = '\n'.join(source).strip()
+    code = _code_text(source).strip()
     
     if not code:
         return ""
@@ -113,12 +395,17 @@ def process_code_cell(source: List[str], cell_index: int) -> str:
     # Generate function name
     func_name = f"cell_{cell_index + 1}"
     
-    # Determine return variables
-    return_vars = determine_return_variables(code, cell_index)
+    # Determine parameters and return variables
+    if graph is not None:
+        params = ', '.join(graph.params(cell_index))
+        return_vars = graph.returns(cell_index)
+    else:
+        params = ''
+        return_vars = determine_return_variables(code, cell_index)
     
     # Create the marimo cell
     lines = ["@app.cell"]
-    lines.append(f"def {func_name}():")
+    lines.append(f"def {func_name}({params}):")
     
     # Indent the code
     for line in code.split('\n'):
@@ -140,9 +427,11 @@ def process_code_cell(source: List[str], cell_index: int) -> str:
     return '\n'.join(lines)
 
 
-def process_markdown_cell(source: List[str]) -> str:
+def process_markdown_cell(source: List[str], dataflow: bool = False) -> str:
     """
     Convert a Jupyter markdown cell to a marimo markdown cell.
+    
+    With dataflow, the cell takes mo as a parameter.
     """
     # Join source lines
     content = ''.join(source).strip()
@@ -154,7 +443,7 @@ def process_markdown_cell(source: List[str]) -> str:
     content = content.replace('"""', '\\"\\"\\"')
     
     lines = ["@app.cell"]
-    lines.append("def markdown_cell():")
+    lines.append("def markdown_cell(mo):" if dataflow else "def markdown_cell():")
     lines.append("    mo.md(")
     lines.append("        r\"\"\"")
     
@@ -169,95 +458,287 @@ def process_markdown_cell(source: List[str]) -> str:
     return '\n'.join(lines)
 
 
-def convert_jupyter_to_marimo(input_path: str, output_path: str) -> None:
+def _render_cell_cached(cell_type: str, source: List[str], code_index: int,
+                        cache: "ConversionCache") -> str:
+    """
+    Render a cell through the conversion cache.
+
+    Code cells are cached under their source alone, rendered as cell_1, and
+    renamed on the way out so inserting a cell does not invalidate the
+    cells after it.
+    """
+    if cell_type == 'code':
+        key = cache.cell_key('code', _code_text(source))
+        content = cache.get(key)
+        if content is None:
+            content = process_code_cell(source, 0)
+            cache.put(key, content)
+        if content and code_index:
+            # The function header is always the first "def" in the block
+            content = content.replace("def cell_1():", f"def cell_{code_index + 1}():", 1)
+        return content
+    
+    key = cache.cell_key('markdown', ''.join(source))
+    content = cache.get(key)
+    if content is None:
+        content = process_markdown_cell(source)
+        cache.put(key, content)
+    return content
+
+
+class MarimoWriter:
+    """
+    Render Jupyter cells as a marimo notebook, writing each cell to stream
+    as soon as it is rendered.
+    
+    graph, from build_dataflow_graph over the same cells, gives every cell
+    its parameters and returns. Cells rendered that way depend on their
+    neighbours, so they bypass the per-cell cache. With a blob store, code
+    cell outputs are saved there and each cell keeps a reference to them.
+    A profiler records time and allocations per cell and per phase.
+    
+    markdown tells the writer up front that markdown cells will follow, so
+    the cell importing mo goes right after the header. If a markdown cell
+    comes without it, the import is written just before that cell.
+    """
+    
+    def __init__(self, stream: TextIO,
+                 cache: Optional["ConversionCache"] = None,
+                 graph: Optional[DataflowGraph] = None,
+                 profiler: Optional["Profiler"] = None,
+                 blobs: Optional["BlobStore"] = None,
+                 markdown: bool = False):
+        self.cache = cache
+        self.graph = graph
+        self.blobs = blobs
+        self.span = (profiler or NULL_PROFILER).span
+        # Analysis is timed on its own only when rendering would otherwise do it
+        self.time_analysis = (profiler or NULL_PROFILER).enabled and cache is None and graph is None
+        self.writer = LineWriter(stream)
+        self.has_markdown = False
+        self.code_cell_count = 0
+        self.total_cells = 0
+        
+        # Add marimo imports and app initialization
+        self.writer.write_lines(MARIMO_HEADER)
+        self.mo_imported = markdown
+        if markdown:
+            self.writer.write_lines(MO_IMPORT_CELL)
+    
+    def write_cell(self, cell: Dict[str, Any]) -> None:
+        """Render one Jupyter cell (a dict or a Cell) and write it."""
+        writer = self.writer
+        span = self.span
+        graph = self.graph
+        cache = self.cache
+        self.total_cells += 1
+        cell_type = cell.get('cell_type', 'code')
+        source = cell.get('source', [])
+        
+        if cell_type == 'code':
+            self.code_cell_count += 1
+        elif cell_type == 'markdown':
+            self.has_markdown = True
+            if not self.mo_imported:
+                self.mo_imported = True
+                writer.write_lines(MO_IMPORT_CELL)
+        else:
+            return
+        code_index = self.code_cell_count - 1
+        
+        with span('cell', 'cell', index=self.total_cells - 1, type=cell_type):
+            if self.time_analysis and cell_type == 'code':
+                with span('analyze'):
+                    analyze_cell(_code_text(source).strip())
+            
+            with span('render'):
+                if graph is not None:
+                    if cell_type == 'code':
+                        cell_content = process_code_cell(source, code_index, graph)
+                    else:
+                        cell_content = process_markdown_cell(source, dataflow=True)
+                elif cache is not None:
+                    cell_content = _render_cell_cached(cell_type, source, code_index, cache)
+                elif cell_type == 'code':
+                    cell_content = process_code_cell(source, code_index)
+                else:
+                    cell_content = process_markdown_cell(source)
+            
+            if cell_content:
+                with span('write'):
+                    if self.blobs is not None and cell_type == 'code':
+                        reference = self.blobs.outputs_reference(
+                            cell.get('outputs') or [], cell.get('execution_count'))
+                        if reference:
+                            writer.write(reference)
+                    writer.write(cell_content)
+                    writer.write("")
+    
+    def close(self, metadata: Optional[Dict[str, Any]] = None) -> Tuple[int, int, bool]:
+        """
+        Write the end of the notebook. With a blob store, widget state in
+        the notebook metadata is saved there.
+        
+        Returns the number of cells read, the number of code cells, and
+        whether any markdown cells were found.
+        """
+        with self.span('write'):
+            if self.blobs is not None and metadata and metadata.get('widgets'):
+                self.writer.write(self.blobs.widgets_reference(metadata['widgets']))
+            # Add the main execution block
+            self.writer.write_lines(MARIMO_FOOTER)
+        return self.total_cells, self.code_cell_count, self.has_markdown
+
+
+def has_markdown_cells(cells: Iterable[Dict[str, Any]]) -> bool:
+    """Whether any of the cells is a markdown cell."""
+    return any(cell.get('cell_type') == 'markdown' for cell in cells)
+
+
+def stream_has_markdown(stream: BinaryIO) -> bool:
+    """
+    Whether the notebook read from a binary stream has a markdown cell.
+    Only cell types are decoded, and reading stops at the first markdown
+    cell; the caller seeks the stream back for the real pass.
+    """
+    return has_markdown_cells(iter_stream_cells(stream, TYPE_ONLY_SKIP))
+
+
+def write_marimo_notebook(cells: Iterable[Dict[str, Any]], stream: TextIO,
+                          cache: Optional["ConversionCache"] = None,
+                          graph: Optional[DataflowGraph] = None,
+                          profiler: Optional["Profiler"] = None,
+                          blobs: Optional["BlobStore"] = None,
+                          fields: Optional[Dict[str, Any]] = None,
+                          markdown: Optional[bool] = None) -> Tuple[int, int, bool]:
+    """
+    Render Jupyter cells as a marimo notebook with a MarimoWriter.
+    
+    fields holds the notebook's top-level keys, filled in by the reader
+    while cells are read; its metadata is passed on to the writer.
+    markdown says whether any cell is markdown. If it is not given, it is
+    taken from the graph, or worked out from cells unless they are a
+    one-shot iterator, which the caller should check with
+    stream_has_markdown.
+    Returns the number of cells read, the number of code cells, and
+    whether any markdown cells were found.
+    """
+    if markdown is None and graph is not None:
+        markdown = graph.has_markdown
+    elif markdown is None:
+        markdown = not isinstance(cells, Iterator) and has_markdown_cells(cells)
+    writer = MarimoWriter(stream, cache, graph, profiler, blobs, markdown)
+    for cell in (profiler or NULL_PROFILER).cells(cells):
+        writer.write_cell(cell)
+    return writer.close((fields or {}).get('metadata'))
+
+
+def convert_jupyter_to_marimo(input_path: str, output_path: str,
+                              cache: Optional["ConversionCache"] = None,
+                              dataflow: bool = False,
+                              cells: Optional[slice] = None,
+                              profiler: Optional["Profiler"] = None,
+                              blobs: Optional["BlobStore"] = None) -> bool:
     """
     Convert a Jupyter notebook to marimo format.
+    Returns True on success; errors are printed and return False.
+    
+    With a cache, an input whose bytes were converted before is not read
+    again, and only cells whose source changed are re-rendered. With
+    dataflow, the input is read twice: once to build the dependency graph
+    between cells, then to write cells with real parameters and returns.
+    With cells, a slice of cell numbers, only that range is converted; it
+    is read through the notebook's cell offset index, so the rest of the
+    file is never parsed. With a blob store, outputs are moved into it
+    instead of being dropped. A profiler records where the time goes.
     """
     input_file = Path(input_path)
     output_file = Path(output_path)
     
     if not input_file.exists():
         print(f"Error: Input file '{input_path}' not found.")
-        return
-    
-    # Read the Jupyter notebook
+        return False
+    
+    file_key = None
+    if cache is not None:
+        options = {}
+        if dataflow:
+            options['dataflow'] = True
+        if cells is not None:
+            options['cells'] = [cells.start, cells.stop]
+        if blobs is not None:
+            options['blobs'] = str(blobs.directory)
+        file_key = cache.file_key(input_file, 'jupyter_to_marimo', options)
+        cached = cache.get(file_key)
+        if cached is not None:
+            from tidy_nb.writers import write_if_changed
+            try:
+                write_if_changed(output_file, cached)
+            except Exception as e:
+                print(f"Error writing output file: {e}")
+                return False
+            cache.commit()
+            print(f"Unchanged '{input_path}', reused cached conversion.")
+            return True
+    
+    # Stream the cells: each one is rendered as it is read and written
+    # straight to the output, so memory grows with the largest cell rather
+    # than the whole notebook. Outputs and attachments are skipped by the
+    # reader without being decoded. A cell range is read through the
+    # offset index instead, which opens the file itself.
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            notebook = json.load(f)
+        input_stream = open(input_file, 'rb') if cells is None else nullcontext()
     except Exception as e:
         print(f"Error reading input file: {e}")
-        return
+        return False
     
-    # Validate notebook format
-    if 'cells' not in notebook:
-        print("Error: Invalid Jupyter notebook format (no 'cells' key found).")
-        return
+    profiler = profiler or NULL_PROFILER
+    # Outputs are only decoded when they have somewhere to go
+    skip = SKIPPED_KEYS if blobs is None else SKIPPED_KEYS - {'outputs'}
+    fields: Dict[str, Any] = {}
     
-    # Generate marimo code
-    marimo_lines = []
+    def read_cells(skip=SKIPPED_KEYS):
+        if cells is None:
+            input_stream.seek(0)
+            return iter_stream_cells(profiler.stream(input_stream), skip, fields=fields)
+        from tidy_nb.index import iter_cell_range
+        return (cell for _, cell in iter_cell_range(input_file, cells, skip, fields=fields))
     
-    # Add marimo imports and app initialization
-    marimo_lines.extend([
-        "import marimo",
-        "",
-        "__generated_with = \"0.8.0\"",
-        "app = marimo.App(width=\"medium\")",
-        "",
-    ])
+    try:
+        with input_stream, atomic_output(output_file) as f:
+            if dataflow:
+                graph = build_dataflow_graph(profiler.cells(read_cells()), profiler)
+                markdown = graph.has_markdown
+            else:
+                graph = None
+                markdown = has_markdown_cells(profiler.cells(read_cells(TYPE_ONLY_SKIP)))
+            total_cells, code_cell_count, has_markdown = write_marimo_notebook(
+                read_cells(skip), f, cache, graph, profiler, blobs, fields, markdown)
+    except NotebookFormatError as e:
+        print(f"Error: {e}")
+        return False
+    except Exception as e:
+        print(f"Error converting notebook: {e}")
+        return False
     
-    # Track if we need to import mo for markdown cells
-    has_markdown = any(cell.get('cell_type') == 'markdown' for cell in notebook['cells'])
-    if has_markdown:
-        marimo_lines.extend([
-            "@app.cell",
-            "def imports():",
-            "    import marimo as mo",
-            "    return mo,",
-            "",
-        ])
-    
-    # Process each cell
-    code_cell_count = 0
-    for i, cell in enumerate(notebook['cells']):
-        cell_type = cell.get('cell_type', 'code')
-        source = cell.get('source', [])
-        
-        if cell_type == 'code':
-            code_cell_count += 1
-            cell_content = process_code_cell(source, code_cell_count - 1)
-            if cell_content:
-                marimo_lines.append(cell_content)
-                marimo_lines.append("")
-        
-        elif cell_type == 'markdown':
-            cell_content = process_markdown_cell(source)
-            if cell_content:
-                marimo_lines.append(cell_content)
-                marimo_lines.append("")
+    if cache is not None:
+        cache.put(file_key, output_file.read_text(encoding='utf-8'))
+        cache.commit()
     
-    # Add the main execution block
-    marimo_lines.extend([
-        "",
-        "if __name__ == \"__main__\":",
-        "    app.run()"
-    ])
+    print(f"Successfully converted '{input_path}' to '{output_path}'")
+    print(f"Processed {total_cells} cells ({code_cell_count} code cells).")
     
-    # Write the marimo notebook
-    try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(marimo_lines))
-        print(f"Successfully converted '{input_path}' to '{output_path}'")
-        print(f"Processed {len(notebook['cells'])} cells ({code_cell_count} code cells).")
-        
-        if has_markdown:
-            print("Note: Markdown cells converted to mo.md() calls.")
-    except Exception as e:
-        print(f"Error writing output file: {e}")
+    if has_markdown:
+        print("Note: Markdown cells converted to mo.md() calls.")
+    return True
 
 
-def analyze_notebook(input_path: str) -> None:
+def analyze_notebook(input_path: str, cells: Optional[slice] = None) -> None:
     """
     Analyze a Jupyter notebook and show conversion preview.
+    
+    With cells, a slice of cell numbers, only that range is read, through
+    the notebook's cell offset index.
     """
     input_file = Path(input_path)
     
@@ -265,69 +746,129 @@ def analyze_notebook(input_path: str) -> None:
         print(f"Error: Input file '{input_path}' not found.")
         return
     
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            notebook = json.load(f)
-    except Exception as e:
-        print(f"Error reading input file: {e}")
-        return
-    
-    if 'cells' not in notebook:
-        print("Error: Invalid Jupyter notebook format.")
-        return
-    
     print(f"Jupyter Notebook Analysis: {input_path}")
     print("=" * 50)
     
     code_cells = 0
     markdown_cells = 0
     raw_cells = 0
+    total_cells = 0
+    all_imports: Set[str] = set()
     
-    for i, cell in enumerate(notebook['cells']):
-        cell_type = cell.get('cell_type', 'unknown')
-        source_lines = len(cell.get('source', []))
-        
-        if cell_type == 'code':
-            code_cells += 1
-        elif cell_type == 'markdown':
-            markdown_cells += 1
-        elif cell_type == 'raw':
-            raw_cells += 1
-        
-        print(f"Cell {i+1}: {cell_type} ({source_lines} lines)")
+    try:
+        if cells is None:
+            numbered = enumerate(iter_cells(input_file))
+        else:
+            from tidy_nb.index import iter_cell_range
+            numbered = iter_cell_range(input_file, cells)
+        for i, cell in numbered:
+            total_cells += 1
+            cell_type = cell.get('cell_type', 'unknown')
+            source = cell.get('source', [])
+            source_lines = len(source)
+            
+            if cell_type == 'code':
+                code_cells += 1
+                # Same key as process_code_cell, so conversion reuses this result
+                analysis = analyze_cell(_code_text(source).strip())
+                all_imports.update(analysis.imports)
+                returns = ', '.join(analysis.return_variables) or '-'
+                print(f"Cell {i+1}: {cell_type} ({source_lines} lines) returns: {returns}")
+                continue
+            elif cell_type == 'markdown':
+                markdown_cells += 1
+            elif cell_type == 'raw':
+                raw_cells += 1
+            
+            print(f"Cell {i+1}: {cell_type} ({source_lines} lines)")
+    except NotebookFormatError as e:
+        print(f"Error: {e}")
+        return
+    except Exception as e:
+        print(f"Error reading input file: {e}")
+        return
     
     print(f"\nSummary:")
     print(f"- Code cells: {code_cells}")
     print(f"- Markdown cells: {markdown_cells}")
     print(f"- Raw cells: {raw_cells}")
-    print(f"- Total cells: {len(notebook['cells'])}")
+    print(f"- Total cells: {total_cells}")
+    if all_imports:
+        print(f"- Imports: {', '.join(sorted(all_imports))}")
 
 
 def main():
     """Main function to handle command line arguments."""
-    if len(sys.argv) < 2:
+    args = sys.argv[1:]
+    dataflow = '--dataflow' in args
+    if dataflow:
+        args.remove('--dataflow')
+    cells = None
+    if '--cells' in args:
+        at = args.index('--cells')
+        try:
+            from tidy_nb.index import parse_cell_range
+            cells = parse_cell_range(args[at + 1])
+        except (IndexError, ValueError) as e:
+            print(f"Error: {e}" if isinstance(e, ValueError) else "Error: --cells needs a range.")
+            sys.exit(1)
+        del args[at:at + 2]
+    trace_path = None
+    if '--profile' in args:
+        at = args.index('--profile')
+        if at + 1 >= len(args):
+            print("Error: --profile needs a trace file path.")
+            sys.exit(1)
+        trace_path = args[at + 1]
+        del args[at:at + 2]
+    blobs = None
+    if '--blob-store' in args:
+        at = args.index('--blob-store')
+        if at + 1 >= len(args):
+            print("Error: --blob-store needs a directory.")
+            sys.exit(1)
+        from tidy_nb.blobs import BlobStore
+        blobs = BlobStore(args[at + 1])
+        del args[at:at + 2]
+    
+    if not args:
         print("Usage:")
-        print("  python jupyter_to_marimo.py <input.ipynb> <output.py>  # Convert notebook")
-        print("  python jupyter_to_marimo.py --analyze <input.ipynb>    # Analyze notebook")
+        print("  python jupyter_to_marimo.py [--dataflow] [--cells A:B] [--profile TRACE] [--blob-store DIR] <input.ipynb> <output.py>  # Convert notebook")
+        print("  python jupyter_to_marimo.py --analyze [--cells A:B] <input.ipynb>               # Analyze notebook")
         print("\nExamples:")
         print("  python jupyter_to_marimo.py my_notebook.ipynb my_notebook.py")
         print("  python jupyter_to_marimo.py --analyze my_notebook.ipynb")
+        print("  python jupyter_to_marimo.py --analyze --cells 100:200 huge_notebook.ipynb")
+        print("\n--dataflow passes values between cells as parameters and returns.")
+        print("--cells reads only cells A to B (from 0, B excluded) through an offset index.")
+        print("--profile prints per-phase and slowest-cell timings and writes a Chrome trace to TRACE.")
+        print("--blob-store keeps outputs in DIR, stored once by content, and references them from each cell.")
         sys.exit(1)
     
-    if sys.argv[1] == "--analyze":
-        if len(sys.argv) != 3:
-            print("Usage: python jupyter_to_marimo.py --analyze <input.ipynb>")
+    if args[0] == "--analyze":
+        if len(args) != 2:
+            print("Usage: python jupyter_to_marimo.py --analyze [--cells A:B] <input.ipynb>")
             sys.exit(1)
-        analyze_notebook(sys.argv[2])
+        analyze_notebook(args[1], cells)
     else:
-        if len(sys.argv) != 3:
-            print("Usage: python jupyter_to_marimo.py <input.ipynb> <output.py>")
+        if len(args) != 2:
+            print("Usage: python jupyter_to_marimo.py [--dataflow] [--cells A:B] [--profile TRACE] [--blob-store DIR] <input.ipynb> <output.py>")
             sys.exit(1)
         
-        input_path = sys.argv[1]
-        output_path = sys.argv[2]
+        input_path = args[0]
+        output_path = args[1]
+        
+        if trace_path is None:
+            convert_jupyter_to_marimo(input_path, output_path, dataflow=dataflow, cells=cells,
+                                      blobs=blobs)
+            return
         
-        convert_jupyter_to_marimo(input_path, output_path)
+        from tidy_nb.profile import Profiler, report
+        profiler = Profiler()
+        with profiler.span('convert', 'file', path=input_path):
+            convert_jupyter_to_marimo(input_path, output_path, dataflow=dataflow,
+                                      cells=cells, profiler=profiler, blobs=blobs)
+        report(profiler, trace_path)
 
 
 if __name__ == "__main__":
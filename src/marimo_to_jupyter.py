@@ -3,99 +3,169 @@
 Convert marimo notebook (.py) to Jupyter notebook (.ipynb) format.
 
 Usage:
-    python marimo_to_jupyter.py input.py output.ipynb
+    python marimo_to_jupyter.py [--compact] [--profile TRACE] [--blob-store DIR] input.py output.ipynb
 """
 
 import ast
-import json
 import re
 import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Optional, TextIO
 
+from tidy_nb.model import Cell, Notebook, freeze, thaw
+from tidy_nb.profile import NULL_PROFILER
+from tidy_nb.writers import NotebookWriter, atomic_output
 
-def parse_marimo_notebook(content: str) -> List[Dict[str, Any]]:
+if TYPE_CHECKING:
+    from tidy_nb.blobs import BlobStore
+    from tidy_nb.cache import ConversionCache
+    from tidy_nb.profile import Profiler
+
+
+def _is_app_cell(decorator: ast.expr) -> bool:
+    """Check whether a decorator is @app.cell or @app.cell(...)."""
+    if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+    return (isinstance(decorator, ast.Attribute) and
+            isinstance(decorator.value, ast.Name) and
+            decorator.value.id == 'app' and
+            decorator.attr == 'cell')
+
+
+def _line_offsets(content: str) -> List[int]:
+    """
+    Return the offset of the start of every line in content.
+
+    offsets[n] is where line n + 1 starts (ast line numbers are 1-based),
+    and a final entry marks the end of the content.
+    """
+    offsets = [0]
+    find = content.find
+    pos = find('\n')
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = find('\n', pos + 1)
+    if offsets[-1] != len(content):
+        offsets.append(len(content))
+    return offsets
+
+
+def _body_start_line(node: ast.FunctionDef, content: str, offsets: List[int]) -> int:
+    """
+    Return the first line of a cell function's body, keeping any comment
+    lines that sit between the signature and the first statement.
+    """
+    first = node.body[0].lineno
+    if first == node.lineno:
+        # def f(): x -- nothing to keep before the statement
+        return first
+    while first - 1 > node.lineno:
+        line = content[offsets[first - 2]:offsets[first - 1]].strip()
+        if line and not line.startswith('#'):
+            break
+        first -= 1
+    return first
+
+
+def _dedent_lines(content: str, offsets: List[int], first: int, last: int) -> str:
+    """
+    Cut lines first..last (1-based, inclusive) out of content and remove
+    their common indentation. Blank lines become empty.
+    """
+    min_indent = None
+    for n in range(first - 1, last):
+        start, end = offsets[n], offsets[n + 1]
+        line = content[start:end]
+        stripped = line.lstrip()
+        if stripped:
+            indent = len(line) - len(stripped)
+            if min_indent is None or indent < min_indent:
+                min_indent = indent
+    if min_indent is None:
+        return ''
+
+    def pieces():
+        for n in range(first - 1, last):
+            start, end = offsets[n], offsets[n + 1]
+            if content[start:end].strip():
+                yield content[start + min_indent:end].rstrip('\n')
+            else:
+                yield ''
+
+    return '\n'.join(pieces())
+
+
+def _line_before(content: str, offsets: List[int], lineno: int) -> str:
+    """The text of the line above line lineno (1-based), or ''."""
+    if lineno < 2:
+        return ''
+    return content[offsets[lineno - 2]:offsets[lineno - 1]].strip()
+
+
+def parse_marimo_notebook(content: str, blobs: Optional["BlobStore"] = None,
+                          quiet: bool = False) -> Notebook:
     """
     Parse a marimo notebook and extract cells.
     
-    Marimo notebooks use @app.cell decorators to define cells.
+    Marimo notebooks use @app.cell decorators to define cells. Only
+    top-level definitions are inspected, and cell bodies are cut out of a
+    line-offset table built once, so parsing is linear in the file size.
+    
+    With a blob store, the outputs and widget state that the notebook
+    refers to are loaded from it and put back on the cells and in the
+    notebook metadata. With quiet, syntax errors are not reported on stdout.
     """
-    cells = []
+    cells = Notebook()
     
     # Parse the Python AST
     try:
         tree = ast.parse(content)
     except SyntaxError as e:
-        print(f"Error parsing Python file: {e}")
+        if not quiet:
+            print(f"Error parsing Python file: {e}")
         return cells
     
-    # Find all function definitions with @app.cell decorator
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            # Check if function has @app.cell decorator
-            has_app_cell = any(
-                (isinstance(decorator, ast.Attribute) and 
-                 isinstance(decorator.value, ast.Name) and
-                 decorator.value.id == 'app' and 
-                 decorator.attr == 'cell') or
-                (isinstance(decorator, ast.Call) and
-                 isinstance(decorator.func, ast.Attribute) and
-                 isinstance(decorator.func.value, ast.Name) and
-                 decorator.func.value.id == 'app' and
-                 decorator.func.attr == 'cell')
-                for decorator in node.decorator_list
-            )
-            
-            if has_app_cell:
-                # Extract the function body
-                cell_source = ast.get_source_segment(content, node)
-                if cell_source:
-                    # Remove the function definition wrapper and decorator
-                    lines = cell_source.split('\n')
-                    
-                    # Find the start of the function body (after def line)
-                    body_start = 0
-                    for i, line in enumerate(lines):
-                        if line.strip().startswith('def '):
-                            body_start = i + 1
-                            break
-                    
-                    # Extract function body and remove indentation
-                    body_lines = lines[body_start:]
-                    if body_lines:
-                        # Remove common indentation
-                        min_indent = float('inf')
-                        for line in body_lines:
-                            if line.strip():  # Skip empty lines
-                                indent = len(line) - len(line.lstrip())
-                                min_indent = min(min_indent, indent)
-                        
-                        if min_indent == float('inf'):
-                            min_indent = 0
-                        
-                        # Remove the common indentation
-                        cleaned_lines = []
-                        for line in body_lines:
-                            if line.strip():
-                                cleaned_lines.append(line[min_indent:])
-                            else:
-                                cleaned_lines.append('')
-                        
-                        cell_content = '\n'.join(cleaned_lines).strip()
-                        
-                        # Remove return statement if it's the last line
-                        lines = cell_content.split('\n')
-                        if lines and lines[-1].strip().startswith('return '):
-                            lines[-1] = lines[-1].replace('return ', '', 1)
-                            cell_content = '\n'.join(lines)
-                        
-                        cells.append({
-                            'cell_type': 'code',
-                            'source': cell_content,
-                            'metadata': {},
-                            'execution_count': None,
-                            'outputs': []
-                        })
+    offsets = None
+    
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if not any(_is_app_cell(decorator) for decorator in node.decorator_list):
+            continue
+        
+        if offsets is None:
+            offsets = _line_offsets(content)
+        
+        first = _body_start_line(node, content, offsets)
+        if first == node.lineno:
+            # Single-line cell: keep what follows the colon
+            cell_content = ast.get_source_segment(content, node.body[0]) or ''
+        else:
+            cell_content = _dedent_lines(content, offsets, first, node.end_lineno).strip()
+        
+        # Remove return statement if it's the last line
+        last_start = cell_content.rfind('\n') + 1
+        if cell_content[last_start:].strip().startswith('return '):
+            cell_content = (cell_content[:last_start] +
+                            cell_content[last_start:].replace('return ', '', 1))
+        
+        fields = {}
+        if blobs is not None:
+            from tidy_nb.blobs import OUTPUTS_MARKER
+            first_line = node.decorator_list[0].lineno
+            reference = _line_before(content, offsets, first_line)
+            if reference.startswith(OUTPUTS_MARKER):
+                fields['execution_count'], fields['outputs'] = blobs.load_outputs(reference)
+        
+        cells.add('code', cell_content, **fields)
+    
+    if blobs is not None and cells:
+        from tidy_nb.blobs import WIDGETS_MARKER
+        at = content.find('\n' + WIDGETS_MARKER)
+        if at != -1:
+            end = content.find('\n', at + 1)
+            line = content[at + 1:end if end != -1 else len(content)]
+            cells.metadata = {'widgets': blobs.load_widgets(line)}
     
     # If no cells found with decorators, try to split by function definitions
     if not cells:
@@ -104,12 +174,13 @@ def parse_marimo_notebook(content: str) -> List[Dict[str, Any]]:
     return cells
 
 
-def fallback_parse(content: str) -> List[Dict[str, Any]]:
+def fallback_parse(content: str) -> Notebook:
     """
     Fallback parser for marimo files that don't use standard decorators.
     Split by function definitions or other patterns.
     """
-    cells = []
+    cells = Notebook()
+    cells.fallback = True
     
     # Split by function definitions
     functions = re.split(r'\n(?=def\s+\w+)', content)
@@ -127,120 +198,251 @@ def fallback_parse(content: str) -> List[Dict[str, Any]]:
             else:
                 cell_type = 'code'
             
-            cells.append({
-                'cell_type': cell_type,
-                'source': func,
-                'metadata': {},
-                'execution_count': None,
-                'outputs': []
-            })
+            cells.add(cell_type, func)
     
     return cells
 
 
-def create_jupyter_notebook(cells: List[Dict[str, Any]]) -> Dict[str, Any]:
+# Notebook-level metadata written for every converted notebook. It is
+# shared by every notebook created here, so it is read-only.
+NOTEBOOK_METADATA = freeze({
+    'kernelspec': {
+        'display_name': 'Python 3',
+        'language': 'python',
+        'name': 'python3'
+    },
+    'language_info': {
+        'name': 'python',
+        'version': '3.8.0',
+        'mimetype': 'text/x-python',
+        'codemirror_mode': {
+            'name': 'ipython',
+            'version': 3
+        },
+        'pygments_lexer': 'ipython3',
+        'nbconvert_exporter': 'python',
+        'file_extension': '.py'
+    }
+})
+NBFORMAT = 4
+NBFORMAT_MINOR = 4
+
+
+def create_jupyter_cell(cell: Cell | Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Create a Jupyter cell from a parsed cell (a Cell or a cell dict).
+    """
+    if not isinstance(cell, Cell):
+        cell = Cell.from_dict(cell)
+    return cell.to_jupyter()
+
+
+def create_jupyter_notebook(cells: Notebook | List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Create a Jupyter notebook structure from parsed cells.
+    
+    Every metadata and outputs container in the result is mutable; the
+    read-only ones the parsed cells share are copied.
+    """
+    if not isinstance(cells, Notebook):
+        cells = Notebook(Cell.from_dict(cell) for cell in cells)
+    notebook = cells.to_dict()
+    for cell in notebook['cells']:
+        cell['metadata'] = thaw(cell['metadata'])
+        if 'outputs' in cell:
+            cell['outputs'] = thaw(cell['outputs'])
+    notebook['metadata'] = thaw(NOTEBOOK_METADATA)
+    notebook['nbformat'] = NBFORMAT
+    notebook['nbformat_minor'] = NBFORMAT_MINOR
+    return notebook
+
+
+class JupyterWriter:
+    """
+    Write parsed cells to stream as a Jupyter notebook, one cell at a time.
+    
+    Produces the same text as json.dump(create_jupyter_notebook(cells),
+    indent=2) without building the notebook first. With compact=True the
+    JSON has no whitespace. metadata replaces NOTEBOOK_METADATA. A
+    profiler records time and allocations per cell.
     """
-    notebook = {
-        'cells': [],
-        'metadata': {
-            'kernelspec': {
-                'display_name': 'Python 3',
-                'language': 'python',
-                'name': 'python3'
-            },
-            'language_info': {
-                'name': 'python',
-                'version': '3.8.0',
-                'mimetype': 'text/x-python',
-                'codemirror_mode': {
-                    'name': 'ipython',
-                    'version': 3
-                },
-                'pygments_lexer': 'ipython3',
-                'nbconvert_exporter': 'python',
-                'file_extension': '.py'
-            }
-        },
-        'nbformat': 4,
-        'nbformat_minor': 4
-    }
     
+    def __init__(self, stream: TextIO, compact: bool = False,
+                 profiler: Optional["Profiler"] = None,
+                 metadata: Dict[str, Any] = NOTEBOOK_METADATA):
+        self.span = (profiler or NULL_PROFILER).span
+        self.writer = NotebookWriter(stream, compact=compact)
+        self.metadata = metadata
+        self.count = 0
+    
+    def write_cell(self, cell: Cell | Dict[str, Any]) -> None:
+        span = self.span
+        with span('cell', 'cell', index=self.count, type=cell.get('cell_type')):
+            with span('render'):
+                jupyter_cell = create_jupyter_cell(cell)
+            with span('write'):
+                self.writer.write_cell(jupyter_cell)
+        self.count += 1
+    
+    def close(self) -> int:
+        """Write the notebook-level fields; returns the number of cells."""
+        with self.span('write'):
+            self.writer.close(
+                metadata=self.metadata,
+                nbformat=NBFORMAT,
+                nbformat_minor=NBFORMAT_MINOR,
+            )
+        return self.count
+
+
+def write_jupyter_notebook(cells: Iterable[Cell | Dict[str, Any]], stream: TextIO,
+                           compact: bool = False,
+                           profiler: Optional["Profiler"] = None,
+                           metadata: Dict[str, Any] = NOTEBOOK_METADATA) -> None:
+    """
+    Write parsed cells to stream as a Jupyter notebook with a JupyterWriter.
+    """
+    writer = JupyterWriter(stream, compact, profiler, metadata)
     for cell in cells:
-        jupyter_cell = {
-            'cell_type': cell['cell_type'],
-            'metadata': cell['metadata'],
-            'source': cell['source'].split('\n') if cell['source'] else ['']
-        }
-        
-        if cell['cell_type'] == 'code':
-            jupyter_cell['execution_count'] = cell['execution_count']
-            jupyter_cell['outputs'] = cell['outputs']
-        
-        notebook['cells'].append(jupyter_cell)
+        writer.write_cell(cell)
+    writer.close()
+
+
+def write_marimo_as_jupyter(content: str, stream: TextIO, compact: bool = False,
+                            profiler: Optional["Profiler"] = None,
+                            blobs: Optional["BlobStore"] = None,
+                            quiet: bool = False) -> int:
+    """
+    Parse marimo source and write it to stream as a Jupyter notebook.
     
-    return notebook
+    With a blob store, the outputs the cells refer to are restored. With
+    quiet, nothing is printed. Returns the number of cells written.
+    """
+    with (profiler or NULL_PROFILER).span('parse'):
+        cells = parse_marimo_notebook(content, blobs, quiet)
+    
+    if not cells:
+        if not quiet:
+            print("Warning: No cells found in the marimo notebook.")
+        # Create a single cell with the entire content
+        cells = Notebook([Cell('code', content)])
+    
+    metadata = NOTEBOOK_METADATA
+    if cells.metadata:
+        metadata = {**NOTEBOOK_METADATA, **cells.metadata}
+    write_jupyter_notebook(cells, stream, compact=compact, profiler=profiler, metadata=metadata)
+    return len(cells)
 
 
-def convert_marimo_to_jupyter(input_path: str, output_path: str) -> None:
+def convert_marimo_to_jupyter(input_path: str, output_path: str,
+                              cache: Optional["ConversionCache"] = None,
+                              compact: bool = False,
+                              profiler: Optional["Profiler"] = None,
+                              blobs: Optional["BlobStore"] = None) -> bool:
     """
     Convert a marimo notebook to Jupyter format.
+    Returns True on success; errors are printed and return False.
+    
+    Cells are streamed to the output as they are converted. With compact,
+    the notebook JSON is written without indentation. With a cache, an
+    input whose bytes were converted before is not parsed again. With a
+    blob store, outputs that the marimo cells refer to are restored. A
+    profiler records where the time goes.
     """
+    profiler = profiler or NULL_PROFILER
     input_file = Path(input_path)
     output_file = Path(output_path)
     
     if not input_file.exists():
         print(f"Error: Input file '{input_path}' not found.")
-        return
+        return False
+    
+    file_key = None
+    if cache is not None:
+        options = {'compact': compact}
+        if blobs is not None:
+            options['blobs'] = str(blobs.directory)
+        file_key = cache.file_key(input_file, 'marimo_to_jupyter', options)
+        cached = cache.get(file_key)
+        if cached is not None:
+            from tidy_nb.writers import write_if_changed
+            try:
+                write_if_changed(output_file, cached)
+            except Exception as e:
+                print(f"Error writing output file: {e}")
+                return False
+            cache.commit()
+            print(f"Unchanged '{input_path}', reused cached conversion.")
+            return True
     
     # Read the marimo notebook
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
+        with profiler.span('read'), open(input_file, 'r', encoding='utf-8') as f:
             content = f.read()
     except Exception as e:
         print(f"Error reading input file: {e}")
-        return
+        return False
     
-    # Parse the marimo notebook
-    cells = parse_marimo_notebook(content)
-    
-    if not cells:
-        print("Warning: No cells found in the marimo notebook.")
-        # Create a single cell with the entire content
-        cells = [{
-            'cell_type': 'code',
-            'source': content,
-            'metadata': {},
-            'execution_count': None,
-            'outputs': []
-        }]
-    
-    # Create Jupyter notebook structure
-    notebook = create_jupyter_notebook(cells)
-    
-    # Write the Jupyter notebook
+    # Parse the marimo notebook and write the Jupyter notebook
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(notebook, f, indent=2, ensure_ascii=False)
+        with atomic_output(output_file) as f:
+            cell_count = write_marimo_as_jupyter(content, f, compact=compact, profiler=profiler,
+                                                 blobs=blobs)
+        if cache is not None:
+            cache.put(file_key, output_file.read_text(encoding='utf-8'))
+            cache.commit()
         print(f"Successfully converted '{input_path}' to '{output_path}'")
-        print(f"Created {len(cells)} cells in the Jupyter notebook.")
+        print(f"Created {cell_count} cells in the Jupyter notebook.")
     except Exception as e:
         print(f"Error writing output file: {e}")
+        return False
+    return True
 
 
 def main():
     """Main function to handle command line arguments."""
-    if len(sys.argv) != 3:
-        print("Usage: python marimo_to_jupyter.py <input.py> <output.ipynb>")
+    args = sys.argv[1:]
+    compact = '--compact' in args
+    if compact:
+        args.remove('--compact')
+    trace_path = None
+    if '--profile' in args:
+        at = args.index('--profile')
+        trace_path = args[at + 1] if at + 1 < len(args) else None
+        del args[at:at + 2]
+    blob_dir = None
+    if '--blob-store' in args:
+        at = args.index('--blob-store')
+        blob_dir = args[at + 1] if at + 1 < len(args) else None
+        del args[at:at + 2]
+    
+    if (len(args) != 2 or ('--profile' in sys.argv and trace_path is None) or
+            ('--blob-store' in sys.argv and blob_dir is None)):
+        print("Usage: python marimo_to_jupyter.py [--compact] [--profile TRACE] [--blob-store DIR] <input.py> <output.ipynb>")
         print("\nExample:")
         print("  python marimo_to_jupyter.py my_notebook.py my_notebook.ipynb")
+        print("\n--compact writes the notebook JSON without indentation.")
+        print("--profile prints per-phase and slowest-cell timings and writes a Chrome trace to TRACE.")
+        print("--blob-store restores the outputs the cells refer to from DIR.")
         sys.exit(1)
     
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
+    input_path = args[0]
+    output_path = args[1]
+    blobs = None
+    if blob_dir is not None:
+        from tidy_nb.blobs import BlobStore
+        blobs = BlobStore(blob_dir)
+    
+    if trace_path is None:
+        convert_marimo_to_jupyter(input_path, output_path, compact=compact, blobs=blobs)
+        return
     
-    convert_marimo_to_jupyter(input_path, output_path)
+    from tidy_nb.profile import Profiler, report
+    profiler = Profiler()
+    with profiler.span('convert', 'file', path=input_path):
+        convert_marimo_to_jupyter(input_path, output_path, compact=compact, profiler=profiler,
+                                  blobs=blobs)
+    report(profiler, trace_path)
 
 
 if __name__ == "__main__":
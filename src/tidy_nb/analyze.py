@@ -0,0 +1,343 @@
+"""Corpus-wide statistics over many notebooks.
+
+``tidy_nb analyze`` scans notebooks in worker processes and streams one
+record per notebook to a JSON Lines or CSV file as the results arrive,
+while the parent folds each record into running totals. The totals have a
+fixed size however many notebooks are scanned: counters, histograms with
+one bucket per power of two, and a Misra-Gries summary of the most common
+imports.
+
+Notebooks are read with the streaming reader; outputs are measured, not
+decoded. Each record is flushed as it is written, so an interrupted scan
+loses at most the notebooks in flight. Running it again with resume reads
+the records already written back into the totals and scans only the
+notebooks they do not cover.
+"""
+from __future__ import annotations
+
+import contextlib
+import csv
+import io
+import json
+import os
+from typing import TYPE_CHECKING, NamedTuple
+
+from .batch import NOTEBOOK_SUFFIX
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Any, Iterable, Iterator, Sequence
+
+
+DEFAULT_TOP_CAPACITY = 10_000
+CSV_SUFFIX = '.csv'
+
+
+class NotebookStats(NamedTuple):
+    """The record kept for one notebook."""
+
+    path: str
+    kind: str  # 'ipynb' or 'marimo'
+    size: int  # File size in bytes
+    cells: int = 0
+    code_cells: int = 0
+    markdown_cells: int = 0
+    raw_cells: int = 0
+    source_bytes: int = 0
+    output_bytes: int = 0  # Raw JSON size of all outputs
+    imports: tuple[str, ...] = ()  # Names bound by import statements, sorted
+    fallback: bool = False  # A marimo file split up by fallback_parse
+    error: str | None = None
+
+
+_COUNTED_TYPES = {'code': 'code_cells', 'markdown': 'markdown_cells', 'raw': 'raw_cells'}
+
+
+def _tally(path: str, kind: str, size: int, cells: Iterable[tuple[str, str, int]],
+           fallback: bool = False) -> NotebookStats:
+    """Build a record from (cell_type, source, output size) for each cell."""
+    from jupyter_to_marimo import detect_imports
+
+    counts = dict.fromkeys(_COUNTED_TYPES.values(), 0)
+    total = source_bytes = output_bytes = 0
+    imports: set[str] = set()
+    for cell_type, source, outputs in cells:
+        total += 1
+        if cell_type in _COUNTED_TYPES:
+            counts[_COUNTED_TYPES[cell_type]] += 1
+        source_bytes += len(source.encode('utf-8'))
+        output_bytes += outputs
+        if cell_type == 'code':
+            imports.update(detect_imports(source.strip()))
+    return NotebookStats(path, kind, size, total, **counts, source_bytes=source_bytes,
+                         output_bytes=output_bytes, imports=tuple(sorted(imports)),
+                         fallback=fallback)
+
+
+def _notebook_cells(path: str) -> Iterator[tuple[str, str, int]]:
+    from .reader import SKIPPED_KEYS, iter_stream_cells, source_text
+
+    with open(path, 'rb') as f:
+        for cell in iter_stream_cells(f, SKIPPED_KEYS, measure=True):
+            yield (cell.get('cell_type', 'code'), source_text(cell.get('source', '')),
+                   cell.get('outputs', 0))
+
+
+def scan_file(path: str) -> NotebookStats:
+    """Gather the record for one .ipynb or marimo .py file."""
+    kind = 'ipynb' if path.endswith(NOTEBOOK_SUFFIX) else 'marimo'
+    size = 0
+    try:
+        size = os.path.getsize(path)
+        # The marimo parser reports syntax errors on stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            if kind == 'ipynb':
+                return _tally(path, kind, size, _notebook_cells(path))
+            from marimo_to_jupyter import parse_marimo_notebook
+            with open(path, encoding='utf-8') as f:
+                notebook = parse_marimo_notebook(f.read())
+            return _tally(path, kind, size,
+                          ((cell.cell_type, cell.source, 0) for cell in notebook),
+                          notebook.fallback)
+    except Exception as e:  # One bad file must not stop the scan
+        return NotebookStats(path, kind, size, error=f'{type(e).__name__}: {e}')
+
+
+def scan_many(paths: Sequence[str], jobs: int | None = None) -> Iterator[NotebookStats]:
+    """Scan notebooks, in parallel when jobs > 1, yielding records in order."""
+    from .batch import default_jobs
+
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(paths)))
+    if jobs == 1:
+        yield from map(scan_file, paths)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(scan_file, paths, chunksize=chunksize)
+
+
+class Histogram:
+    """Counts of non-negative integers in buckets 0, 1, 2-3, 4-7, 8-15..."""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * 65
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value: int) -> None:
+        self.buckets[value.bit_length()] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> int:
+        """Upper bound of the bucket holding the q-quantile."""
+        rank = q * self.count
+        seen = 0
+        for bits, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << bits) - 1, self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class TopCounter:
+    """
+    Approximate counts of the most frequent items in fixed memory.
+
+    At most capacity items are tracked (the Misra-Gries algorithm). While
+    fewer distinct items have been seen the counts are exact; after that,
+    each count is low by at most ``error``, and any item seen more than
+    ``total / (capacity + 1)`` times is still tracked.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TOP_CAPACITY):
+        self.capacity = capacity
+        self.counts: dict[str, int] = {}
+        self.error = 0
+        self.total = 0
+
+    def add(self, item: str) -> None:
+        self.total += 1
+        counts = self.counts
+        if item in counts:
+            counts[item] += 1
+        elif len(counts) < self.capacity:
+            counts[item] = 1
+        else:
+            # Count the new item against every tracked one
+            self.error += 1
+            for key in list(counts):
+                if counts[key] == 1:
+                    del counts[key]
+                else:
+                    counts[key] -= 1
+
+    def most_common(self, n: int) -> list[tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+
+class CorpusSummary:
+    """Running totals over the records of a scan, in constant memory."""
+
+    def __init__(self, top_capacity: int = DEFAULT_TOP_CAPACITY):
+        self.notebooks = 0
+        self.marimo = 0
+        self.failed = 0
+        self.fallbacks = 0
+        self.cell_types = dict.fromkeys(_COUNTED_TYPES.values(), 0)
+        self.cells = Histogram()  # Per notebook, like the byte sizes
+        self.source_bytes = Histogram()
+        self.output_bytes = Histogram()
+        self.sizes = Histogram()
+        self.imports = TopCounter(top_capacity)  # Notebooks importing each name
+
+    def add(self, record: NotebookStats) -> None:
+        self.notebooks += 1
+        if record.error is not None:
+            self.failed += 1
+            return
+        if record.kind == 'marimo':
+            self.marimo += 1
+            self.fallbacks += record.fallback
+        for field in self.cell_types:
+            self.cell_types[field] += getattr(record, field)
+        self.cells.add(record.cells)
+        self.source_bytes.add(record.source_bytes)
+        self.output_bytes.add(record.output_bytes)
+        self.sizes.add(record.size)
+        for name in record.imports:
+            self.imports.add(name)
+
+    def report(self, top: int = 20) -> list[str]:
+        """The summary as lines of text."""
+        scanned = self.notebooks - self.failed
+        lines = [
+            f'Notebooks: {self.notebooks} ({scanned - self.marimo} .ipynb, '
+            f'{self.marimo} marimo), {self.failed} failed.',
+            f'Cells: {self.cells.total} (' + ', '.join(
+                f'{count} {field.removesuffix("_cells")}'
+                for field, count in self.cell_types.items()) + ').',
+        ]
+        if self.marimo:
+            lines.append(f'Marimo files parsed by fallback_parse: {self.fallbacks} '
+                         f'({self.fallbacks / self.marimo:.1%}).')
+        for label, histogram in (('Cells per notebook', self.cells),
+                                 ('File bytes', self.sizes),
+                                 ('Source bytes', self.source_bytes),
+                                 ('Output bytes', self.output_bytes)):
+            if histogram.count:
+                lines.append(
+                    f'{label}: mean {histogram.mean():.0f}, '
+                    f'median <= {histogram.quantile(0.5)}, '
+                    f'p90 <= {histogram.quantile(0.9)}, '
+                    f'p99 <= {histogram.quantile(0.99)}, max {histogram.max}.'
+                )
+        common = self.imports.most_common(top)
+        if common:
+            approximate = '~' if self.imports.error else ''
+            lines.append('Top imports (notebooks importing each):')
+            width = max(len(name) for name, _ in common)
+            for name, count in common:
+                lines.append(f'  {name:<{width}}  {approximate}{count}')
+        return lines
+
+
+def _to_row(record: NotebookStats) -> dict[str, Any]:
+    """A record as a flat dict of CSV cells."""
+    row = record._asdict()
+    row['imports'] = ' '.join(record.imports)
+    row['fallback'] = int(record.fallback)
+    row['error'] = '' if record.error is None else ' '.join(record.error.splitlines())
+    return row
+
+
+def _from_row(row: dict[str, str]) -> NotebookStats:
+    return NotebookStats(
+        row['path'], row['kind'], *(int(row[field]) for field in NotebookStats._fields[2:9]),
+        imports=tuple(row['imports'].split()), fallback=row['fallback'] == '1',
+        error=row['error'] or None,
+    )
+
+
+def _trim_partial_line(path: str | PathLike[str]) -> None:
+    """Drop a last line left unfinished by an interrupted scan."""
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 64 * 1024)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+def read_records(path: str | PathLike[str]) -> Iterator[NotebookStats]:
+    """Read back the records of a scan, from JSON Lines or CSV by suffix."""
+    with open(path, encoding='utf-8', newline='') as f:
+        if str(path).endswith(CSV_SUFFIX):
+            for row in csv.DictReader(f):
+                yield _from_row(row)
+        else:
+            for line in f:
+                if line.strip():
+                    data = json.loads(line)
+                    data['imports'] = tuple(data['imports'])
+                    yield NotebookStats(**data)
+
+
+def scan_corpus(
+    paths: Sequence[str],
+    output: str | PathLike[str],
+    summary: CorpusSummary,
+    jobs: int | None = None,
+    resume: bool = False,
+) -> Iterator[NotebookStats]:
+    """
+    Scan the notebooks at paths, appending a record for each to output
+    (CSV if its name ends in .csv, JSON Lines otherwise) and adding it to
+    summary. Yields the new records as they are written.
+
+    With resume, the records already in output are added to summary and
+    their notebooks are not scanned again; otherwise output is replaced.
+    """
+    is_csv = str(output).endswith(CSV_SUFFIX)
+    done: set[str] = set()
+    if resume and os.path.exists(output):
+        _trim_partial_line(output)
+        for record in read_records(output):
+            if record.path not in done:
+                done.add(record.path)
+                summary.add(record)
+        paths = [path for path in paths if path not in done]
+    else:
+        resume = False
+
+    with open(output, 'a' if resume else 'w', encoding='utf-8', newline='') as f:
+        if is_csv:
+            writer = csv.DictWriter(f, NotebookStats._fields, lineterminator='\n')
+            if f.tell() == 0:
+                writer.writeheader()
+        for record in scan_many(paths, jobs):
+            if is_csv:
+                writer.writerow(_to_row(record))
+            else:
+                f.write(json.dumps(record._asdict(), ensure_ascii=False) + '\n')
+            f.flush()
+            summary.add(record)
+            yield record
@@ -0,0 +1,239 @@
+"""Batch conversion of many notebooks across a process pool."""
+from __future__ import annotations
+
+import contextlib
+import glob
+import io
+import os
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from typing import Iterable, Iterator, Sequence
+
+
+NOTEBOOK_SUFFIX = '.ipynb'
+MARIMO_SUFFIX = '.py'
+_GLOB_CHARS = frozenset('*?[')
+
+# What happened to a converted file's output
+WRITTEN = 'written'  # Replaced with new contents
+SKIPPED = 'skipped'  # Not converted: the cache had the result, already on disk
+UNCHANGED = 'unchanged'  # Converted, but identical to what was there
+
+
+class Result(NamedTuple):
+    """Outcome of converting one file."""
+
+    source: str
+    target: str | None
+    ok: bool
+    message: str
+    profile: list | None = None  # Profiler events, when profiling
+    status: str | None = None  # WRITTEN, SKIPPED or UNCHANGED, when ok
+
+
+def default_jobs() -> int:
+    """Number of worker processes to use when --jobs is not given."""
+    return os.cpu_count() or 1
+
+
+def collect_notebooks(paths: Iterable[str]) -> list[str]:
+    """
+    Expand files, directories and glob patterns into a list of notebooks.
+
+    Directories are searched recursively for .ipynb files. Files and glob
+    matches are kept as given, so marimo .py files can be listed
+    explicitly. The result keeps argument order, sorted within each
+    argument, with duplicates removed.
+    """
+    seen = set()
+    found = []
+    for arg in paths:
+        path = Path(arg)
+        if path.is_dir():
+            matches = sorted(
+                str(p) for p in path.rglob(f'*{NOTEBOOK_SUFFIX}')
+                if '.ipynb_checkpoints' not in p.parts
+            )
+        elif not path.exists() and _GLOB_CHARS.intersection(arg):
+            matches = sorted(
+                p for p in glob.glob(arg, recursive=True) if os.path.isfile(p)
+            )
+        else:
+            matches = [arg]
+        for match in matches:
+            if match not in seen:
+                seen.add(match)
+                found.append(match)
+    return found
+
+
+def target_path(source: str) -> str | None:
+    """Return the output path for source, or None if it cannot be converted."""
+    path = Path(source)
+    if path.suffix == NOTEBOOK_SUFFIX:
+        return str(path.with_suffix(MARIMO_SUFFIX))
+    if path.suffix == MARIMO_SUFFIX:
+        return str(path.with_suffix(NOTEBOOK_SUFFIX))
+    return None
+
+
+# One cache connection per process, opened on first use. Keyed by pid as
+# well, so forked workers never reuse a connection inherited from the parent.
+_caches: dict = {}
+
+
+def _get_cache(cache_dir: str | None):
+    key = (os.getpid(), cache_dir)
+    cache = _caches.get(key)
+    if cache is None:
+        from .cache import ConversionCache
+        cache = _caches[key] = ConversionCache(cache_dir)
+    return cache
+
+
+def file_stamps(paths: Iterable[str]) -> list:
+    """Identify the current version of each path, to tell if it is replaced."""
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamps.append(None)
+    return stamps
+
+
+def convert_file(source: str, use_cache: bool = False,
+                 cache_dir: str | None = None, compact: bool = False,
+                 dataflow: bool = False, profile: bool = False,
+                 to: Sequence[str] | None = None,
+                 blob_store: str | None = None,
+                 validate: bool = False) -> Result:
+    """
+    Convert one file next to itself, capturing the converter's output.
+
+    With use_cache, results go through the content-hash cache in cache_dir
+    (the per-user cache directory by default). compact writes .ipynb
+    output without indentation; dataflow gives marimo cells parameters and
+    returns from the notebook's dependency graph. With profile, the
+    Result carries the profiler's events.
+
+    With to, a list of format names, source is read once and written in
+    each of those formats instead (see tidy_nb.emit); the cache is not
+    used then.
+
+    With blob_store, a directory, outputs are kept in a content-addressed
+    store there (see tidy_nb.blobs) rather than dropped, and restored when
+    converting back.
+
+    With validate, a notebook source is checked first (see
+    tidy_nb.validate) and not converted if it has structural errors.
+
+    Outputs identical to the files already on disk are left untouched;
+    the Result's status says whether anything was written.
+    """
+    target = target_path(source)
+    if target is None:
+        return Result(source, None, False, f"Error: Unsupported file type '{source}'.")
+
+    if validate and source.endswith(NOTEBOOK_SUFFIX):
+        from .validate import validate_file
+        try:
+            errors = validate_file(source)
+        except OSError as e:
+            return Result(source, target, False, f"Error: {type(e).__name__}: {e}")
+        if errors:
+            return Result(source, target, False,
+                          '\n'.join(['Error: Invalid notebook.', *map(str, errors)]))
+
+    profiler = None
+    span = contextlib.nullcontext()
+    if profile:
+        from .profile import Profiler
+        profiler = Profiler()
+        span = profiler.span('convert', 'file', path=source)
+
+    buffer = io.StringIO()
+    cache = _get_cache(cache_dir) if use_cache and not to else None
+    file_hits = cache.file_hits if cache is not None else 0
+    if to:
+        from .emit import format_targets
+        before = file_stamps(format_targets(source, to).values())
+    else:
+        before = file_stamps([target])
+    try:
+        with contextlib.redirect_stdout(buffer), span:
+            blobs = None
+            if blob_store is not None:
+                from .blobs import BlobStore
+                blobs = BlobStore(blob_store)
+            if to:
+                from .emit import emit_formats
+                targets = emit_formats(source, to, compact=compact, dataflow=dataflow,
+                                       profiler=profiler)
+                written = list(targets.values())
+                target = ', '.join(written)
+                ok = True
+            elif source.endswith(NOTEBOOK_SUFFIX):
+                from jupyter_to_marimo import convert_jupyter_to_marimo
+                ok = convert_jupyter_to_marimo(source, target, cache=cache, dataflow=dataflow,
+                                               profiler=profiler, blobs=blobs)
+            else:
+                from marimo_to_jupyter import convert_marimo_to_jupyter
+                ok = convert_marimo_to_jupyter(source, target, cache=cache, compact=compact,
+                                               profiler=profiler, blobs=blobs)
+            if not to:
+                written = [target]
+    except Exception as e:  # One bad file must not stop the batch
+        return Result(source, target, False, f"Error: {type(e).__name__}: {e}")
+    events = profiler.events if profiler is not None else None
+    status = None
+    if ok:
+        if file_stamps(written) != before:
+            status = WRITTEN
+        elif cache is not None and cache.file_hits > file_hits:
+            status = SKIPPED
+        else:
+            status = UNCHANGED
+    return Result(source, target, bool(ok), buffer.getvalue().strip(), events, status)
+
+
+def convert_many(
+    sources: Sequence[str],
+    jobs: int | None = None,
+    use_cache: bool = False,
+    cache_dir: str | None = None,
+    compact: bool = False,
+    dataflow: bool = False,
+    profile: bool = False,
+    to: Sequence[str] | None = None,
+    blob_store: str | None = None,
+    validate: bool = False,
+) -> Iterator[Result]:
+    """
+    Convert sources, yielding one Result per file in the order given.
+
+    With jobs > 1 the files are spread over a process pool; results are
+    still yielded in input order so the report is deterministic.
+    """
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(sources)))
+    convert = partial(convert_file, use_cache=use_cache, cache_dir=cache_dir,
+                      compact=compact, dataflow=dataflow, profile=profile, to=to,
+                      blob_store=blob_store, validate=validate)
+    if jobs == 1:
+        yield from map(convert, sources)
+        return
+
+    # Imported here: multiprocessing costs ~15ms of startup that
+    # single-file runs never need.
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Large chunks amortise inter-process overhead on big batches while
+    # still leaving work for every worker.
+    chunksize = max(1, len(sources) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(convert, sources, chunksize=chunksize)
@@ -0,0 +1,111 @@
+"""Content-addressed store for notebook outputs.
+
+Converting a notebook to marimo normally drops its outputs. With a blob
+store, each output is saved as a file named by the SHA-256 of its JSON,
+in a git-style ``ab/cdef...`` layout, and the marimo cell keeps only a
+one-line reference above its decorator::
+
+    # tidy_nb outputs: {"execution_count":3,"outputs":["9f86d0...","60303a..."]}
+    @app.cell
+    def cell_2():
+
+An output shared by many notebooks, a logo or a repeated plot, is stored
+once. Converting back to Jupyter with the same store puts the outputs back
+exactly as they were. Notebook-level widget state is kept the same way,
+with a ``# tidy_nb widgets:`` line before the footer.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .writers import atomic_output
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Any
+
+
+OUTPUTS_MARKER = '# tidy_nb outputs: '
+WIDGETS_MARKER = '# tidy_nb widgets: '
+_DIGEST = re.compile(r'[0-9a-f]{64}')
+
+
+class MissingBlobError(LookupError):
+    """Raised when a referenced output is not in the store."""
+
+
+def _dumps(value: Any) -> bytes:
+    # Key order is kept as it was, so the output comes back byte-identical.
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class BlobStore:
+    """A directory of immutable blobs, each named by its SHA-256."""
+
+    def __init__(self, directory: str | PathLike[str]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / digest[2:]
+
+    def __contains__(self, digest: str) -> bool:
+        return bool(_DIGEST.fullmatch(digest)) and self.path(digest).exists()
+
+    def put(self, data: bytes) -> str:
+        """Store data unless an identical blob is already there; return its digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            with atomic_output(path, binary=True) as f:
+                f.write(data)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Return the blob with the given digest; raises MissingBlobError."""
+        if not _DIGEST.fullmatch(digest):
+            raise MissingBlobError(f'Invalid blob digest {digest!r}.')
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise MissingBlobError(
+                f"Blob {digest} is not in the store at '{self.directory}'."
+            ) from None
+
+    def put_json(self, value: Any) -> str:
+        return self.put(_dumps(value))
+
+    def get_json(self, digest: str) -> Any:
+        return json.loads(self.get(digest))
+
+    def outputs_reference(self, outputs: list, execution_count: int | None) -> str | None:
+        """
+        Store a code cell's outputs and return the comment line that
+        refers to them, or None if the cell has nothing to keep.
+        """
+        if not outputs and execution_count is None:
+            return None
+        reference = {
+            'execution_count': execution_count,
+            'outputs': [self.put_json(output) for output in outputs],
+        }
+        return OUTPUTS_MARKER + json.dumps(reference, separators=(',', ':'))
+
+    def load_outputs(self, line: str) -> tuple[int | None, list]:
+        """The (execution_count, outputs) that an outputs line refers to."""
+        reference = json.loads(line[len(OUTPUTS_MARKER):])
+        outputs = [self.get_json(digest) for digest in reference.get('outputs', [])]
+        return reference.get('execution_count'), outputs
+
+    def widgets_reference(self, widgets: dict) -> str:
+        """Store notebook widget state and return the line that refers to it."""
+        return WIDGETS_MARKER + self.put_json(widgets)
+
+    def load_widgets(self, line: str) -> dict:
+        return self.get_json(line[len(WIDGETS_MARKER):].strip())
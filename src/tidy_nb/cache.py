@@ -0,0 +1,224 @@
+"""Persistent content-hash cache for conversions.
+
+Entries live in a single SQLite database. Whole-file entries are keyed by
+the hash of the input bytes together with the converter name, the tidy_nb
+version and the conversion options, and hold the rendered output. Cell
+entries are keyed by the hash of a cell's source and hold its rendered
+text, so a notebook with a few edited cells only re-renders those cells.
+
+The database is capped at ``max_bytes`` of stored values; when it grows
+past that, the least recently used entries are evicted.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from . import __version__
+
+if TYPE_CHECKING:
+    from os import PathLike
+
+
+# Bump when the layout of cached values changes.
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DB_NAME = 'cache.sqlite3'
+
+
+def default_cache_dir() -> Path:
+    """Return the per-user cache directory, honouring XDG_CACHE_HOME."""
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'tidy_nb'
+
+
+def _digest(*parts: bytes) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(len(part).to_bytes(8, 'little'))
+        h.update(part)
+    return h.hexdigest()
+
+
+class ConversionCache:
+    """
+    On-disk LRU cache of conversion results.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(
+        self,
+        directory: str | PathLike[str] | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._salt = f'{__version__}:{CACHE_FORMAT}'.encode()
+        import sqlite3  # Only commands that use the cache pay for it
+        self._db = sqlite3.connect(self.directory / DB_NAME, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' last_used REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)'
+        )
+        self._db.commit()
+        self._total = self.total_bytes()
+        self.hits = 0
+        self.misses = 0
+        self.file_hits = 0  # Hits on whole-file entries: conversions skipped
+
+    def __enter__(self) -> ConversionCache:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def file_key(
+        self,
+        path: str | PathLike[str],
+        converter: str,
+        options: dict | None = None,
+    ) -> str:
+        """Key for the whole-file result of running converter on path."""
+        with open(path, 'rb') as f:
+            content = hashlib.file_digest(f, 'sha256').digest()
+        opts = json.dumps(options or {}, sort_keys=True).encode()
+        return 'file:' + _digest(self._salt, converter.encode(), opts, content)
+
+    def cell_key(self, kind: str, source: str) -> str:
+        """Key for a rendered cell of the given kind."""
+        return 'cell:' + _digest(self._salt, kind.encode(), source.encode())
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for key, marking it as recently used."""
+        row = self._db.execute(
+            'SELECT value FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if key.startswith('file:'):
+            self.file_hits += 1
+        self._db.execute(
+            'UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key)
+        )
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Store value under key, evicting old entries past the size cap."""
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        row = self._db.execute(
+            'SELECT size FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        self._db.execute(
+            'INSERT OR REPLACE INTO entries (key, value, size, last_used) '
+            'VALUES (?, ?, ?, ?)',
+            (key, value, size, time.time()),
+        )
+        self._total += size - (row[0] if row else 0)
+        if self._total > self.max_bytes:
+            self._evict()
+
+    def commit(self) -> None:
+        """Make pending stores and LRU updates visible to other processes."""
+        self._db.commit()
+
+    def total_bytes(self) -> int:
+        """Size of all stored values, in bytes."""
+        (total,) = self._db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries'
+        ).fetchone()
+        return total
+
+    def _evict(self) -> None:
+        # Other processes may share the database, so resync the total
+        # before deciding how much to drop. Evict down to 90% of the cap
+        # so the next few stores do not each trigger an eviction.
+        self._total = self.total_bytes()
+        excess = self._total - self.max_bytes * 9 // 10
+        if excess <= 0:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute(
+            'SELECT key, size FROM entries ORDER BY last_used'
+        ):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany('DELETE FROM entries WHERE key = ?', doomed)
+        self._total -= freed
+
+
+class MemoryCache(ConversionCache):
+    """
+    In-process LRU cache with the same interface as ConversionCache.
+
+    Used by long-running commands such as watch mode, where results only
+    need to outlive one conversion, not the process.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._salt = f'{__version__}:{CACHE_FORMAT}'.encode()
+        self._entries: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.file_hits = 0  # Hits on whole-file entries: conversions skipped
+
+    def close(self) -> None:
+        self._entries.clear()
+        self._total = 0
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if key.startswith('file:'):
+            self.file_hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, value: str) -> None:
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._total -= old[1]
+        self._entries[key] = (value, size)
+        self._total += size
+        while self._total > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._total -= evicted
+
+    def commit(self) -> None:
+        pass
+
+    def total_bytes(self) -> int:
+        return self._total
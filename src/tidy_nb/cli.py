@@ -1,23 +1,726 @@
-"""CLI for tidy_nb."""
+"""CLI for tidy_nb.
+
+Module-level imports here are kept to the standard library essentials so
+that --version and --help return quickly. Each command imports what it
+needs inside its own function; tests/test_startup.py holds the budget.
+"""
 from __future__ import annotations
 
 import argparse
+import sys
 from typing import TYPE_CHECKING
 
 from . import __doc__ as pkg_description
 from . import __version__
 
 if TYPE_CHECKING:
+    from collections import Counter
     from typing import Sequence
 
 
 PROG = __package__
 
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1, got {number}')
+    return number
+
+
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f'must be positive, got {number}')
+    return number
+
+
+def _fraction(value: str) -> float:
+    number = float(value)
+    if not 0 <= number <= 1:
+        raise argparse.ArgumentTypeError(f'must be from 0 to 1, got {number}')
+    return number
+
+
+def watch_main(argv: Sequence[str]) -> int:
+    """Entry point for ``tidy_nb watch``."""
+    from .watch import DEFAULT_DEBOUNCE, DEFAULT_INTERVAL
+
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} watch',
+        description='Keep paired .ipynb and marimo .py files in sync.',
+    )
+    parser.add_argument('directory', help='Directory to watch.')
+    parser.add_argument(
+        '--interval',
+        type=_positive_float,
+        default=DEFAULT_INTERVAL,
+        help=f'Seconds between scans (default: {DEFAULT_INTERVAL}).',
+    )
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help=f'Seconds a file must be unchanged before syncing (default: {DEFAULT_DEBOUNCE}).',
+    )
+    args = parser.parse_args(argv)
+
+    from .watch import Watcher
+
+    watcher = Watcher(args.directory, args.interval, args.debounce)
+    print(f'Watching {args.directory} (Ctrl+C to stop)')
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def dupes_main(argv: Sequence[str]) -> int:
+    """Entry point for ``tidy_nb dupes``."""
+    from .dupes import DEFAULT_THRESHOLD
+
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} dupes',
+        description='Find code cells duplicated across notebooks, through an on-disk index.',
+    )
+    parser.add_argument(
+        '--index',
+        default=None,
+        help='Index database (default: ~/.cache/tidy_nb/cells.sqlite3).',
+    )
+    actions = parser.add_subparsers(dest='action', required=True)
+    update = actions.add_parser('update', help='Add new and changed notebooks to the index.')
+    update.add_argument(
+        'notebooks',
+        nargs='*',
+        help='Notebooks to index: files, directories or glob patterns.',
+    )
+    update.add_argument(
+        '-j', '--jobs',
+        type=_positive_int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs).',
+    )
+    top = actions.add_parser('top', help='List the cells found in the most notebooks.')
+    top.add_argument(
+        '-n',
+        type=_positive_int,
+        default=20,
+        help='Number of cells to list (default: %(default)s).',
+    )
+    find = actions.add_parser('find', help='List the notebooks that contain a cell.')
+    find.add_argument(
+        'source',
+        help="File holding the cell's source, or - for stdin; with --cell, a notebook.",
+    )
+    find.add_argument(
+        '--cell',
+        type=int,
+        default=None,
+        help='Look up this cell (numbered from 0) of the notebook given as source.',
+    )
+    find.add_argument(
+        '--near',
+        nargs='?',
+        type=_fraction,
+        const=DEFAULT_THRESHOLD,
+        default=None,
+        metavar='SIMILARITY',
+        help='Include near-duplicates at least this similar, from 0 to 1 '
+             f'(default: {DEFAULT_THRESHOLD}).',
+    )
+    args = parser.parse_args(argv)
+
+    import sqlite3
+
+    from .dupes import DuplicateIndex, IndexFormatError
+
+    if args.action == 'find':
+        try:
+            if args.cell is not None:
+                from .dupes import code_sources
+                sources = dict(code_sources(args.source))
+                if args.cell not in sources:
+                    parser.error(f'{args.source} has no code cell {args.cell}')
+                source = sources[args.cell]
+            elif args.source == '-':
+                source = sys.stdin.read()
+            else:
+                with open(args.source, encoding='utf-8') as f:
+                    source = f.read()
+        except (OSError, ValueError) as e:
+            print(f'Error: {e}', file=sys.stderr)
+            return 1
+
+    try:
+        index = DuplicateIndex(args.index)
+    except (IndexFormatError, sqlite3.DatabaseError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    with index:
+        if args.action == 'update':
+            from .batch import collect_notebooks
+            result = index.update(collect_notebooks(args.notebooks), args.jobs)
+            for path, error in result.failed:
+                print(f'Failed notebook: {path}\n  Error: {error}')
+            notebooks, cells, distinct = index.stats()
+            print(f'{result.indexed} indexed, {result.unchanged} unchanged, '
+                  f'{result.removed} removed, {len(result.failed)} failed.')
+            print(f'{notebooks} notebooks, {cells} code cells, {distinct} distinct.')
+            return 1 if result.failed else 0
+        if args.action == 'top':
+            for duplicate in index.top(args.n):
+                first = duplicate.text.splitlines()[0]
+                more = ' ...' if '\n' in duplicate.text else ''
+                print(f'{duplicate.notebooks:6} notebooks {duplicate.cells:6} cells  '
+                      f'{first}{more}')
+            return 0
+        found = index.find(source, args.near)
+        for occurrence in found:
+            similar = f' ({occurrence.similarity:.0%} similar)' if occurrence.similarity < 1 else ''
+            print(f'{occurrence.path}: cell {occurrence.cell}{similar}')
+        return 0 if found else 1
+
+
+def serve_main(argv: Sequence[str]) -> int:
+    """Entry point for ``tidy_nb serve``."""
+    from .server import default_socket_path
+
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} serve',
+        description='Run a warm conversion server on a Unix socket.',
+    )
+    parser.add_argument(
+        '--socket',
+        default=default_socket_path(),
+        help='Socket path (default: %(default)s).',
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=_positive_int,
+        default=1,
+        help='Worker processes; 1 converts in a thread of the server (default: 1).',
+    )
+    args = parser.parse_args(argv)
+
+    import asyncio
+    import signal
+
+    from .server import serve
+
+    async def run() -> None:
+        # Stop cleanly, removing the socket, when asked to terminate.
+        task = asyncio.current_task()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        await serve(
+            args.socket, args.jobs,
+            ready=lambda: print(f'Serving on {args.socket} (Ctrl+C to stop)', flush=True),
+        )
+
+    try:
+        asyncio.run(run())
+    except (RuntimeError, OSError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
+
+
+def client_main(argv: Sequence[str]) -> int:
+    """
+    Entry point for ``tidy_nb client``.
+
+    Forwards the files to a running server in one batch, or converts them
+    in this process when no server is running or the one running belongs
+    to another user. A server that does not answer in time is reported,
+    not silently bypassed.
+    """
+    from .server import default_socket_path
+
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} client',
+        description='Convert notebooks through a running tidy_nb server.',
+    )
+    parser.add_argument('notebooks', nargs='+', help='Notebooks to convert.')
+    parser.add_argument(
+        '--socket',
+        default=default_socket_path(),
+        help='Socket path (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Write .ipynb output as compact JSON without indentation.',
+    )
+    parser.add_argument(
+        '--timeout',
+        type=_positive_float,
+        default=60,
+        help='Seconds to wait for the server to answer (default: %(default)s).',
+    )
+    args = parser.parse_args(argv)
+
+    from .batch import NOTEBOOK_SUFFIX, convert_file, target_path
+    from .server import Item, ServerError, UntrustedSocketError, request
+    from .writers import write_if_changed
+
+    failed = 0
+    items = []
+    targets = []
+    for source in args.notebooks:
+        target = target_path(source)
+        try:
+            if target is None:
+                raise ValueError(f"Unsupported file type '{source}'.")
+            with open(source, 'rb') as f:
+                data = f.read()
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f'Failed notebook: {source}\n  Error: {e}')
+            continue
+        direction = (
+            'jupyter_to_marimo' if source.endswith(NOTEBOOK_SUFFIX) else 'marimo_to_jupyter'
+        )
+        items.append(Item(direction, data, args.compact))
+        targets.append((source, target))
+
+    results: list | None = None
+    error = None
+    try:
+        results = request(items, args.socket, args.timeout)
+    except UntrustedSocketError as e:
+        # Nothing was sent; convert here rather than trust that server.
+        print(f'Warning: {e} Converting without it.', file=sys.stderr)
+    except TimeoutError:
+        error = f'Error: The server on {args.socket} did not answer in time.'
+    except OSError:
+        # No server: fall back to converting here.
+        pass
+
+    for i, (source, target) in enumerate(targets):
+        if error is not None:
+            ok, message = False, error
+        elif results is None:
+            result = convert_file(source, compact=args.compact)
+            ok, message = result.ok, result.message
+        elif isinstance(results[i], ServerError):
+            ok, message = False, f'Error: {results[i]}'
+        else:
+            try:
+                write_if_changed(target, results[i])
+                ok, message = True, ''
+            except OSError as e:
+                ok, message = False, f'Error writing output file: {e}'
+        if ok:
+            print(f'Tidied notebook: {source} -> {target}')
+        else:
+            failed += 1
+            print(f'Failed notebook: {source}')
+            for line in message.splitlines():
+                print(f'  {line}')
+
+    if failed:
+        return 1
+    return 0
+
+
+def strip_main(argv: Sequence[str]) -> int:
+    """Entry point for ``tidy_nb strip``."""
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} strip',
+        description='Remove outputs, execution counts and noisy metadata from notebooks.',
+    )
+    parser.add_argument(
+        'notebooks',
+        nargs='*',
+        help='Notebooks to strip: files, directories or glob patterns.',
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=_positive_int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs).',
+    )
+    parser.add_argument(
+        '--keep-output',
+        action='store_true',
+        help='Keep cell outputs.',
+    )
+    parser.add_argument(
+        '--keep-count',
+        action='store_true',
+        help='Keep execution counts.',
+    )
+    parser.add_argument(
+        '--extra-keys',
+        default='',
+        help='Space-separated metadata.KEY or cell.metadata.KEY entries to remove as well.',
+    )
+    args = parser.parse_args(argv)
+
+    from .batch import collect_notebooks
+    from .strip import StripOptions, parse_extra_keys, strip_many
+
+    try:
+        options = parse_extra_keys(
+            args.extra_keys.split(),
+            StripOptions(keep_output=args.keep_output, keep_count=args.keep_count),
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    sources = collect_notebooks(args.notebooks)
+
+    changed = failed = 0
+    for result in strip_many(sources, args.jobs, options):
+        if result.error is not None:
+            failed += 1
+            print(f'Failed notebook: {result.path}\n  Error: {result.error}')
+        elif result.changed:
+            changed += 1
+            print(f'Stripped notebook: {result.path}')
+
+    if sources:
+        unchanged = len(sources) - changed - failed
+        print(f'{changed} stripped, {unchanged} unchanged, {failed} failed.')
+
+    if failed:
+        return 1
+    return 0
+
+
+def analyze_main(argv: Sequence[str]) -> int:
+    """Entry point for ``tidy_nb analyze``."""
+    from .analyze import DEFAULT_TOP_CAPACITY
+
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} analyze',
+        description='Gather statistics across a corpus of notebooks.',
+    )
+    parser.add_argument(
+        'notebooks',
+        nargs='*',
+        help='Notebooks to scan: files, directories or glob patterns.',
+    )
+    parser.add_argument(
+        '-o', '--output',
+        required=True,
+        help='File for one record per notebook: CSV if it ends in .csv, JSON Lines otherwise.',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Keep the records already in the output and scan only the remaining notebooks.',
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=_positive_int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs).',
+    )
+    parser.add_argument(
+        '--top',
+        type=_positive_int,
+        default=20,
+        help='Number of most common imports to list (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--top-capacity',
+        type=_positive_int,
+        default=DEFAULT_TOP_CAPACITY,
+        help='Distinct imports to track; counts are approximate beyond it '
+             '(default: %(default)s).',
+    )
+    args = parser.parse_args(argv)
+
+    from .analyze import CorpusSummary, scan_corpus
+    from .batch import collect_notebooks
+
+    sources = collect_notebooks(args.notebooks)
+    summary = CorpusSummary(args.top_capacity)
+    try:
+        for record in scan_corpus(sources, args.output, summary, args.jobs, args.resume):
+            if record.error is not None:
+                print(f'Failed notebook: {record.path}\n  Error: {record.error}')
+    except (OSError, ValueError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+
+    for line in summary.report(args.top):
+        print(line)
+    return 0
+
+
+def tidy_main(argv: Sequence[str]) -> int:
+    """Entry point for ``tidy_nb tidy``."""
+    from .transforms import DEFAULT_PASSES, PASSES
+
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} tidy',
+        description='Tidy notebooks in place, running every pass in a single walk over the cells.',
+    )
+    parser.add_argument(
+        'notebooks',
+        nargs='*',
+        help='Notebooks to tidy: files, directories or glob patterns.',
+    )
+    parser.add_argument(
+        '--passes',
+        default=','.join(DEFAULT_PASSES),
+        help=f'Comma-separated passes, run in order; choose from {", ".join(PASSES)} '
+             '(default: %(default)s).',
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=_positive_int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs).',
+    )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help='Print the time spent in each pass, summed over all notebooks.',
+    )
+    args = parser.parse_args(argv)
+
+    from .batch import collect_notebooks
+    from .transforms import parse_passes, tidy_many
+
+    try:
+        names = parse_passes(args.passes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    sources = collect_notebooks(args.notebooks)
+
+    changed = failed = 0
+    timings: dict[str, int] = {}
+    for result in tidy_many(sources, names, args.jobs):
+        if result.error is not None:
+            failed += 1
+            print(f'Failed notebook: {result.path}\n  Error: {result.error}')
+            continue
+        if result.changed:
+            changed += 1
+            print(f'Tidied notebook: {result.path}')
+        for name, ns in result.timings.items():
+            timings[name] = timings.get(name, 0) + ns
+
+    if sources:
+        unchanged = len(sources) - changed - failed
+        print(f'{changed} tidied, {unchanged} unchanged, {failed} failed.')
+    if args.timings and timings:
+        total = sum(timings.values()) or 1
+        width = max(map(len, timings))
+        for name, ns in timings.items():
+            print(f'  {name:<{width}}  {ns / 1e6:10.1f} ms  {ns / total:6.1%}')
+
+    if failed:
+        return 1
+    return 0
+
+
+def validate_main(argv: Sequence[str]) -> int:
+    """Entry point for ``tidy_nb validate``."""
+    parser = argparse.ArgumentParser(
+        prog=f'{PROG} validate',
+        description='Check notebooks against the nbformat 4 structure.',
+    )
+    parser.add_argument(
+        'notebooks',
+        nargs='*',
+        help='Notebooks to check: files, directories or glob patterns.',
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=_positive_int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs).',
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Also check notebooks that pass against the full nbformat JSON schema (slow).',
+    )
+    args = parser.parse_args(argv)
+
+    from .batch import collect_notebooks
+    from .validate import validate_many
+
+    sources = collect_notebooks(args.notebooks)
+
+    invalid = 0
+    for result in validate_many(sources, args.jobs, args.full):
+        if result.errors:
+            invalid += 1
+            print(f'Invalid notebook: {result.path}')
+            for error in result.errors:
+                print(f'  {error}')
+
+    if sources:
+        print(f'{len(sources) - invalid} valid, {invalid} invalid.')
+
+    if invalid:
+        return 1
+    return 0
+
+
+def _print_statuses(statuses: Counter[str]) -> None:
+    """Report what happened to the outputs of the files converted."""
+    from .batch import SKIPPED, UNCHANGED, WRITTEN
+
+    print(f'{statuses[WRITTEN]} written, {statuses[SKIPPED]} skipped, '
+          f'{statuses[UNCHANGED]} unchanged.')
+
+
+def _since_main(args: argparse.Namespace) -> int:
+    """Convert the notebooks git reports as changed since args.since."""
+    from collections import Counter
+
+    from .vcs import GitError, convert_since
+
+    converted = failed = 0
+    statuses: Counter[str] = Counter()
+    try:
+        for result in convert_since(args.since, args.notebooks, args.jobs,
+                                    compact=args.compact, dataflow=args.dataflow):
+            if result.ok:
+                converted += 1
+                statuses[result.status] += 1
+                print(f'Tidied notebook: {result.source} -> {result.target}')
+            else:
+                failed += 1
+                print(f'Failed notebook: {result.source}')
+                for line in result.message.splitlines():
+                    print(f'  {line}')
+    except (GitError, ValueError) as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+
+    _print_statuses(statuses)
+    print(f'{converted} converted, {failed} failed.')
+    if failed:
+        return 1
+    return 0
+
+
+def _execute(kernels, paths: Sequence[str], compact: bool) -> int:
+    """Run the notebooks at paths on kernels; return how many failed."""
+    from .kernels import execute_many
+
+    failed = 0
+    for result in execute_many(paths, kernels, compact=compact):
+        if result.error is None:
+            print(f'Executed notebook: {result.path} ({result.cells} cells)')
+        else:
+            failed += 1
+            print(f'Failed to execute notebook: {result.path}\n  Error: {result.error}')
+    print(f'{len(paths) - failed} executed, {failed} failed.')
+    return failed
+
+
+COMMANDS = {
+    'analyze': analyze_main,
+    'client': client_main,
+    'dupes': dupes_main,
+    'serve': serve_main,
+    'strip': strip_main,
+    'tidy': tidy_main,
+    'validate': validate_main,
+    'watch': watch_main,
+}
+
+
 def main(argv: Sequence[str] | None = None) -> int:
     """Main entry point for the tidy_nb CLI."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        return COMMANDS[argv[0]](argv[1:])
 
-    parser = argparse.ArgumentParser(prog=PROG, description=pkg_description)
-    parser.add_argument('notebooks', nargs='*', help='Notebooks to tidy.')  
+    parser = argparse.ArgumentParser(
+        prog=PROG,
+        description=pkg_description,
+        epilog=f'Other commands: {", ".join(COMMANDS)} (see {PROG} <command> --help).',
+    )
+    parser.add_argument(
+        'notebooks',
+        nargs='*',
+        help='Notebooks to tidy: files, directories or glob patterns.',
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=_positive_int,
+        default=None,
+        help='Number of worker processes (default: number of CPUs).',
+    )
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        help='Write .ipynb output as compact JSON without indentation.',
+    )
+    parser.add_argument(
+        '--dataflow',
+        action='store_true',
+        help='Pass values between marimo cells as parameters and returns.',
+    )
+    parser.add_argument(
+        '--since',
+        metavar='REV',
+        default=None,
+        help='Only convert notebooks changed between REV and HEAD (or in a REV..REV '
+             'range), read from git; paths given limit the search.',
+    )
+    parser.add_argument(
+        '--to',
+        metavar='FORMATS',
+        default=None,
+        help='Comma-separated output formats (marimo, ipynb, percent); each input is '
+             'read once and written in all of them.',
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='TRACE',
+        default=None,
+        help='Print per-phase and slowest-cell timings and write a Chrome trace to TRACE.',
+    )
+    parser.add_argument(
+        '--blob-store',
+        metavar='DIR',
+        default=None,
+        help='Keep outputs in a content-addressed store in DIR, each stored once, '
+             'instead of dropping them; converting back restores them.',
+    )
+    parser.add_argument(
+        '--validate',
+        action='store_true',
+        help='Check each .ipynb input against the nbformat 4 structure first and '
+             'skip it, listing every problem, if it is invalid.',
+    )
+    parser.add_argument(
+        '--execute',
+        action='store_true',
+        help='Run the generated .ipynb notebooks on a pool of pre-started kernels '
+             '(one per job) and save their outputs.',
+    )
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Overlap reading, converting and writing files, for notebooks on slow or '
+             'network filesystems; the cache is not used.',
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='cache',
+        action='store_false',
+        help='Convert every file even if it is unchanged since the last run.',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='Directory for the conversion cache (default: ~/.cache/tidy_nb).',
+    )
     parser.add_argument(
         '--version',
         action='version',
@@ -27,16 +730,96 @@ def main(argv: Sequence[str] | None = None) -> int:
 
     args = parser.parse_args(argv)
 
+    formats = None
+    if args.to is not None:
+        from .emit import parse_formats
+        try:
+            formats = parse_formats(args.to)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.since is not None:
+        if (formats is not None or args.profile or args.pipeline or args.blob_store or
+                args.validate or args.execute):
+            parser.error('--since cannot be combined with --to, --profile, --pipeline, '
+                         '--blob-store, --validate or --execute')
+        return _since_main(args)
+    if args.execute and formats is not None:
+        parser.error('--execute cannot be combined with --to')
+    if args.pipeline and (formats is not None or args.profile or args.blob_store or
+                          args.validate):
+        parser.error('--pipeline cannot be combined with --to, --profile, --blob-store '
+                     'or --validate')
+    if args.blob_store and formats is not None:
+        parser.error('--blob-store cannot be combined with --to')
+
+    from .batch import NOTEBOOK_SUFFIX, collect_notebooks, convert_many
+
+    sources = collect_notebooks(args.notebooks)
+
+    kernels = None
+    if args.execute:
+        # Started now, so the kernels boot while the files are converted.
+        from .batch import MARIMO_SUFFIX, default_jobs
+        from .kernels import KernelPool
+        count = sum(1 for source in sources if source.endswith(MARIMO_SUFFIX))
+        if count:
+            kernels = KernelPool(min(args.jobs or default_jobs(), count))
+
+    profiler = None
+    if args.profile:
+        from .profile import Profiler
+        profiler = Profiler()
+
+    if args.pipeline:
+        from .pipeline import convert_pipelined
+        results = convert_pipelined(sources, args.jobs, compact=args.compact,
+                                    dataflow=args.dataflow)
+    else:
+        results = convert_many(
+            sources, args.jobs, args.cache, args.cache_dir,
+            compact=args.compact, dataflow=args.dataflow, profile=profiler is not None,
+            to=formats, blob_store=args.blob_store, validate=args.validate,
+        )
+
+    from collections import Counter
+
+    failed = 0
+    statuses: Counter[str] = Counter()
+    notebooks = []
+    try:
+        for i, result in enumerate(results):
+            if result.profile:
+                profiler.merge(result.profile, file=result.source, tid=i)
+            if result.ok:
+                statuses[result.status] += 1
+                print(f'Tidied notebook: {result.source} -> {result.target}')
+                if result.target.endswith(NOTEBOOK_SUFFIX):
+                    notebooks.append(result.target)
+            else:
+                failed += 1
+                print(f'Failed notebook: {result.source}')
+                for line in result.message.splitlines():
+                    print(f'  {line}')
+
+        if sources:
+            _print_statuses(statuses)
+            print(f'{len(sources) - failed} converted, {failed} failed.')
 
-    nb_processed = None
+        if kernels is not None:
+            failed += _execute(kernels, notebooks, args.compact)
+    finally:
+        if kernels is not None:
+            kernels.close()
 
-    for nb in args.notebooks:
-        print(f'Tidying notebook: {nb}')
+    if profiler is not None:
+        from .profile import report
+        report(profiler, args.profile)
 
-    if nb_processed:
+    if failed:
         return 1
     return 0
 
 
 if __name__ == '__main__':
-    raise SystemExit(main())
\ No newline at end of file
+    raise SystemExit(main())
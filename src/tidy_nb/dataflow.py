@@ -0,0 +1,161 @@
+"""Dataflow graph between the code cells of a notebook.
+
+Every code cell binds some names at its top level and reads others that it
+does not bind. A read is linked to the cell that binds the name, which
+gives a dependency graph between cells: a marimo cell takes the names it
+reads as parameters and returns the names other cells read from it.
+
+A name bound by more than one cell resolves the way running the notebook
+top to bottom would: to the nearest cell above the reader, or, if no cell
+above binds it, to the first cell below. A cell that reads a name before
+binding it never resolves to itself. Names starting with an underscore
+are private to their cell, as in marimo, and never create an edge.
+"""
+from __future__ import annotations
+
+import heapq
+from bisect import bisect_right
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import AbstractSet, Iterable, Protocol, Sequence
+
+    class _Cell(Protocol):
+        bound: AbstractSet[str]
+        free: AbstractSet[str]
+
+
+class CycleError(ValueError):
+    """The cells depend on each other in a loop, so no order exists."""
+
+
+def _private(name: str) -> bool:
+    return name.startswith('_')
+
+
+class DataflowGraph:
+    """
+    Dependency graph over code cells, identified by their position among
+    the notebook's code cells (0 for the first code cell).
+
+    Built in one pass over the cells plus one over the names read before
+    they are bound, so construction is linear in cells + symbols.
+    """
+
+    # Whether the notebook has markdown cells too; set by whoever reads
+    # the whole notebook to build the graph.
+    has_markdown = False
+
+    def __init__(self, cells: Iterable[_Cell]):
+        self._uses: list[dict[str, int]] = []
+        self._exports: list[set[str]] = []
+        self._children: list[set[int]] = []
+
+        latest: dict[str, int] = {}
+        binders: dict[str, list[int]] = {}
+        pending = []
+        for index, cell in enumerate(cells):
+            self._uses.append({})
+            self._exports.append(set())
+            self._children.append(set())
+            for name in cell.free:
+                if _private(name):
+                    continue
+                source = latest.get(name)
+                if source is None:
+                    pending.append((index, name))
+                else:
+                    self._link(source, index, name)
+            for name in cell.bound:
+                if not _private(name):
+                    latest[name] = index
+                    binders.setdefault(name, []).append(index)
+
+        # Names read above the only cells that bind them: the first binder
+        # below the reader, never the reader itself
+        for index, name in pending:
+            below = binders.get(name, ())
+            position = bisect_right(below, index)
+            if position < len(below):
+                self._link(below[position], index, name)
+
+    def _link(self, source: int, target: int, name: str) -> None:
+        self._uses[target][name] = source
+        self._exports[source].add(name)
+        self._children[source].add(target)
+
+    def __len__(self) -> int:
+        return len(self._uses)
+
+    def params(self, index: int) -> list[str]:
+        """Sorted names cell index reads from other cells."""
+        return sorted(self._uses[index])
+
+    def returns(self, index: int) -> list[str]:
+        """Sorted names of cell index that other cells read."""
+        return sorted(self._exports[index])
+
+    def parents(self, index: int) -> list[int]:
+        """Cells that cell index reads from."""
+        return sorted(set(self._uses[index].values()))
+
+    def children(self, index: int) -> list[int]:
+        """Cells that read from cell index."""
+        return sorted(self._children[index])
+
+    def downstream(self, index: int) -> list[int]:
+        """Every cell that depends on cell index, directly or not, in order."""
+        reached = self._reach([index])
+        reached.discard(index)
+        return sorted(reached)
+
+    def topological_order(self) -> list[int]:
+        """
+        All cells, each after the cells it reads from.
+
+        Independent cells keep notebook order. Raises CycleError if the
+        cells depend on each other in a loop.
+        """
+        return self._order(range(len(self)))
+
+    def stale(self, changed: Iterable[int]) -> list[int]:
+        """
+        The cells to re-run after changed cells were edited: those cells
+        and everything downstream of them, in an order that runs each cell
+        after its inputs.
+        """
+        return self._order(self._reach(changed))
+
+    def _reach(self, start: Iterable[int]) -> set[int]:
+        reached = set(start)
+        stack = list(reached)
+        while stack:
+            for child in self._children[stack.pop()]:
+                if child not in reached:
+                    reached.add(child)
+                    stack.append(child)
+        return reached
+
+    def _order(self, cells: Sequence[int] | set[int]) -> list[int]:
+        """Kahn's algorithm over cells, taking the lowest ready index first."""
+        members = cells if isinstance(cells, set) else set(cells)
+        waiting = {}
+        for index in members:
+            waiting[index] = sum(
+                1 for parent in set(self._uses[index].values()) if parent in members
+            )
+        ready = [index for index, count in waiting.items() if not count]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            index = heapq.heappop(ready)
+            order.append(index)
+            for child in self._children[index]:
+                if child in waiting:
+                    waiting[child] -= 1
+                    if not waiting[child]:
+                        heapq.heappush(ready, child)
+        if len(order) < len(members):
+            loop = sorted(set(members).difference(order))
+            raise CycleError(f'Cells {loop} depend on each other in a loop.')
+        return order
@@ -0,0 +1,403 @@
+"""Index of code cells duplicated across notebooks.
+
+``tidy_nb dupes`` keeps an SQLite database of the code cells of many
+notebooks, .ipynb or marimo .py, as the converters extract them. Each
+cell's source is normalized (blank lines and trailing spaces dropped)
+and stored once under its hash, with a count of the notebooks that
+contain it, so finding a cell's notebooks or listing the most duplicated
+cells are single indexed lookups.
+
+Near-duplicates are found with MinHash over token trigrams. Signatures
+use one-permutation hashing: each trigram is hashed once and lands in
+one of SIGNATURE_SIZE bins, keeping the smallest value per bin, so a
+signature costs one pass over the cell. Locality-sensitive hashing splits
+each signature into BANDS bands; cells sharing any band are candidates,
+and candidates are checked against the full signatures.
+
+Updates are incremental: a notebook whose size and modification time are
+unchanged is not read again, and deleted notebooks are dropped.
+
+The database is marked with its own application_id. A database without
+that mark that already holds tables is refused rather than reset, so a
+mistyped path cannot wipe another database.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import io
+import os
+import re
+import sqlite3
+from array import array
+from typing import TYPE_CHECKING, NamedTuple
+
+from .batch import NOTEBOOK_SUFFIX
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Iterable, Iterator, Sequence
+
+
+INDEX_FORMAT = 1
+APPLICATION_ID = 0x74646E62  # 'tdnb', in the SQLite header
+DB_NAME = 'cells.sqlite3'
+SIGNATURE_SIZE = 64
+BANDS = 16  # Of 4 rows each: pairs above ~0.5 similarity usually share a band
+DEFAULT_THRESHOLD = 0.8
+COMMIT_EVERY = 500  # Files; an interrupted update keeps what it committed
+
+_ROWS = SIGNATURE_SIZE // BANDS
+_BIN_BITS = SIGNATURE_SIZE.bit_length() - 1
+_VALUE_BITS = 64 - _BIN_BITS - 8  # Room to mark the distance of a borrowed value
+_EMPTY = (1 << 64) - 1
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+_SCHEMA = (
+    'CREATE TABLE files ('
+    ' id INTEGER PRIMARY KEY,'
+    ' path TEXT UNIQUE NOT NULL,'
+    ' size INTEGER NOT NULL,'
+    ' mtime_ns INTEGER NOT NULL)',
+    # files: how many notebooks contain the source, kept up to date on
+    # every change so the most duplicated sources come from an index.
+    'CREATE TABLE sources ('
+    ' hash TEXT PRIMARY KEY,'
+    ' text TEXT NOT NULL,'
+    ' signature BLOB NOT NULL,'
+    ' files INTEGER NOT NULL)',
+    'CREATE INDEX sources_files ON sources (files, hash)',
+    'CREATE TABLE cells ('
+    ' file INTEGER NOT NULL,'
+    ' position INTEGER NOT NULL,'
+    ' hash TEXT NOT NULL,'
+    ' PRIMARY KEY (file, position)) WITHOUT ROWID',
+    'CREATE INDEX cells_hash ON cells (hash)',
+    'CREATE TABLE buckets ('
+    ' bucket INTEGER NOT NULL,'
+    ' hash TEXT NOT NULL,'
+    ' PRIMARY KEY (bucket, hash)) WITHOUT ROWID',
+)
+
+
+class IndexFormatError(ValueError):
+    """The database is not a duplicate-cell index."""
+
+
+class Occurrence(NamedTuple):
+    """A cell found in a notebook."""
+
+    path: str
+    cell: int  # Position among all the notebook's cells
+    similarity: float  # Estimated Jaccard similarity to the query; 1.0 if identical
+
+
+class Duplicate(NamedTuple):
+    """A cell source found in more than one notebook."""
+
+    hash: str
+    notebooks: int
+    cells: int
+    text: str
+
+
+class UpdateStats(NamedTuple):
+    """What an index update did."""
+
+    indexed: int  # Files read, new or changed
+    unchanged: int
+    removed: int  # Indexed files that no longer exist
+    failed: list[tuple[str, str]]  # (path, error)
+
+
+def normalize_source(text: str) -> str:
+    """Drop trailing spaces and blank lines, so formatting noise does not count."""
+    return '\n'.join(line.rstrip() for line in text.splitlines() if line.strip())
+
+
+def source_hash(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def signature(normalized: str) -> array:
+    """The MinHash signature of a normalized source."""
+    tokens = _TOKEN.findall(normalized)
+    shingles = {' '.join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))}
+    bins = [_EMPTY] * SIGNATURE_SIZE
+    mask = SIGNATURE_SIZE - 1
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(),
+                           'little')
+        index = h & mask
+        value = h >> (64 - _VALUE_BITS)
+        if value < bins[index]:
+            bins[index] = value
+    # Densify: an empty bin borrows the next filled bin's value, marked with
+    # the distance, so two sources only match there if both borrowed alike.
+    if _EMPTY in bins:
+        original = bins[:]
+        for i, value in enumerate(original):
+            if value == _EMPTY:
+                distance = 1
+                while original[(i + distance) & mask] == _EMPTY:
+                    distance += 1
+                bins[i] = original[(i + distance) & mask] | (distance << _VALUE_BITS)
+    return array('Q', bins)
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of the sources behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / SIGNATURE_SIZE
+
+
+def band_keys(sig: array) -> list[int]:
+    """One LSH bucket per band, as signed 64-bit keys for SQLite."""
+    keys = []
+    for band in range(BANDS):
+        rows = sig[band * _ROWS:(band + 1) * _ROWS]
+        digest = hashlib.blake2b(band.to_bytes(2, 'little') + rows.tobytes(), digest_size=8)
+        keys.append(int.from_bytes(digest.digest(), 'little', signed=True))
+    return keys
+
+
+def code_sources(path: str) -> Iterator[tuple[int, str]]:
+    """The (position, source) of each code cell, as the converters read them."""
+    if path.endswith(NOTEBOOK_SUFFIX):
+        from .reader import iter_cells, source_text
+
+        for position, cell in enumerate(iter_cells(path)):
+            if cell.get('cell_type', 'code') == 'code':
+                yield position, source_text(cell.get('source', ''))
+        return
+
+    from marimo_to_jupyter import parse_marimo_notebook
+
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    # The parser reports syntax errors on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        notebook = parse_marimo_notebook(content)
+    for position, cell in enumerate(notebook):
+        if cell.cell_type == 'code':
+            yield position, cell.source
+
+
+def extract_cells(path: str) -> list[tuple[int, str, str, bytes, list[int]]]:
+    """
+    (position, hash, normalized source, signature, band keys) for each
+    non-empty code cell.
+    """
+    cells = []
+    for position, source in code_sources(path):
+        normalized = normalize_source(source)
+        if normalized:
+            sig = signature(normalized)
+            cells.append((position, source_hash(normalized), normalized, sig.tobytes(),
+                          band_keys(sig)))
+    return cells
+
+
+def _scan(item: tuple[str, int, int]):
+    path, size, mtime_ns = item
+    try:
+        return path, size, mtime_ns, extract_cells(path), None
+    except Exception as e:  # One bad file must not stop the update
+        return path, size, mtime_ns, None, f'{type(e).__name__}: {e}'
+
+
+def _scan_many(items: Sequence[tuple[str, int, int]], jobs: int | None) -> Iterator:
+    from .batch import default_jobs
+
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(items)))
+    if jobs == 1:
+        yield from map(_scan, items)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(items) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(_scan, items, chunksize=chunksize)
+
+
+def default_index_path() -> str:
+    from .cache import default_cache_dir
+
+    return str(default_cache_dir() / DB_NAME)
+
+
+class DuplicateIndex:
+    """
+    On-disk index of code cells across notebooks.
+
+    Use as a context manager, or call close() when done. Raises
+    IndexFormatError for a database that is not an index, and
+    sqlite3.DatabaseError for a file that is not a database.
+    """
+
+    def __init__(self, path: str | PathLike[str] | None = None):
+        self.path = os.fspath(path) if path else default_index_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=30)
+        try:
+            self._open()
+        except BaseException:
+            self._db.close()
+            raise
+
+    def _open(self) -> None:
+        db = self._db
+        (application_id,) = db.execute('PRAGMA application_id').fetchone()
+        tables = [name for (name,) in db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")]
+        if application_id != APPLICATION_ID and tables:
+            raise IndexFormatError(
+                f'{self.path} is not a tidy_nb duplicate-cell index; not touching it.')
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        (version,) = db.execute('PRAGMA user_version').fetchone()
+        if application_id != APPLICATION_ID or version != INDEX_FORMAT:
+            # A new database, or an index in an older format: rebuild it
+            for name in tables:
+                db.execute(f'DROP TABLE {name}')
+            for statement in _SCHEMA:
+                db.execute(statement)
+            db.execute(f'PRAGMA application_id = {APPLICATION_ID}')
+            db.execute(f'PRAGMA user_version = {INDEX_FORMAT}')
+            db.commit()
+
+    def __enter__(self) -> DuplicateIndex:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def _remove(self, file_id: int) -> None:
+        hashes = self._db.execute(
+            'SELECT DISTINCT hash FROM cells WHERE file = ?', (file_id,)).fetchall()
+        self._db.execute('DELETE FROM cells WHERE file = ?', (file_id,))
+        self._db.executemany('UPDATE sources SET files = files - 1 WHERE hash = ?', hashes)
+        self._db.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def _add(self, path: str, size: int, mtime_ns: int,
+             cells: list[tuple[int, str, str, bytes, list[int]]]) -> None:
+        db = self._db
+        file_id = db.execute('INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)',
+                             (path, size, mtime_ns)).lastrowid
+        distinct = {cell[1]: cell for cell in cells}
+        known = set()
+        hashes = list(distinct)
+        for start in range(0, len(hashes), 500):  # Under SQLite's variable limit
+            chunk = hashes[start:start + 500]
+            known.update(digest for (digest,) in db.execute(
+                f'SELECT hash FROM sources WHERE hash IN ({", ".join("?" * len(chunk))})',
+                chunk))
+        new = [cell for digest, cell in distinct.items() if digest not in known]
+        db.executemany('INSERT INTO sources (hash, text, signature, files) VALUES (?, ?, ?, 1)',
+                       [(digest, text, sig) for _, digest, text, sig, _ in new])
+        db.executemany('INSERT OR IGNORE INTO buckets (bucket, hash) VALUES (?, ?)',
+                       [(key, cell[1]) for cell in new for key in cell[4]])
+        db.executemany('UPDATE sources SET files = files + 1 WHERE hash = ?',
+                       [(digest,) for digest in known])
+        db.executemany('INSERT INTO cells (file, position, hash) VALUES (?, ?, ?)',
+                       [(file_id, cell[0], cell[1]) for cell in cells])
+
+    def _prune(self) -> None:
+        """Forget sources no notebook contains any more."""
+        self._db.execute('DELETE FROM buckets WHERE hash IN '
+                         '(SELECT hash FROM sources WHERE files = 0)')
+        self._db.execute('DELETE FROM sources WHERE files = 0')
+
+    def update(self, paths: Iterable[str], jobs: int | None = None) -> UpdateStats:
+        """
+        Bring the index up to date with the notebooks at paths, reading
+        only new and changed files, and drop indexed files that are gone.
+        """
+        known = {path: (file_id, size, mtime_ns) for file_id, path, size, mtime_ns
+                 in self._db.execute('SELECT id, path, size, mtime_ns FROM files')}
+        todo = []
+        unchanged = 0
+        failed = []
+        for path in dict.fromkeys(map(os.path.abspath, paths)):
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                failed.append((path, f'{type(e).__name__}: {e}'))
+                continue
+            entry = known.get(path)
+            if entry is not None and entry[1:] == (st.st_size, st.st_mtime_ns):
+                unchanged += 1
+            else:
+                todo.append((path, st.st_size, st.st_mtime_ns))
+
+        removed = 0
+        for path, (file_id, _, _) in known.items():
+            if not os.path.exists(path):
+                self._remove(file_id)
+                removed += 1
+
+        indexed = 0
+        for path, size, mtime_ns, cells, error in _scan_many(todo, jobs):
+            if error is not None:
+                failed.append((path, error))
+                continue
+            if path in known:
+                self._remove(known[path][0])
+            self._add(path, size, mtime_ns, cells)
+            indexed += 1
+            if indexed % COMMIT_EVERY == 0:
+                self._db.commit()
+        self._prune()
+        self._db.commit()
+        return UpdateStats(indexed, unchanged, removed, failed)
+
+    def _occurrences(self, digest: str, score: float) -> list[Occurrence]:
+        return [Occurrence(path, position, score) for path, position in self._db.execute(
+            'SELECT files.path, cells.position FROM cells JOIN files ON files.id = cells.file '
+            'WHERE cells.hash = ? ORDER BY files.path, cells.position', (digest,))]
+
+    def find(self, source: str, threshold: float | None = None) -> list[Occurrence]:
+        """
+        Where a cell source occurs. With threshold, near-duplicates whose
+        estimated similarity is at least threshold are included too.
+        """
+        normalized = normalize_source(source)
+        digest = source_hash(normalized)
+        found = self._occurrences(digest, 1.0)
+        if threshold is None:
+            return found
+        sig = signature(normalized)
+        keys = band_keys(sig)
+        rows = self._db.execute(
+            'SELECT hash, signature FROM sources WHERE hash IN (SELECT hash FROM buckets '
+            f'WHERE bucket IN ({", ".join("?" * len(keys))})) AND hash != ?',
+            (*keys, digest)).fetchall()
+        scored = []
+        for other, blob in rows:
+            score = similarity(sig, array('Q', blob))
+            if score >= threshold:
+                scored.append((score, other))
+        for score, other in sorted(scored, key=lambda item: -item[0]):
+            found.extend(self._occurrences(other, score))
+        return found
+
+    def top(self, n: int = 20) -> list[Duplicate]:
+        """The n sources found in the most notebooks, if in more than one."""
+        rows = self._db.execute(
+            'SELECT hash, files, text FROM sources WHERE files > 1 '
+            'ORDER BY files DESC, hash DESC LIMIT ?', (n,)).fetchall()
+        return [
+            Duplicate(digest, files, self._db.execute(
+                'SELECT COUNT(*) FROM cells WHERE hash = ?', (digest,)).fetchone()[0], text)
+            for digest, files, text in rows
+        ]
+
+    def stats(self) -> tuple[int, int, int]:
+        """Number of notebooks, cells and distinct sources indexed."""
+        return tuple(self._db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                     for table in ('files', 'cells', 'sources'))
@@ -0,0 +1,135 @@
+"""Parse a notebook once and write it in several formats.
+
+``tidy_nb --to marimo,ipynb,percent`` reads each input a single time and
+feeds every cell to one writer per requested format, so converting to
+three formats costs one read and one parse rather than three.
+"""
+from __future__ import annotations
+
+import contextlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .profile import NULL_PROFILER
+from .writers import atomic_output
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Any, Iterable
+
+    from .profile import Profiler
+
+
+FORMATS = ('marimo', 'ipynb', 'percent')
+PERCENT_SUFFIX = '.pct.py'
+_SUFFIXES = {'marimo': '.py', 'ipynb': '.ipynb', 'percent': PERCENT_SUFFIX}
+
+
+def parse_formats(text: str) -> tuple[str, ...]:
+    """Parse a comma-separated list of format names, keeping their order."""
+    formats = tuple(dict.fromkeys(name.strip() for name in text.split(',') if name.strip()))
+    unknown = [name for name in formats if name not in FORMATS]
+    if unknown or not formats:
+        raise ValueError(
+            f"Unknown format {', '.join(map(repr, unknown)) or repr(text)}; "
+            f"choose from {', '.join(FORMATS)}."
+        )
+    return formats
+
+
+def format_targets(source: str | PathLike[str], formats: Iterable[str]) -> dict[str, str]:
+    """
+    Map each format to its output path next to source. A format whose
+    output would overwrite source itself is left out.
+    """
+    path = Path(source)
+    targets = {}
+    for name in formats:
+        target = path.with_name(path.stem + _SUFFIXES[name])
+        if target != path:
+            targets[name] = str(target)
+    return targets
+
+
+def _read_cells(source: Path, dataflow: bool, profiler: Profiler,
+                stack: contextlib.ExitStack) -> tuple[Iterable[Any], Any]:
+    """
+    The cells of source and, for dataflow, their dependency graph. A
+    notebook is streamed from a file that stack closes.
+    """
+    if source.suffix == '.ipynb':
+        from .reader import iter_stream_cells
+        stream = stack.enter_context(open(source, 'rb'))
+        cells: Iterable[Any] = profiler.cells(iter_stream_cells(profiler.stream(stream)))
+        if not dataflow:
+            return cells, None
+        cells = list(cells)
+        from jupyter_to_marimo import build_dataflow_graph
+        return cells, build_dataflow_graph(cells, profiler)
+
+    from marimo_to_jupyter import parse_marimo_notebook
+    with profiler.span('read'):
+        content = source.read_text(encoding='utf-8')
+    with profiler.span('parse'):
+        notebook = parse_marimo_notebook(content)
+    if not notebook:
+        from .model import Cell
+        notebook = [Cell('code', content)]
+    if not dataflow:
+        return notebook, None
+    from jupyter_to_marimo import build_dataflow_graph
+    return notebook, build_dataflow_graph(notebook, profiler)
+
+
+def emit_formats(
+    source: str | PathLike[str],
+    formats: Iterable[str],
+    compact: bool = False,
+    dataflow: bool = False,
+    profiler: Profiler | None = None,
+) -> dict[str, str]:
+    """
+    Read source (a .ipynb or marimo .py file) once and write it in every
+    format, next to itself. Returns the paths written, by format.
+
+    Each output is written atomically; if reading or rendering fails,
+    none of them is replaced. Raises NotebookFormatError for a malformed
+    notebook and OSError if a file cannot be read or written.
+    """
+    from jupyter_to_marimo import MarimoWriter, has_markdown_cells, stream_has_markdown
+    from marimo_to_jupyter import JupyterWriter
+
+    from .percent import PercentWriter
+
+    profiler = profiler or NULL_PROFILER
+    source = Path(source)
+    targets = format_targets(source, formats)
+    if not source.exists():
+        raise FileNotFoundError(f"Input file '{source}' not found.")
+
+    dataflow = dataflow and 'marimo' in targets
+    with contextlib.ExitStack() as stack:
+        cells, graph = _read_cells(source, dataflow, profiler, stack)
+        writers = []
+        for name, target in targets.items():
+            stream = stack.enter_context(atomic_output(target))
+            if name == 'marimo':
+                if isinstance(cells, Iterator):
+                    with open(source, 'rb') as f:
+                        markdown = stream_has_markdown(f)
+                else:
+                    markdown = has_markdown_cells(cells)
+                writers.append(MarimoWriter(stream, graph=graph, profiler=profiler,
+                                            markdown=markdown))
+            elif name == 'ipynb':
+                writers.append(JupyterWriter(stream, compact, profiler))
+            else:
+                writers.append(PercentWriter(stream, profiler))
+        # Each writer times its own rendering and writing, close() included
+        for cell in cells:
+            for writer in writers:
+                writer.write_cell(cell)
+        for writer in writers:
+            writer.close()
+    return targets
@@ -0,0 +1,204 @@
+"""Cell offset index for random access into large notebooks.
+
+The first scan memory-maps the notebook and records where every cell of
+the ``cells`` array starts and ends. The offsets are saved in a sidecar
+file next to the notebook (``.NAME.ipynb.cellidx``), together with the
+notebook's size and modification time; when either changes the index is
+rebuilt. With an index, reading cells 100:200 of a multi-gigabyte notebook
+touches only those cells' bytes.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .reader import SKIPPED_KEYS, NotebookFormatError, Scanner, read_cell
+from .writers import atomic_output
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Iterator
+
+
+INDEX_FORMAT = 1
+INDEX_SUFFIX = '.cellidx'
+
+
+def index_path(path: str | PathLike[str]) -> Path:
+    """Where the sidecar index for the notebook at path lives."""
+    path = Path(path)
+    return path.with_name(f'.{path.name}{INDEX_SUFFIX}')
+
+
+def parse_cell_range(text: str) -> slice:
+    """
+    Parse a cell range such as ``100:200``, ``:50`` or ``7``.
+
+    Cells are numbered from 0 and the end is excluded, as in a Python
+    slice; negative numbers count from the end.
+    """
+    try:
+        if ':' not in text:
+            index = int(text)
+            return slice(index, index + 1 if index != -1 else None)
+        start, _, stop = text.partition(':')
+        return slice(int(start) if start else None, int(stop) if stop else None)
+    except ValueError:
+        raise ValueError(f"Invalid cell range {text!r}; expected START:STOP.") from None
+
+
+class CellIndex:
+    """Byte offsets of the cells of one version of a notebook."""
+
+    __slots__ = ('size', 'mtime_ns', 'offsets')
+
+    def __init__(self, size: int, mtime_ns: int, offsets: array):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.offsets = offsets  # start, end of cell 0, start, end of cell 1...
+
+    def __len__(self) -> int:
+        return len(self.offsets) // 2
+
+    def span(self, cell: int) -> tuple[int, int]:
+        """The (start, end) byte offsets of a cell."""
+        return self.offsets[2 * cell], self.offsets[2 * cell + 1]
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def save(self, path: str | PathLike[str]) -> None:
+        header = {
+            'format': INDEX_FORMAT,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'cells': len(self),
+        }
+        with atomic_output(path, binary=True) as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            f.write(self.offsets.tobytes())
+
+    @classmethod
+    def load(cls, path: str | PathLike[str]) -> CellIndex | None:
+        """Read a saved index; None if it is missing or unreadable."""
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('format') != INDEX_FORMAT:
+                    return None
+                offsets = array('q')
+                offsets.frombytes(f.read())
+                if len(offsets) != 2 * header['cells']:
+                    return None
+                return cls(header['size'], header['mtime_ns'], offsets)
+        except (OSError, ValueError, AttributeError, KeyError, TypeError):
+            return None
+
+
+def _map(f) -> mmap.mmap:
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # Empty file
+        raise NotebookFormatError('Unexpected end of notebook file.') from None
+
+
+def build_index(path: str | PathLike[str]) -> CellIndex:
+    """Scan the notebook at path through a memory map and index its cells."""
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        with _map(f) as buffer:
+            scanner = Scanner.over(buffer)
+            offsets = array('q')
+            found_cells = False
+            scanner.expect(b'{')
+            if not scanner.at(b'}'):
+                while True:
+                    key = scanner.read_key()
+                    scanner.expect(b':')
+                    if key == 'cells' and not found_cells:
+                        found_cells = True
+                        scanner.expect(b'[')
+                        if not scanner.at(b']'):
+                            while True:
+                                scanner.peek()
+                                offsets.append(scanner.tell())
+                                scanner.skip_value()
+                                offsets.append(scanner.tell())
+                                if not scanner.next_separator(b']'):
+                                    break
+                    else:
+                        scanner.skip_value()
+                    if not scanner.next_separator(b'}'):
+                        break
+    if not found_cells:
+        raise NotebookFormatError("Invalid Jupyter notebook format (no 'cells' key found).")
+    return CellIndex(stat.st_size, stat.st_mtime_ns, offsets)
+
+
+def get_index(path: str | PathLike[str], save: bool = True) -> CellIndex:
+    """
+    Return the index for the notebook at path, loading the sidecar if it
+    is still valid and otherwise building (and, with save, storing) it.
+    """
+    sidecar = index_path(path)
+    index = CellIndex.load(sidecar)
+    if index is not None and index.matches(os.stat(path)):
+        return index
+    index = build_index(path)
+    if save:
+        try:
+            index.save(sidecar)
+        except OSError:
+            pass  # A read-only directory only costs the next run a scan
+    return index
+
+
+def iter_cell_range(
+    path: str | PathLike[str],
+    cells: slice,
+    skip: frozenset[str] = SKIPPED_KEYS,
+    fields: dict | None = None,
+) -> Iterator[tuple[int, dict]]:
+    """
+    Yield (number, cell) for the cells in the given range of the notebook
+    at path, decoding no other cells. If fields is given, the notebook's
+    other top-level keys are decoded into it, as iter_stream_cells does;
+    it is complete once the iterator is exhausted.
+    """
+    index = get_index(path)
+    with open(path, 'rb') as f:
+        if not index.matches(os.fstat(f.fileno())):
+            raise NotebookFormatError(f"'{path}' changed while it was being read.")
+        with _map(f) as buffer:
+            scanner = Scanner.over(buffer)
+            for cell in range(*cells.indices(len(index))):
+                scanner.seek(index.span(cell)[0])
+                yield cell, read_cell(scanner, skip)
+            if fields is not None:
+                _read_fields(scanner, index, fields)
+
+
+def _read_fields(scanner: Scanner, index: CellIndex, fields: dict) -> None:
+    """Decode the top-level keys other than cells, jumping over the cells."""
+    scanner.seek(0)
+    scanner.expect(b'{')
+    if scanner.at(b'}'):
+        return
+    found_cells = False
+    while True:
+        key = scanner.read_key()
+        scanner.expect(b':')
+        if key == 'cells' and not found_cells:
+            found_cells = True
+            scanner.expect(b'[')
+            if len(index):
+                scanner.seek(index.span(len(index) - 1)[1])
+            scanner.expect(b']')
+        else:
+            fields[key] = scanner.read_value()
+        if not scanner.next_separator(b'}'):
+            break
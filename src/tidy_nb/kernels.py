@@ -0,0 +1,269 @@
+"""Execute converted notebooks on a pool of pre-started kernels.
+
+Starting an IPython kernel costs far more than running a typical
+notebook, so ``tidy_nb --execute`` starts a pool of local kernels as soon
+as the command begins, while conversion is still running. Each generated
+notebook then borrows a kernel, runs its code cells, and hands the kernel
+back. Before every notebook the kernel is reset to a fresh session (empty
+namespace, execution count back to 1) in the notebook's directory; a
+kernel that died or timed out is restarted instead. Modules a previous
+notebook imported stay loaded, which is where most of the time is saved.
+
+jupyter_client is imported by the kernels themselves, not by this
+module's importers, so the CLI only pays for it when --execute is given.
+"""
+from __future__ import annotations
+
+import json
+import os
+import queue
+from typing import TYPE_CHECKING, NamedTuple
+
+from .reader import source_text
+from .writers import atomic_output
+
+if TYPE_CHECKING:
+    from typing import Any, Iterator, Sequence
+
+
+DEFAULT_KERNEL = 'python3'
+DEFAULT_TIMEOUT = 600  # Seconds per cell
+STARTUP_TIMEOUT = 60
+
+# Run silently, so the fresh session's execution count stays at 1. The
+# os module is reached without binding a name in the user namespace.
+_RESET = 'get_ipython().reset(new_session=True)\n__import__("os").chdir({cwd!r})'
+
+
+class KernelError(RuntimeError):
+    """Raised when a kernel cannot be started or stops responding."""
+
+
+class ExecutionResult(NamedTuple):
+    """Outcome of executing one notebook."""
+
+    path: str
+    cells: int  # Code cells executed
+    error: str | None = None
+
+
+class Kernel:
+    """One local kernel and its blocking client."""
+
+    def __init__(self, kernel_name: str = DEFAULT_KERNEL):
+        from jupyter_client.manager import KernelManager
+
+        self.manager = KernelManager(kernel_name=kernel_name)
+        self.manager.start_kernel()
+        # The client's channel threads start on first use, so the batch
+        # can still fork its conversion workers in the meantime.
+        self.client = None
+        self._ready = False
+
+    def wait_ready(self) -> None:
+        """Block until the kernel answers, the first time it is used."""
+        if self._ready:
+            return
+        if self.client is None:
+            self.client = self.manager.client()
+            self.client.start_channels()
+        try:
+            self.client.wait_for_ready(timeout=STARTUP_TIMEOUT)
+        except RuntimeError as e:
+            raise KernelError(f'Kernel did not start: {e}') from None
+        self._ready = True
+
+    def restart(self) -> None:
+        self.manager.restart_kernel(now=True)
+        self._ready = False
+        self.wait_ready()
+
+    def _setup(self, cwd: str) -> bool:
+        """Run the session reset and chdir; return whether it succeeded."""
+        try:
+            reply = self.client.execute_interactive(
+                _RESET.format(cwd=cwd), silent=True, store_history=False,
+                timeout=STARTUP_TIMEOUT, output_hook=lambda msg: None,
+            )
+        except TimeoutError:
+            return False
+        return reply['content']['status'] == 'ok'
+
+    def reset(self, cwd: str) -> None:
+        """
+        Start a fresh session in cwd, restarting the kernel if it died or
+        the reset failed. A restarted kernel is set up again, so it too
+        runs in cwd.
+        """
+        if not self.manager.is_alive():
+            self.restart()
+        if self._setup(cwd):
+            return
+        self.restart()
+        if not self._setup(cwd):
+            raise KernelError(f'Kernel could not start a session in {cwd}.')
+
+    def run(self, code: str, timeout: float = DEFAULT_TIMEOUT) -> tuple[dict, list[dict]]:
+        """
+        Execute code; return the execute_reply content and the outputs in
+        nbformat form. On timeout the kernel is restarted and KernelError
+        raised.
+        """
+        outputs: list[dict] = []
+        clear = False
+
+        def collect(msg: dict) -> None:
+            nonlocal clear
+            kind = msg['msg_type']
+            content = msg['content']
+            if kind == 'clear_output':
+                if content.get('wait'):
+                    clear = True
+                else:
+                    outputs.clear()
+                return
+            if kind not in ('stream', 'display_data', 'execute_result', 'error'):
+                return
+            if clear:
+                outputs.clear()
+                clear = False
+            if kind == 'stream':
+                last = outputs[-1] if outputs else None
+                if last and last['output_type'] == 'stream' and last['name'] == content['name']:
+                    last['text'] += content['text']
+                else:
+                    outputs.append({'name': content['name'], 'output_type': 'stream',
+                                    'text': content['text']})
+            elif kind == 'error':
+                outputs.append({'ename': content['ename'], 'evalue': content['evalue'],
+                                'output_type': 'error', 'traceback': content['traceback']})
+            else:
+                output: dict[str, Any] = {'data': content['data'],
+                                          'metadata': content['metadata'],
+                                          'output_type': kind}
+                if kind == 'execute_result':
+                    output['execution_count'] = content['execution_count']
+                outputs.append(output)
+
+        try:
+            reply = self.client.execute_interactive(
+                code, store_history=True, allow_stdin=False, timeout=timeout,
+                output_hook=collect,
+            )
+        except TimeoutError:
+            self.restart()
+            raise KernelError(f'Cell did not finish within {timeout} seconds.') from None
+        return reply['content'], outputs
+
+    def shutdown(self) -> None:
+        if self.client is not None:
+            self.client.stop_channels()
+        self.manager.shutdown_kernel(now=True)
+
+
+class KernelPool:
+    """
+    A fixed number of kernels, all started when the pool is created.
+
+    Kernels start in parallel in the background; acquire() only waits for
+    the one it hands out. Use as a context manager, or call close().
+    """
+
+    def __init__(self, size: int, kernel_name: str = DEFAULT_KERNEL):
+        self.size = size
+        self._kernels = [Kernel(kernel_name) for _ in range(size)]
+        self._idle: queue.Queue[Kernel] = queue.Queue()
+        for kernel in self._kernels:
+            self._idle.put(kernel)
+
+    def __enter__(self) -> KernelPool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def acquire(self, cwd: str) -> Kernel:
+        """Take an idle kernel, reset to a fresh session in cwd."""
+        kernel = self._idle.get()
+        try:
+            kernel.wait_ready()
+            kernel.reset(cwd)
+        except BaseException:
+            self._idle.put(kernel)
+            raise
+        return kernel
+
+    def release(self, kernel: Kernel) -> None:
+        self._idle.put(kernel)
+
+    def close(self) -> None:
+        for kernel in self._kernels:
+            try:
+                kernel.shutdown()
+            except Exception:  # Already gone
+                pass
+
+
+def _dump(notebook: dict, compact: bool) -> str:
+    if compact:
+        return json.dumps(notebook, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(notebook, ensure_ascii=False, indent=2)
+
+
+def execute_notebook(notebook: dict, kernel: Kernel,
+                     timeout: float = DEFAULT_TIMEOUT) -> tuple[int, str | None]:
+    """
+    Run the code cells of notebook in order, storing their outputs and
+    execution counts in it. Stops at the first cell that raises.
+
+    Returns the number of cells run and an error message, or None.
+    """
+    count = 0
+    for i, cell in enumerate(notebook.get('cells', [])):
+        if cell.get('cell_type') != 'code':
+            continue
+        code = source_text(cell.get('source', ''))
+        if not code.strip():
+            continue
+        reply, outputs = kernel.run(code, timeout)
+        cell['execution_count'] = reply.get('execution_count')
+        cell['outputs'] = outputs
+        count += 1
+        if reply['status'] != 'ok':
+            return count, f"Cell {i} raised {reply.get('ename')}: {reply.get('evalue')}"
+    return count, None
+
+
+def execute_file(path: str, pool: KernelPool, timeout: float = DEFAULT_TIMEOUT,
+                 compact: bool = False) -> ExecutionResult:
+    """Execute the notebook at path on a kernel from pool and write the results back."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            notebook = json.load(f)
+        kernel = pool.acquire(os.path.dirname(os.path.abspath(path)))
+        try:
+            count, error = execute_notebook(notebook, kernel, timeout)
+        finally:
+            pool.release(kernel)
+        with atomic_output(path) as f:
+            f.write(_dump(notebook, compact))
+    except Exception as e:  # One bad notebook must not stop the batch
+        return ExecutionResult(path, 0, f'{type(e).__name__}: {e}')
+    return ExecutionResult(path, count, error)
+
+
+def execute_many(
+    paths: Sequence[str],
+    pool: KernelPool,
+    timeout: float = DEFAULT_TIMEOUT,
+    compact: bool = False,
+) -> Iterator[ExecutionResult]:
+    """Execute notebooks, one per kernel at a time, yielding results in order."""
+    if not paths:
+        return
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        yield from executor.map(
+            lambda path: execute_file(path, pool, timeout, compact), paths,
+        )
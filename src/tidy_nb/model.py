@@ -0,0 +1,239 @@
+"""Compact in-memory notebook model shared by the converters.
+
+A Cell is a ``__slots__`` object rather than a dict, and cells with no
+metadata or outputs all point at the same read-only EMPTY_METADATA and
+EMPTY_OUTPUTS instead of each owning a fresh ``{}`` and ``[]``. A
+Notebook interns short cell sources, so the blank and boilerplate cells
+that large notebooks repeat are stored once.
+
+The shared containers are FrozenDict and FrozenList: real dict and list
+subclasses, so ``json.dumps`` writes them directly, that raise TypeError
+on mutation. ``copy.deepcopy`` returns ordinary mutable copies, and so
+does thaw(). Callers that read a cell like a dict, or build a notebook
+with create_jupyter_notebook, get mutable containers as they did before
+the model was shared; only the converters' own paths keep them shared.
+"""
+from __future__ import annotations
+
+import copy
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Iterable, Iterator
+
+
+# Sources up to this many characters are interned per notebook; longer
+# ones are rarely repeated and would only grow the table.
+INTERN_MAX = 80
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f'{type(self).__name__} is shared and read-only; copy it first.')
+
+
+class FrozenDict(dict):
+    """A dict that cannot be changed after it is built."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __copy__(self) -> dict:
+        return dict(self)
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+
+class FrozenList(list):
+    """A list that cannot be changed after it is built."""
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+    def __copy__(self) -> list:
+        return list(self)
+
+    def __deepcopy__(self, memo: dict) -> list:
+        return [copy.deepcopy(value, memo) for value in self]
+
+
+def freeze(value: Any) -> Any:
+    """Return value with every dict and list in it made read-only."""
+    if isinstance(value, dict):
+        return FrozenDict({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Return a mutable copy of a value made read-only by freeze()."""
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return copy.deepcopy(value)
+    return value
+
+
+EMPTY_METADATA = FrozenDict()
+EMPTY_OUTPUTS = FrozenList()
+
+
+_CONTAINERS = frozenset({'metadata', 'outputs'})
+
+
+class Cell:
+    """
+    One notebook cell.
+
+    source is the cell text as one string (a list of lines is also
+    accepted, as nbformat allows both). Cells can be used like the dicts
+    they replace: ``cell['source']``, ``cell.get('cell_type')`` and
+    ``cell['metadata'] = {...}``. Read that way, shared metadata and
+    outputs are swapped for the cell's own mutable copy first.
+    """
+
+    __slots__ = ('cell_type', 'source', 'metadata', 'execution_count', 'outputs', 'id')
+
+    def __init__(
+        self,
+        cell_type: str = 'code',
+        source: str | list[str] = '',
+        metadata: dict = EMPTY_METADATA,
+        execution_count: int | None = None,
+        outputs: list = EMPTY_OUTPUTS,
+        id: str | None = None,
+    ):
+        self.cell_type = cell_type
+        self.source = source
+        self.metadata = metadata
+        self.execution_count = execution_count
+        self.outputs = outputs
+        self.id = id
+
+    @classmethod
+    def from_dict(cls, cell: dict) -> Cell:
+        """Build a Cell from an nbformat-style dict, sharing empty containers."""
+        return cls(
+            sys.intern(cell.get('cell_type', 'code')),
+            cell.get('source', ''),
+            cell.get('metadata') or EMPTY_METADATA,
+            cell.get('execution_count'),
+            cell.get('outputs') or EMPTY_OUTPUTS,
+            cell.get('id'),
+        )
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            value = getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+        if key in _CONTAINERS:
+            value = thaw(value)
+            setattr(self, key, value)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Cell):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f'Cell({self.cell_type!r}, {self.source!r})'
+
+    def to_jupyter(self, intern: Callable[[str], str] | None = None) -> dict:
+        """
+        The cell as an nbformat dict, sharing this cell's containers.
+
+        The source is split into lines; intern, if given, is applied to
+        each line.
+        """
+        source = self.source
+        if isinstance(source, str):
+            source = source.split('\n') if source else ['']
+            if intern is not None:
+                source = [intern(line) for line in source]
+        cell: dict[str, Any] = {'cell_type': self.cell_type}
+        if self.id is not None:
+            cell['id'] = self.id
+        cell['metadata'] = self.metadata
+        cell['source'] = source
+        if self.cell_type == 'code':
+            cell['execution_count'] = self.execution_count
+            cell['outputs'] = self.outputs
+        return cell
+
+
+class Notebook:
+    """
+    An ordered collection of Cells with notebook-level fields.
+
+    fallback is set when a marimo file had no decorated cells and was
+    split up by marimo_to_jupyter.fallback_parse instead.
+    """
+
+    __slots__ = ('cells', 'metadata', 'nbformat', 'nbformat_minor', 'fallback', '_strings')
+
+    def __init__(
+        self,
+        cells: Iterable[Cell] = (),
+        metadata: dict = EMPTY_METADATA,
+        nbformat: int = 4,
+        nbformat_minor: int = 4,
+    ):
+        self.cells = list(cells)
+        self.metadata = metadata
+        self.nbformat = nbformat
+        self.nbformat_minor = nbformat_minor
+        self.fallback = False
+        self._strings: dict[str, str] = {}
+
+    def intern(self, text: str) -> str:
+        """Return the notebook's stored copy of a short string."""
+        if len(text) > INTERN_MAX:
+            return text
+        return self._strings.setdefault(text, text)
+
+    def add(self, cell_type: str, source: str, **fields: Any) -> Cell:
+        """Append a new cell and return it."""
+        cell = Cell(sys.intern(cell_type), self.intern(source), **fields)
+        self.cells.append(cell)
+        return cell
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __iter__(self) -> Iterator[Cell]:
+        return iter(self.cells)
+
+    def __getitem__(self, index):
+        return self.cells[index]
+
+    def to_dict(self) -> dict:
+        """The notebook as an nbformat dict; repeated source lines are shared."""
+        return {
+            'cells': [cell.to_jupyter(self.intern) for cell in self.cells],
+            'metadata': self.metadata,
+            'nbformat': self.nbformat,
+            'nbformat_minor': self.nbformat_minor,
+        }
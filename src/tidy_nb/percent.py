@@ -0,0 +1,88 @@
+"""Writer for jupytext percent scripts.
+
+A percent script is plain Python in which every cell starts with a
+``# %%`` marker; markdown and raw cells are kept as comments::
+
+    # %% [markdown]
+    # # Title
+
+    # %%
+    x = 1
+
+IPython magics and shell escapes are commented out, as jupytext does, so
+the script stays valid Python.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .profile import NULL_PROFILER
+from .writers import LineWriter
+
+if TYPE_CHECKING:
+    from typing import Any, Iterable, TextIO
+
+    from .profile import Profiler
+
+
+PERCENT_HEADER = [
+    '# ---',
+    '# jupyter:',
+    '#   jupytext:',
+    '#     text_representation:',
+    '#       extension: .py',
+    '#       format_name: percent',
+    '# ---',
+]
+_MAGIC_PREFIXES = ('%', '!')
+
+
+def _text(source: Any) -> str:
+    return source if isinstance(source, str) else ''.join(source)
+
+
+def _comment(line: str) -> str:
+    return f'# {line}' if line else '#'
+
+
+class PercentWriter:
+    """
+    Write cells (dicts or Cells) to stream as a percent script. Cells are
+    written as they are rendered, so a profiler records it all as write.
+    """
+
+    def __init__(self, stream: TextIO, profiler: Profiler | None = None):
+        self.span = (profiler or NULL_PROFILER).span
+        self._writer = LineWriter(stream)
+        self._writer.write_lines(PERCENT_HEADER)
+        self.count = 0
+
+    def write_cell(self, cell: Any) -> None:
+        cell_type = cell.get('cell_type', 'code')
+        lines = _text(cell.get('source', '')).rstrip('\n').split('\n')
+        write = self._writer.write
+        with self.span('write'):
+            write('')
+            if cell_type == 'code':
+                write('# %%')
+                for line in lines:
+                    write(_comment(line) if line.startswith(_MAGIC_PREFIXES) else line)
+            else:
+                write(f'# %% [{cell_type}]')
+                for line in lines:
+                    write(_comment(line))
+        self.count += 1
+
+    def close(self) -> int:
+        """Finish the script; returns the number of cells written."""
+        with self.span('write'):
+            self._writer.write('')
+        return self.count
+
+
+def write_percent_script(cells: Iterable[Any], stream: TextIO) -> int:
+    """Write cells as a percent script; returns the number of cells."""
+    writer = PercentWriter(stream)
+    for cell in cells:
+        writer.write_cell(cell)
+    return writer.close()
@@ -0,0 +1,197 @@
+"""Pipelined batch conversion for slow filesystems.
+
+``tidy_nb --pipeline`` splits each conversion into three stages joined by
+bounded queues: reading files (on a pool of I/O threads, several at a
+time), converting them (in worker processes, or one worker thread), and
+writing the results atomically (on the I/O threads again). While one
+notebook is being converted the next ones are already being read and the
+previous ones written, so a batch takes about as long as its slowest
+stage rather than the sum of all three. The queues hold at most ``depth``
+files each, so memory stays bounded however long the batch is.
+
+asyncio coordinates the stages; the blocking calls themselves run in the
+executors.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from .batch import NOTEBOOK_SUFFIX, UNCHANGED, WRITTEN, Result, default_jobs, target_path
+
+if TYPE_CHECKING:
+    from typing import AsyncIterator, Iterator, Sequence
+
+
+DEFAULT_IO_WORKERS = 8
+DEFAULT_DEPTH = 16
+
+
+def _read(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write(path: str, data: bytes) -> bool:
+    from .writers import write_if_changed
+
+    return write_if_changed(path, data)
+
+
+def _convert(source: str, data: bytes, compact: bool, dataflow: bool) -> bytes:
+    """
+    Convert one notebook's bytes. This may run on a thread while the CLI
+    prints on the main one, so the converters are told not to print
+    rather than having sys.stdout swapped out from under it.
+    """
+    from .server import convert_bytes
+
+    direction = (
+        'jupyter_to_marimo' if source.endswith(NOTEBOOK_SUFFIX) else 'marimo_to_jupyter'
+    )
+    return convert_bytes(direction, data, compact, dataflow, quiet=True)
+
+
+def _failed(source: str, target: str | None, e: Exception) -> Result:
+    return Result(source, target, False, f'Error: {type(e).__name__}: {e}')
+
+
+async def pipeline(
+    sources: Sequence[str],
+    jobs: int | None = None,
+    io_workers: int = DEFAULT_IO_WORKERS,
+    depth: int = DEFAULT_DEPTH,
+    compact: bool = False,
+    dataflow: bool = False,
+) -> AsyncIterator[Result]:
+    """
+    Convert sources through the read, convert and write stages, yielding
+    one Result per file in the order given.
+    """
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(sources)))
+    io_workers = max(1, min(io_workers, len(sources)))
+    if not sources:
+        return
+
+    loop = asyncio.get_running_loop()
+    reads: asyncio.Queue = asyncio.Queue(depth)
+    writes: asyncio.Queue = asyncio.Queue(depth)
+    finished: asyncio.Queue = asyncio.Queue()
+    todo = iter(enumerate(sources))
+
+    async def read_stage() -> None:
+        # Workers share one iterator, so files are read roughly in order.
+        for i, source in todo:
+            target = target_path(source)
+            if target is None:
+                await finished.put((i, Result(
+                    source, None, False, f"Error: Unsupported file type '{source}'.")))
+                continue
+            try:
+                data = await loop.run_in_executor(io_pool, _read, source)
+            except OSError as e:
+                await finished.put((i, _failed(source, target, e)))
+                continue
+            await reads.put((i, source, target, data))
+
+    async def convert_stage() -> None:
+        while (item := await reads.get()) is not None:
+            i, source, target, data = item
+            try:
+                output = await loop.run_in_executor(
+                    cpu_pool, _convert, source, data, compact, dataflow,
+                )
+            except Exception as e:  # One bad file must not stop the batch
+                await finished.put((i, _failed(source, target, e)))
+                continue
+            await writes.put((i, source, target, output))
+
+    async def write_stage() -> None:
+        while (item := await writes.get()) is not None:
+            i, source, target, output = item
+            try:
+                written = await loop.run_in_executor(io_pool, _write, target, output)
+            except OSError as e:
+                await finished.put((i, _failed(source, target, e)))
+                continue
+            status = WRITTEN if written else UNCHANGED
+            await finished.put((i, Result(source, target, True, '', status=status)))
+
+    async def run_stages() -> None:
+        try:
+            async with asyncio.TaskGroup() as stages:
+                readers = [stages.create_task(read_stage()) for _ in range(io_workers)]
+                converters = [stages.create_task(convert_stage()) for _ in range(jobs)]
+                writers = [stages.create_task(write_stage()) for _ in range(io_workers)]
+                # Each stage is told to stop once the one before it is done.
+                await asyncio.gather(*readers)
+                for _ in converters:
+                    await reads.put(None)
+                await asyncio.gather(*converters)
+                for _ in writers:
+                    await writes.put(None)
+        finally:
+            finished.put_nowait(None)
+
+    if jobs > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        from .server import warm_up
+        # The I/O threads are already running when workers start, and
+        # forking a threaded process can deadlock the child.
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+        )
+        cpu_pool = ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                                       initializer=warm_up)
+    else:
+        cpu_pool = ThreadPoolExecutor(max_workers=1)
+    io_pool = ThreadPoolExecutor(max_workers=io_workers)
+    runner = asyncio.create_task(run_stages())
+    try:
+        done: dict[int, Result] = {}
+        for i in range(len(sources)):
+            while i not in done:
+                item = await finished.get()
+                if item is None:
+                    await runner  # A stage crashed; raise its error
+                    raise RuntimeError('Pipeline stopped before every file was done.')
+                j, result = item
+                done[j] = result
+            yield done.pop(i)
+        await runner
+    finally:
+        runner.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await runner
+        cpu_pool.shutdown(cancel_futures=True)
+        io_pool.shutdown(cancel_futures=True)
+
+
+def convert_pipelined(
+    sources: Sequence[str],
+    jobs: int | None = None,
+    io_workers: int = DEFAULT_IO_WORKERS,
+    depth: int = DEFAULT_DEPTH,
+    compact: bool = False,
+    dataflow: bool = False,
+) -> Iterator[Result]:
+    """
+    Convert sources with pipeline(), yielding one Result per file in the
+    order given, as convert_many does.
+    """
+    loop = asyncio.new_event_loop()
+    results = pipeline(sources, jobs, io_workers, depth, compact, dataflow)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(results))
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
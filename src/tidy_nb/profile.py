@@ -0,0 +1,187 @@
+"""Per-phase and per-cell profiling for the converters.
+
+A Profiler records spans: a name, a category, start time, duration and
+the net number of memory blocks allocated while the span was open
+(``sys.getallocatedblocks``, which is cheap enough to read around every
+cell). Spans are summarised per phase with the slowest cells listed, and
+can be written as a Chrome trace-event file for chrome://tracing or
+Perfetto.
+
+Converters take ``profiler=None`` and fall back to NULL_PROFILER, whose
+spans are one shared no-op context manager, so profiling costs close to
+nothing when it is off.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, BinaryIO, Iterable, Iterator
+
+    # name, category, start ns, duration ns, allocated blocks, args
+    Event = tuple[str, str, int, int, int, dict]
+
+
+# Phases in the order they happen, for the summary table.
+PHASES = ('read', 'decode', 'parse', 'analyze', 'render', 'write')
+TOP_CELLS = 10
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; records nothing."""
+
+    enabled = False
+
+    def span(self, name: str, category: str = 'phase', **args: Any):
+        return _NULL_SPAN
+
+    def stream(self, stream: BinaryIO) -> BinaryIO:
+        return stream
+
+    def cells(self, cells: Iterable[dict]) -> Iterable[dict]:
+        return cells
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class _TimedStream:
+    """Binary stream wrapper that adds the time spent in read() to a counter."""
+
+    def __init__(self, stream: BinaryIO, profiler: Profiler):
+        self._stream = stream
+        self._profiler = profiler
+
+    def read(self, size: int = -1) -> bytes:
+        start = time.perf_counter_ns()
+        data = self._stream.read(size)
+        self._profiler._read_ns += time.perf_counter_ns() - start
+        return data
+
+
+class Profiler(NullProfiler):
+    """Records spans; see the module docstring."""
+
+    enabled = True
+
+    def __init__(self):
+        self.events: list[Event] = []
+        self._read_ns = 0
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = 'phase', **args: Any) -> Iterator[None]:
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter_ns() - start
+            self.events.append(
+                (name, category, start, duration, sys.getallocatedblocks() - blocks, args)
+            )
+
+    def stream(self, stream: BinaryIO) -> BinaryIO:
+        """Wrap stream so that time spent reading it is counted as 'read'."""
+        return _TimedStream(stream, self)
+
+    def cells(self, cells: Iterable[dict]) -> Iterator[dict]:
+        """
+        Yield from cells, timing each step. Time spent in the wrapped
+        stream's read() is recorded as 'read' and the rest as 'decode'.
+        """
+        iterator = iter(cells)
+        while True:
+            blocks = sys.getallocatedblocks()
+            read_ns = self._read_ns
+            start = time.perf_counter_ns()
+            try:
+                cell = next(iterator)
+            except StopIteration:
+                return
+            duration = time.perf_counter_ns() - start
+            read = self._read_ns - read_ns
+            blocks = sys.getallocatedblocks() - blocks
+            self.events.append(('read', 'phase', start, read, 0, {}))
+            self.events.append(('decode', 'phase', start + read, duration - read, blocks, {}))
+            yield cell
+
+    def merge(self, events: Iterable[Event], **args: Any) -> None:
+        """Add events recorded elsewhere (another process), tagging them with args."""
+        for name, category, start, duration, blocks, event_args in events:
+            self.events.append((name, category, start, duration, blocks, {**event_args, **args}))
+
+    def phase_totals(self) -> dict[str, tuple[int, int]]:
+        """Total (nanoseconds, blocks) per phase, in PHASES order first."""
+        totals: dict[str, list[int]] = {name: [0, 0] for name in PHASES}
+        for name, category, _, duration, blocks, _ in self.events:
+            if category == 'phase':
+                total = totals.setdefault(name, [0, 0])
+                total[0] += duration
+                total[1] += blocks
+        return {name: (ns, blocks) for name, (ns, blocks) in totals.items() if ns or blocks}
+
+    def slowest_cells(self, top: int = TOP_CELLS) -> list[Event]:
+        cells = [event for event in self.events if event[1] == 'cell']
+        cells.sort(key=lambda event: event[3], reverse=True)
+        return cells[:top]
+
+    def summary(self, top: int = TOP_CELLS) -> str:
+        """A phase table and the top slowest cells, as printable text."""
+        total = sum(event[3] for event in self.events if event[1] == 'file')
+        lines = [f'Profile: {total / 1e9:.4f} s in {self._count("file")} file(s), '
+                 f'{self._count("cell")} cell(s)']
+        lines.append(f'  {"phase":<10} {"seconds":>10} {"share":>7} {"blocks":>10}')
+        for name, (ns, blocks) in self.phase_totals().items():
+            share = ns / total if total else 0
+            lines.append(f'  {name:<10} {ns / 1e9:>10.4f} {share:>7.1%} {blocks:>10}')
+        slowest = self.slowest_cells(top)
+        if slowest:
+            lines.append(f'Slowest {len(slowest)} cell(s):')
+            for _, _, _, duration, blocks, args in slowest:
+                where = f"{args['file']} " if 'file' in args else ''
+                lines.append(
+                    f"  {duration / 1e9:.6f} s  {where}cell {args.get('index', '?')} "
+                    f"({args.get('type', '?')}, {blocks} blocks)"
+                )
+        return '\n'.join(lines)
+
+    def _count(self, category: str) -> int:
+        return sum(1 for event in self.events if event[1] == category)
+
+    def trace_events(self) -> list[dict]:
+        """The events in Chrome trace-event format (times in microseconds)."""
+        origin = min((event[2] for event in self.events), default=0)
+        pid = os.getpid()
+        return [
+            {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - origin) / 1000,
+                'dur': duration / 1000,
+                'pid': pid,
+                'tid': args.get('tid', 0),
+                'args': {'blocks': blocks, **args},
+            }
+            for name, category, start, duration, blocks, args in self.events
+        ]
+
+    def write_trace(self, path: str | os.PathLike[str]) -> None:
+        """Write a Chrome trace-event JSON file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
+
+
+def report(profiler: Profiler, trace_path: str | None = None, top: int = TOP_CELLS) -> None:
+    """Print the summary and write the trace file, if one was asked for."""
+    print(profiler.summary(top))
+    if trace_path:
+        profiler.write_trace(trace_path)
+        print(f'Trace written to {trace_path}')
@@ -0,0 +1,284 @@
+"""Streaming reader for Jupyter notebooks.
+
+The reader walks the raw bytes of an ``.ipynb`` file and yields one cell
+at a time. Keys that the converters never look at, ``outputs`` and
+``attachments`` by default, are skipped byte by byte without being decoded
+into Python objects, so memory use stays flat however large the outputs are.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import BinaryIO, Iterator
+    from os import PathLike
+
+
+CHUNK_SIZE = 64 * 1024
+SKIPPED_KEYS = frozenset({'outputs', 'attachments'})
+
+_WHITESPACE = b' \t\r\n'
+_SCALAR_END = re.compile(rb'[,}\]\s]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_STRUCTURAL = re.compile(rb'["\[\]{}]')
+
+
+class NotebookFormatError(ValueError):
+    """Raised when a file is not a well-formed Jupyter notebook."""
+
+
+class Scanner:
+    """Minimal pull scanner over a binary file handle.
+
+    Only the operations the reader, the cell index and strip need are
+    implemented: skipping a JSON value without building it, and capturing
+    the raw bytes of a value so ``json.loads`` can decode it.
+    """
+
+    def __init__(self, stream: BinaryIO | None, chunk_size: int = CHUNK_SIZE):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buf = bytearray()
+        self._pos = 0
+        self._mark: int | None = None
+        self.offset = 0  # Absolute file offset of self._buf[0]
+
+    @classmethod
+    def over(cls, buffer) -> Scanner:
+        """Scan a whole buffer (bytes or an mmap) in place, without copying it."""
+        scanner = cls(None)
+        scanner._buf = buffer
+        return scanner
+
+    def seek(self, pos: int) -> None:
+        """Move to an absolute offset; only valid for scanners made by over()."""
+        self._pos = pos
+
+    def _fill(self) -> bool:
+        """Read another chunk, dropping bytes nobody needs any more."""
+        if self._stream is None:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            return False
+        keep = self._pos if self._mark is None else self._mark
+        if keep:
+            del self._buf[:keep]
+            self.offset += keep
+            self._pos -= keep
+            if self._mark is not None:
+                self._mark -= keep
+        self._buf += chunk
+        return True
+
+    def _eof_error(self) -> NotebookFormatError:
+        return NotebookFormatError('Unexpected end of notebook file.')
+
+    def peek(self) -> int:
+        """Return the next non-whitespace byte without consuming it."""
+        while True:
+            buf = self._buf
+            while self._pos < len(buf) and buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(buf):
+                return buf[self._pos]
+            if not self._fill():
+                raise self._eof_error()
+
+    def expect(self, char: bytes) -> None:
+        if self.peek() != char[0]:
+            found = chr(self._buf[self._pos])
+            raise NotebookFormatError(
+                f'Expected {char.decode()!r} at byte {self.tell()}, found {found!r}.'
+            )
+        self._pos += 1
+
+    def tell(self) -> int:
+        """Absolute offset of the next unconsumed byte."""
+        return self.offset + self._pos
+
+    def _skip_string(self) -> None:
+        # Positioned on the opening quote.
+        self._pos += 1
+        while True:
+            match = _STRING_SPECIAL.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise self._eof_error()
+                continue
+            if match.group() == b'"':
+                self._pos = match.end()
+                return
+            # Backslash: the escaped byte may not be buffered yet.
+            self._pos = match.start()
+            while self._pos + 1 >= len(self._buf):
+                if not self._fill():
+                    raise self._eof_error()
+            self._pos += 2
+
+    def _skip_container(self) -> None:
+        # Positioned on the opening bracket or brace.
+        depth = 0
+        while True:
+            match = _STRUCTURAL.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise self._eof_error()
+                continue
+            char = match.group()
+            self._pos = match.start()
+            if char == b'"':
+                self._skip_string()
+                continue
+            self._pos += 1
+            if char in b'[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _skip_scalar(self) -> None:
+        while True:
+            match = _SCALAR_END.search(self._buf, self._pos)
+            if match is not None:
+                self._pos = match.start()
+                return
+            self._pos = len(self._buf)
+            if not self._fill():
+                return
+
+    def skip_value(self) -> None:
+        """Consume the next value without decoding it."""
+        char = self.peek()
+        if char == ord('"'):
+            self._skip_string()
+        elif char in b'[{':
+            self._skip_container()
+        else:
+            self._skip_scalar()
+
+    def read_value(self):
+        """Consume and decode the next value."""
+        self.peek()
+        self._mark = self._pos
+        try:
+            self.skip_value()
+            raw = bytes(self._buf[self._mark:self._pos])
+        finally:
+            self._mark = None
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            raise NotebookFormatError(f'Invalid JSON value: {e}') from None
+
+    def read_key(self) -> str:
+        if self.peek() != ord('"'):
+            raise NotebookFormatError(f'Expected a key at byte {self.tell()}.')
+        return self.read_value()
+
+    def next_separator(self, close: bytes) -> bool:
+        """Consume ``,`` or the closing character; True if more items follow."""
+        char = self.peek()
+        self._pos += 1
+        if char == ord(','):
+            return True
+        if char == close[0]:
+            return False
+        raise NotebookFormatError(
+            f'Expected {close.decode()!r} or \',\' at byte {self.tell() - 1}.'
+        )
+
+    def at(self, char: bytes) -> bool:
+        """Consume ``char`` if it is next and report whether it was."""
+        if self.peek() == char[0]:
+            self._pos += 1
+            return True
+        return False
+
+
+def read_cell(scanner: Scanner, skip: frozenset[str], measure: bool = False) -> dict:
+    """Decode the cell object the scanner is on, as iter_stream_cells does."""
+    cell = {}
+    scanner.expect(b'{')
+    if scanner.at(b'}'):
+        return cell
+    while True:
+        key = scanner.read_key()
+        scanner.expect(b':')
+        if key in skip:
+            if measure:
+                scanner.peek()
+                start = scanner.tell()
+                scanner.skip_value()
+                cell[key] = scanner.tell() - start
+            else:
+                scanner.skip_value()
+        else:
+            cell[key] = scanner.read_value()
+        if not scanner.next_separator(b'}'):
+            return cell
+
+
+def iter_stream_cells(
+    stream: BinaryIO,
+    skip: frozenset[str] = SKIPPED_KEYS,
+    chunk_size: int = CHUNK_SIZE,
+    fields: dict | None = None,
+    measure: bool = False,
+) -> Iterator[dict]:
+    """Yield the cells of a notebook read from a binary stream.
+
+    Keys listed in ``skip`` are left out of each cell, or with ``measure``
+    kept as the size in bytes of their raw JSON value. If ``fields`` is
+    given, the notebook's other top-level keys (``metadata``,
+    ``nbformat``...) are decoded into it; it is complete once the
+    iterator is exhausted. Raises NotebookFormatError if the stream is not
+    a notebook object with a ``cells`` array.
+    """
+    scanner = Scanner(stream, chunk_size)
+    scanner.expect(b'{')
+    found_cells = False
+    if not scanner.at(b'}'):
+        while True:
+            key = scanner.read_key()
+            scanner.expect(b':')
+            if key == 'cells' and not found_cells:
+                found_cells = True
+                scanner.expect(b'[')
+                if not scanner.at(b']'):
+                    while True:
+                        yield read_cell(scanner, skip, measure)
+                        if not scanner.next_separator(b']'):
+                            break
+            elif fields is not None:
+                fields[key] = scanner.read_value()
+            else:
+                scanner.skip_value()
+            if not scanner.next_separator(b'}'):
+                break
+    if not found_cells:
+        raise NotebookFormatError("Invalid Jupyter notebook format (no 'cells' key found).")
+
+
+def iter_cells(
+    path: str | PathLike[str],
+    skip: frozenset[str] = SKIPPED_KEYS,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[dict]:
+    """Yield the cells of the notebook at ``path`` one at a time."""
+    with open(path, 'rb') as f:
+        yield from iter_stream_cells(f, skip, chunk_size)
+
+
+def source_text(source: str | list[str]) -> str:
+    """Join a notebook cell source, whichever line convention it uses."""
+    if isinstance(source, str):
+        return source
+    if all(line.endswith('\n') for line in source[:-1]):
+        return ''.join(source)
+    return '\n'.join(source)
@@ -0,0 +1,308 @@
+"""Warm conversion server and its thin client.
+
+``tidy_nb serve`` starts a long-lived process listening on a Unix socket.
+The converters are imported once at startup and stay warm, so a request
+costs only the conversion itself, not interpreter startup and imports.
+
+The protocol carries raw bytes both ways. A request is one JSON header
+line followed by the input bodies, back to back::
+
+    {"items": [{"direction": "jupyter_to_marimo", "size": 1234}, ...]}\\n
+    <1234 bytes><...>
+
+and the response has the same shape, with ``ok`` and ``size`` (or
+``error``) for each item. A connection may carry any number of requests.
+
+The socket lives in a directory only its user can open, and the client
+checks that the server it reached runs as the same user before sending
+anything, so another local user cannot read the notebooks or choose
+what is written back.
+
+This module keeps its imports light so the client starts quickly; asyncio
+and the converters are only imported by the server.
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+import socket
+import stat
+import struct
+import tempfile
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from typing import Callable, Sequence
+
+
+class ServerError(Exception):
+    """A conversion the server could not perform."""
+
+
+class UntrustedSocketError(PermissionError):
+    """The socket, or the server behind it, belongs to another user."""
+
+
+class Item(NamedTuple):
+    """One conversion in a batch request."""
+
+    direction: str
+    data: bytes
+    compact: bool = False
+
+
+def _uid() -> int | None:
+    return os.getuid() if hasattr(os, 'getuid') else None
+
+
+def default_socket_path() -> str:
+    """
+    Per-user socket path: in XDG_RUNTIME_DIR when it is set, otherwise in
+    a tidy_nb-<uid> directory of the temp dir that the server creates
+    with mode 0700.
+    """
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if not base:
+        uid = _uid()
+        owner = uid if uid is not None else 'default'
+        base = os.path.join(tempfile.gettempdir(), f'tidy_nb-{owner}')
+    return os.path.join(base, 'tidy_nb.sock')
+
+
+def _private_dir(path: str) -> None:
+    """
+    Create the directory path if needed, with mode 0700, and check that it
+    is a real directory owned by this user that nobody else can open.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise UntrustedSocketError(f'{path} is not a directory.')
+    if _uid() is not None and info.st_uid != _uid():
+        raise UntrustedSocketError(f'{path} belongs to another user.')
+    if info.st_mode & 0o077:
+        raise UntrustedSocketError(f'{path} can be opened by other users (mode '
+                                   f'{stat.S_IMODE(info.st_mode):o}); it should be 0700.')
+
+
+def _check_peer(sock: socket.socket, socket_path: str) -> None:
+    """Raise UntrustedSocketError unless the server runs as this user."""
+    uid = _uid()
+    if uid is None:
+        return
+    if hasattr(socket, 'SO_PEERCRED'):
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        peer = struct.unpack('3i', creds)[1]
+    else:
+        # No peer credentials here; the socket file's owner is the server's
+        peer = os.stat(socket_path).st_uid
+    if peer != uid:
+        raise UntrustedSocketError(
+            f'The server on {socket_path} runs as another user (uid {peer}).')
+
+
+def convert_bytes(direction: str, data: bytes, compact: bool = False,
+                  dataflow: bool = False, quiet: bool = False) -> bytes:
+    """
+    Convert a notebook held in memory and return the output bytes. With
+    quiet the converters print nothing, so it is safe to call from a
+    thread while another one prints.
+    """
+    out = io.StringIO()
+    if direction == 'jupyter_to_marimo':
+        from jupyter_to_marimo import (build_dataflow_graph, stream_has_markdown,
+                                       write_marimo_notebook)
+
+        from .reader import iter_stream_cells
+        if dataflow:
+            graph = build_dataflow_graph(iter_stream_cells(io.BytesIO(data)))
+            markdown = graph.has_markdown
+        else:
+            graph = None
+            markdown = stream_has_markdown(io.BytesIO(data))
+        write_marimo_notebook(iter_stream_cells(io.BytesIO(data)), out, graph=graph,
+                              markdown=markdown)
+    elif direction == 'marimo_to_jupyter':
+        from marimo_to_jupyter import write_marimo_as_jupyter
+        write_marimo_as_jupyter(data.decode('utf-8'), out, compact=compact, quiet=quiet)
+    else:
+        raise ValueError(f'Unknown direction {direction!r}.')
+    return out.getvalue().encode('utf-8')
+
+
+def warm_up() -> None:
+    """Import everything a conversion needs, ahead of the first request."""
+    import jupyter_to_marimo  # noqa: F401
+    import marimo_to_jupyter  # noqa: F401
+
+    from . import reader, writers  # noqa: F401
+
+
+# Client
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        n = sock.recv_into(view[pos:])
+        if not n:
+            raise ConnectionError('Server closed the connection.')
+        pos += n
+    return bytes(buf)
+
+
+def _recv_line(sock: socket.socket, pending: bytearray) -> bytes:
+    while True:
+        end = pending.find(b'\n')
+        if end != -1:
+            line = bytes(pending[:end])
+            del pending[:end + 1]
+            return line
+        chunk = sock.recv(64 * 1024)
+        if not chunk:
+            raise ConnectionError('Server closed the connection.')
+        pending += chunk
+
+
+def request(
+    items: Sequence[Item],
+    socket_path: str | None = None,
+    timeout: float | None = 60,
+) -> list[bytes | ServerError]:
+    """
+    Send a batch of conversions to a running server.
+
+    Returns one entry per item, in order: the output bytes, or a
+    ServerError describing why that item failed. Raises OSError when no
+    server is listening, UntrustedSocketError (before sending anything)
+    when the server belongs to another user, and TimeoutError when it
+    does not answer within timeout seconds.
+    """
+    socket_path = socket_path or default_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        _check_peer(sock, socket_path)
+        header = {'items': [
+            {'direction': item.direction, 'size': len(item.data), 'compact': item.compact}
+            for item in items
+        ]}
+        sock.sendall(json.dumps(header).encode() + b'\n')
+        for item in items:
+            sock.sendall(item.data)
+
+        pending = bytearray()
+        response = json.loads(_recv_line(sock, pending))
+        results: list[bytes | ServerError] = []
+        for entry in response['items']:
+            if not entry['ok']:
+                results.append(ServerError(entry['error']))
+                continue
+            size = entry['size']
+            body = bytes(pending[:size])
+            del pending[:size]
+            if len(body) < size:
+                body += _recv_exactly(sock, size - len(body))
+            results.append(body)
+        return results
+
+
+def is_running(socket_path: str | None = None) -> bool:
+    """Whether a server is accepting connections on socket_path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path or default_socket_path())
+        except OSError:
+            return False
+    return True
+
+
+# Server
+
+
+async def _handle(reader, writer, executor: Executor | None) -> None:
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            items = json.loads(line)['items']
+            bodies = [await reader.readexactly(item['size']) for item in items]
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(
+                        executor, convert_bytes,
+                        item.get('direction'), body, bool(item.get('compact')),
+                    )
+                    for item, body in zip(items, bodies)
+                ),
+                return_exceptions=True,
+            )
+            entries = []
+            outputs = []
+            for result in results:
+                if isinstance(result, Exception):
+                    entries.append({'ok': False, 'error': f'{type(result).__name__}: {result}'})
+                else:
+                    entries.append({'ok': True, 'size': len(result)})
+                    outputs.append(result)
+            writer.write(json.dumps({'items': entries}).encode() + b'\n')
+            writer.writelines(outputs)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError, KeyError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(
+    socket_path: str | None = None,
+    jobs: int = 1,
+    ready: Callable[[], None] | None = None,
+) -> None:
+    """
+    Serve conversions on a Unix socket until cancelled.
+
+    With jobs > 1 conversions run in a pool of warm worker processes;
+    otherwise they run in a worker thread of this process. ready, if
+    given, is called once the socket is accepting connections.
+    """
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+
+    socket_path = socket_path or default_socket_path()
+    if socket_path == default_socket_path():
+        _private_dir(os.path.dirname(socket_path))
+    if os.path.exists(socket_path):
+        if is_running(socket_path):
+            raise RuntimeError(f'A server is already running on {socket_path}.')
+        os.unlink(socket_path)  # Left behind by a server that died
+
+    warm_up()
+    executor = None
+    if jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=warm_up)
+
+    server = await asyncio.start_unix_server(
+        lambda r, w: _handle(r, w, executor), path=socket_path,
+    )
+    try:
+        async with server:
+            if ready is not None:
+                ready()
+            await server.serve_forever()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,292 @@
+"""Strip outputs, execution counts and noisy metadata from notebooks.
+
+What is removed follows nbstripout's defaults, including its
+``keep_output`` cell metadata and its ``--extra-keys`` syntax, but the
+notebook is never decoded and re-serialized. A first pass scans the raw
+bytes, skipping outputs without decoding them, and records the few byte
+ranges that have to change. A second pass copies everything else straight
+through, so formatting, key order and escaping are preserved exactly. A
+notebook with nothing to strip is not written at all.
+"""
+from __future__ import annotations
+
+import shutil
+from functools import partial
+from typing import TYPE_CHECKING, NamedTuple
+
+from .reader import CHUNK_SIZE, NotebookFormatError, Scanner
+from .writers import atomic_output
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import BinaryIO, Iterable, Iterator, Sequence
+
+    Edit = tuple[int, int, bytes]
+
+
+# nbstripout's default extra keys.
+NOTEBOOK_METADATA_KEYS = frozenset({'signature', 'widgets'})
+CELL_METADATA_KEYS = frozenset({
+    'collapsed',
+    'scrolled',
+    'ExecuteTime',
+    'execution',
+    'heading_collapsed',
+    'hidden',
+})
+
+
+class StripResult(NamedTuple):
+    """Outcome of stripping one notebook."""
+
+    path: str
+    changed: bool
+    error: str | None = None
+
+
+class StripOptions(NamedTuple):
+    """What to keep and which metadata keys to remove."""
+
+    keep_output: bool = False
+    keep_count: bool = False
+    notebook_keys: frozenset[str] = NOTEBOOK_METADATA_KEYS
+    cell_keys: frozenset[str] = CELL_METADATA_KEYS
+
+
+def parse_extra_keys(keys: Iterable[str], options: StripOptions = StripOptions()) -> StripOptions:
+    """
+    Add nbstripout-style extra keys to options.
+
+    ``metadata.KEY`` removes a notebook metadata key and
+    ``cell.metadata.KEY`` removes a cell metadata key.
+    """
+    notebook_keys = set(options.notebook_keys)
+    cell_keys = set(options.cell_keys)
+    for key in keys:
+        if key.startswith('cell.metadata.'):
+            cell_keys.add(key[len('cell.metadata.'):])
+        elif key.startswith('metadata.'):
+            notebook_keys.add(key[len('metadata.'):])
+        else:
+            raise ValueError(
+                f"Unsupported key {key!r}: expected 'metadata.KEY' or 'cell.metadata.KEY'."
+            )
+    return options._replace(
+        notebook_keys=frozenset(notebook_keys), cell_keys=frozenset(cell_keys),
+    )
+
+
+def _object_edits(
+    scanner: Scanner,
+    remove: frozenset[str],
+    edits: list[Edit],
+    watch: str | None = None,
+):
+    """
+    Scan an object, adding edits that delete the keys in remove.
+
+    Returns the decoded value of the watch key, or None.
+    """
+    scanner.expect(b'{')
+    body_start = scanner.tell()
+    if scanner.at(b'}'):
+        return None
+    watched = None
+    entries = []  # (start, end, removed) of every key/value pair
+    while True:
+        scanner.peek()
+        start = scanner.tell()
+        key = scanner.read_key()
+        scanner.expect(b':')
+        if key == watch:
+            watched = scanner.read_value()
+        else:
+            scanner.skip_value()
+        entries.append((start, scanner.tell(), key in remove))
+        scanner.peek()
+        close = scanner.tell()
+        if not scanner.next_separator(b'}'):
+            break
+
+    kept = [i for i, entry in enumerate(entries) if not entry[2]]
+    if not kept:
+        if entries:
+            edits.append((body_start, close, b''))
+        return watched
+    last_kept = kept[-1]
+    for i, (start, end, removed) in enumerate(entries[:last_kept]):
+        if removed:
+            # Up to the next key, taking the comma and whitespace with it
+            edits.append((start, entries[i + 1][0], b''))
+    if last_kept < len(entries) - 1:
+        # Trailing keys go with the comma in front of them
+        edits.append((entries[last_kept][1], entries[-1][1], b''))
+    return watched
+
+
+def _count_edit(scanner: Scanner, edits: list[Edit]) -> None:
+    """Null the execution count the scanner is on, unless it already is."""
+    scanner.peek()
+    start = scanner.tell()
+    if scanner.read_value() is not None:
+        edits.append((start, scanner.tell(), b'null'))
+
+
+def _output_count_edits(scanner: Scanner, edits: list[Edit]) -> None:
+    """
+    Scan an outputs array, adding edits that null the execution counts of
+    its execute_result outputs. Only top-level keys of each output are
+    read; their values are skipped.
+    """
+    scanner.expect(b'[')
+    if scanner.at(b']'):
+        return
+    while True:
+        if scanner.peek() != ord('{'):
+            scanner.skip_value()
+        else:
+            scanner.expect(b'{')
+            more = not scanner.at(b'}')
+            while more:
+                key = scanner.read_key()
+                scanner.expect(b':')
+                if key == 'execution_count':
+                    _count_edit(scanner, edits)
+                else:
+                    scanner.skip_value()
+                more = scanner.next_separator(b'}')
+        if not scanner.next_separator(b']'):
+            return
+
+
+def _cell_edits(scanner: Scanner, options: StripOptions, edits: list[Edit]) -> None:
+    scanner.expect(b'{')
+    if scanner.at(b'}'):
+        return
+    outputs = []  # Applied when outputs go
+    kept_outputs = []  # Applied when they are kept
+    keep_output = options.keep_output
+    while True:
+        key = scanner.read_key()
+        scanner.expect(b':')
+        scanner.peek()
+        start = scanner.tell()
+        if key == 'outputs':
+            if options.keep_count:
+                scanner.skip_value()
+            else:
+                _output_count_edits(scanner, kept_outputs)
+            if scanner.tell() - start > 2:
+                outputs.append((start, scanner.tell(), b'[]'))
+        elif key == 'execution_count':
+            # nbstripout nulls counts whether or not outputs are kept
+            if options.keep_count:
+                scanner.skip_value()
+            else:
+                _count_edit(scanner, edits)
+        elif key == 'metadata':
+            if _object_edits(scanner, options.cell_keys, edits, watch='keep_output') is True:
+                keep_output = True
+        else:
+            scanner.skip_value()
+        if not scanner.next_separator(b'}'):
+            break
+    edits.extend(kept_outputs if keep_output else outputs)
+
+
+def strip_edits(
+    stream: BinaryIO,
+    options: StripOptions = StripOptions(),
+    chunk_size: int = CHUNK_SIZE,
+) -> list[Edit]:
+    """
+    Scan a notebook and return the (start, end, replacement) byte edits
+    that strip it, sorted by offset. An empty list means nothing to do.
+    """
+    scanner = Scanner(stream, chunk_size)
+    edits: list[Edit] = []
+    found_cells = False
+    scanner.expect(b'{')
+    if not scanner.at(b'}'):
+        while True:
+            key = scanner.read_key()
+            scanner.expect(b':')
+            if key == 'cells' and not found_cells:
+                found_cells = True
+                scanner.expect(b'[')
+                if not scanner.at(b']'):
+                    while True:
+                        _cell_edits(scanner, options, edits)
+                        if not scanner.next_separator(b']'):
+                            break
+            elif key == 'metadata':
+                _object_edits(scanner, options.notebook_keys, edits)
+            else:
+                scanner.skip_value()
+            if not scanner.next_separator(b'}'):
+                break
+    if not found_cells:
+        raise NotebookFormatError("Invalid Jupyter notebook format (no 'cells' key found).")
+    edits.sort()
+    return edits
+
+
+def _copy(src: BinaryIO, dst: BinaryIO, size: int) -> None:
+    while size > 0:
+        chunk = src.read(min(size, CHUNK_SIZE))
+        if not chunk:
+            break
+        dst.write(chunk)
+        size -= len(chunk)
+
+
+def apply_edits(src: BinaryIO, dst: BinaryIO, edits: Iterable[Edit]) -> None:
+    """Copy src to dst, replacing the byte ranges in edits."""
+    src.seek(0)
+    pos = 0
+    for start, end, replacement in edits:
+        _copy(src, dst, start - pos)
+        dst.write(replacement)
+        src.seek(end)
+        pos = end
+    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def strip_file(path: str | PathLike[str], options: StripOptions = StripOptions()) -> bool:
+    """Strip the notebook at path in place; return whether it changed."""
+    with open(path, 'rb') as src:
+        edits = strip_edits(src, options)
+        if not edits:
+            return False
+        with atomic_output(path, binary=True) as dst:
+            apply_edits(src, dst, edits)
+    return True
+
+
+def _strip_one(path: str, options: StripOptions) -> StripResult:
+    try:
+        return StripResult(path, strip_file(path, options))
+    except Exception as e:  # One bad file must not stop the batch
+        return StripResult(path, False, f'{type(e).__name__}: {e}')
+
+
+def strip_many(
+    paths: Sequence[str],
+    jobs: int | None = None,
+    options: StripOptions = StripOptions(),
+) -> Iterator[StripResult]:
+    """Strip notebooks, in parallel when jobs > 1, yielding results in order."""
+    from .batch import default_jobs
+
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(paths)))
+    strip = partial(_strip_one, options=options)
+    if jobs == 1:
+        yield from map(strip, paths)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(strip, paths, chunksize=chunksize)
@@ -0,0 +1,273 @@
+"""Tidy transforms, fused into a single pass over each notebook.
+
+A transform is a Pass: it sees the cells one at a time, in order, and
+returns each cell (changed or not) or None to drop it. Every pass declares
+the cell keys it reads and the ones it writes. A Pipeline chains passes so
+that the notebook is read once, each cell goes through every pass in turn,
+and the result is written once, however many passes there are.
+
+The declarations also decide what the reader decodes. A key whose first
+pass overwrites it without reading it, such as ``outputs`` under
+strip-outputs, is skipped by the reader rather than decoded only to be
+thrown away.
+
+The time spent in each pass is recorded for every notebook.
+"""
+from __future__ import annotations
+
+import ast
+import io
+import time
+from collections import Counter
+from functools import partial
+from typing import TYPE_CHECKING, NamedTuple
+
+from .reader import iter_stream_cells, source_text
+from .writers import NotebookWriter, atomic_output
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Iterable, Iterator, Sequence
+
+
+class Pass:
+    """
+    One transform, applied to each cell in turn.
+
+    Subclasses set name, reads and writes, and implement cell(). State
+    that spans cells (imports seen so far, the next execution count) is
+    reset by start() before every notebook.
+    """
+
+    name = ''
+    reads: frozenset[str] = frozenset()  # Cell keys looked at
+    writes: frozenset[str] = frozenset()  # Cell keys set or changed
+
+    def start(self) -> None:
+        """Forget any state left from the previous notebook."""
+
+    def cell(self, cell: dict) -> dict | None:
+        """Transform one cell; return None to drop it."""
+        return cell
+
+
+class DropEmptyCells(Pass):
+    """Remove cells whose source is only whitespace."""
+
+    name = 'drop-empty'
+    reads = frozenset({'source'})
+
+    def cell(self, cell: dict) -> dict | None:
+        if source_text(cell.get('source', '')).strip():
+            return cell
+        return None
+
+
+class StripOutputs(Pass):
+    """Empty the outputs of code cells; execution counts are kept."""
+
+    name = 'strip-outputs'
+    reads = frozenset({'cell_type'})
+    writes = frozenset({'outputs'})
+
+    def cell(self, cell: dict) -> dict:
+        if cell.get('cell_type') == 'code':
+            cell['outputs'] = []
+        return cell
+
+
+class NormalizeSource(Pass):
+    """
+    Store every source as nbformat writes it: a list of lines, each
+    ending in a newline except the last.
+    """
+
+    name = 'normalize-source'
+    reads = frozenset({'source'})
+    writes = frozenset({'source'})
+
+    def cell(self, cell: dict) -> dict:
+        if 'source' in cell:
+            cell['source'] = source_text(cell['source']).splitlines(keepends=True)
+        return cell
+
+
+class DedupeImports(Pass):
+    """
+    Remove top-level import statements that an earlier code cell (or an
+    earlier line of the same cell) already ran. Only statements alone on
+    their own line are removed, and cells that do not parse as Python,
+    such as cells using magics, are left alone.
+    """
+
+    name = 'dedupe-imports'
+    reads = frozenset({'cell_type', 'source'})
+    writes = frozenset({'source'})
+
+    def start(self) -> None:
+        self._seen: set[str] = set()
+
+    def cell(self, cell: dict) -> dict:
+        if cell.get('cell_type') != 'code':
+            return cell
+        text = source_text(cell.get('source', ''))
+        try:
+            tree = ast.parse(text)
+        except SyntaxError:
+            return cell
+        statements_on = Counter(
+            line for node in tree.body for line in range(node.lineno, node.end_lineno + 1)
+        )
+        duplicates = set()
+        for node in tree.body:
+            if not isinstance(node, (ast.Import, ast.ImportFrom)):
+                continue
+            if node.lineno != node.end_lineno or statements_on[node.lineno] > 1:
+                continue
+            statement = ast.unparse(node)
+            if statement in self._seen:
+                duplicates.add(node.lineno - 1)
+            self._seen.add(statement)
+        if duplicates:
+            # Split only where ast counts lines; str.splitlines also breaks
+            # on form feeds, \x85, \u2028 and more.
+            lines = io.StringIO(text, newline='').readlines()
+            kept = ''.join(line for i, line in enumerate(lines) if i not in duplicates)
+            source = cell['source']
+            cell['source'] = kept if isinstance(source, str) else kept.splitlines(keepends=True)
+        return cell
+
+
+class Renumber(Pass):
+    """
+    Number executed code cells 1, 2, 3... in notebook order, as if run
+    top to bottom, with their execute_result outputs to match.
+    """
+
+    name = 'renumber'
+    reads = frozenset({'cell_type', 'execution_count', 'outputs'})
+    writes = frozenset({'execution_count', 'outputs'})
+
+    def start(self) -> None:
+        self._count = 0
+
+    def cell(self, cell: dict) -> dict:
+        if cell.get('cell_type') != 'code' or cell.get('execution_count') is None:
+            return cell
+        self._count += 1
+        cell['execution_count'] = self._count
+        for output in cell.get('outputs', []):
+            if output.get('output_type') == 'execute_result':
+                output['execution_count'] = self._count
+        return cell
+
+
+PASSES = {cls.name: cls for cls in (
+    DropEmptyCells, StripOutputs, NormalizeSource, DedupeImports, Renumber,
+)}
+# drop-empty follows dedupe-imports, which can leave a cell empty, so one
+# run is enough.
+DEFAULT_PASSES = ('normalize-source', 'dedupe-imports', 'drop-empty', 'renumber')
+
+
+def parse_passes(text: str) -> tuple[str, ...]:
+    """Parse a comma-separated list of pass names, keeping their order."""
+    names = tuple(dict.fromkeys(name.strip() for name in text.split(',') if name.strip()))
+    unknown = [name for name in names if name not in PASSES]
+    if unknown or not names:
+        raise ValueError(
+            f"Unknown pass {', '.join(map(repr, unknown)) or repr(text)}; "
+            f"choose from {', '.join(PASSES)}."
+        )
+    return names
+
+
+class TidyResult(NamedTuple):
+    """Outcome of tidying one notebook."""
+
+    path: str
+    changed: bool
+    error: str | None = None
+    timings: dict[str, int] | None = None  # Nanoseconds per pass, plus read/write
+
+
+class Pipeline:
+    """Passes fused into one walk over the cells of a notebook."""
+
+    def __init__(self, passes: Iterable[Pass]):
+        self.passes = list(passes)
+        # A key is decoded unless the first pass to touch it only writes it.
+        skip = set()
+        touched: set[str] = set()
+        for p in self.passes:
+            skip.update(p.writes - p.reads - touched)
+            touched.update(p.reads | p.writes)
+        self.skip = frozenset(skip)
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> Pipeline:
+        return cls(PASSES[name]() for name in names)
+
+    def run(self, cells: Iterable[dict], timings: dict[str, int]) -> Iterator[dict]:
+        """Send each cell through every pass, adding each pass's time to timings."""
+        for p in self.passes:
+            p.start()
+            timings.setdefault(p.name, 0)
+        clock = time.perf_counter_ns
+        for cell in cells:
+            for p in self.passes:
+                start = clock()
+                cell = p.cell(cell)
+                timings[p.name] += clock() - start
+                if cell is None:
+                    break
+            else:
+                yield cell
+
+    def tidy_file(self, path: str | PathLike[str]) -> TidyResult:
+        """Tidy the notebook at path in place, in nbformat's layout."""
+        from .batch import file_stamps
+
+        path = str(path)
+        timings: dict[str, int] = {}
+        start = time.perf_counter_ns()
+        before = file_stamps([path])
+        fields: dict = {}
+        try:
+            with open(path, 'rb') as src, atomic_output(path) as dst:
+                writer = NotebookWriter(dst, indent=1, sort_keys=True)
+                for cell in self.run(iter_stream_cells(src, self.skip, fields=fields),
+                                     timings):
+                    writer.write_cell(cell)
+                writer.close(**dict(sorted(fields.items())))
+                dst.write('\n')
+        except Exception as e:  # One bad notebook must not stop the batch
+            return TidyResult(path, False, f'{type(e).__name__}: {e}')
+        timings['read/write'] = time.perf_counter_ns() - start - sum(timings.values())
+        return TidyResult(path, file_stamps([path]) != before, None, timings)
+
+
+def _tidy_one(path: str, names: Sequence[str]) -> TidyResult:
+    return Pipeline.from_names(names).tidy_file(path)
+
+
+def tidy_many(
+    paths: Sequence[str],
+    names: Sequence[str] = DEFAULT_PASSES,
+    jobs: int | None = None,
+) -> Iterator[TidyResult]:
+    """Tidy notebooks with the named passes, in parallel when jobs > 1, in order."""
+    from .batch import default_jobs
+
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(paths)))
+    if jobs == 1:
+        pipeline = Pipeline.from_names(names)
+        yield from map(pipeline.tidy_file, paths)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(partial(_tidy_one, names=names), paths, chunksize=chunksize)
@@ -0,0 +1,281 @@
+"""Structural validation of nbformat 4 notebooks.
+
+Checking a notebook against the full nbformat JSON schema with
+jsonschema is slow on large notebooks. The checks here cover what the
+schema checks in practice: the top-level keys and their types, each
+cell's type, required and allowed keys, source shape, execution count and
+outputs, and that cell ids are well formed and unique. The rules for every
+cell and output type are built once into lookup tables and the notebook
+is checked in a single pass, so validation costs about as much as reading
+the file. Every problem is reported, each with the JSON path of the value
+at fault.
+
+Unlike the converters, the validator needs every value, outputs
+included, so it decodes the file with one ``json.loads``: several times
+faster than the streaming reader when nothing can be skipped.
+
+Full schema validation through nbformat is still available, and only
+imported, when asked for.
+"""
+from __future__ import annotations
+
+import json
+import re
+from functools import partial
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Any, Callable, Iterator, Sequence
+
+
+class ValidationError(NamedTuple):
+    """One problem found in a notebook."""
+
+    path: str  # JSON path, such as $.cells[3].source
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.path}: {self.message}'
+
+
+class ValidationResult(NamedTuple):
+    """Outcome of validating one notebook."""
+
+    path: str
+    errors: list[ValidationError]
+
+
+_ID = re.compile(r'[a-zA-Z0-9_-]{1,64}')
+_BASE_CELL_KEYS = frozenset({'cell_type', 'metadata', 'source'})
+
+# cell_type -> (required keys, allowed keys); id is handled separately.
+CELL_KEYS = {
+    'code': (_BASE_CELL_KEYS | {'execution_count', 'outputs'},
+             _BASE_CELL_KEYS | {'execution_count', 'outputs'}),
+    'markdown': (_BASE_CELL_KEYS, _BASE_CELL_KEYS | {'attachments'}),
+    'raw': (_BASE_CELL_KEYS, _BASE_CELL_KEYS | {'attachments'}),
+}
+
+# output_type -> (required keys, allowed keys)
+OUTPUT_KEYS = {
+    'execute_result': (frozenset({'output_type', 'execution_count', 'data', 'metadata'}),) * 2,
+    'display_data': (frozenset({'output_type', 'data', 'metadata'}),) * 2,
+    'stream': (frozenset({'output_type', 'name', 'text'}),) * 2,
+    'error': (frozenset({'output_type', 'ename', 'evalue', 'traceback'}),) * 2,
+}
+
+NOTEBOOK_KEYS = frozenset({'cells', 'metadata', 'nbformat', 'nbformat_minor'})
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_multiline(value: Any) -> bool:
+    """A string, or a list of strings, as nbformat allows for text."""
+    return isinstance(value, str) or (
+        isinstance(value, list) and all(isinstance(line, str) for line in value)
+    )
+
+
+def _is_count(value: Any) -> bool:
+    return value is None or (_is_int(value) and value >= 0)
+
+
+def _check_keys(value: dict, required: frozenset[str], allowed: frozenset[str],
+                path: str, report: Callable[[str, str], None]) -> None:
+    for key in sorted(required.difference(value)):
+        report(path, f"missing required key '{key}'")
+    for key in sorted(set(value).difference(allowed)):
+        report(f'{path}.{key}', 'unexpected key')
+
+
+def _check_output(output: Any, path: str, report: Callable[[str, str], None]) -> None:
+    if not isinstance(output, dict):
+        report(path, 'expected an object')
+        return
+    output_type = output.get('output_type')
+    keys = OUTPUT_KEYS.get(output_type)
+    if keys is None:
+        report(f'{path}.output_type', f'unknown output type {output_type!r}')
+        return
+    _check_keys(output, *keys, path, report)
+    if 'execution_count' in output and not _is_count(output['execution_count']):
+        report(f'{path}.execution_count', 'expected a non-negative integer or null')
+    for key in ('data', 'metadata'):
+        if key in output and not isinstance(output[key], dict):
+            report(f'{path}.{key}', 'expected an object')
+    if 'text' in output and not _is_multiline(output['text']):
+        report(f'{path}.text', 'expected a string or a list of strings')
+    for key in ('name', 'ename', 'evalue'):
+        if key in output and not isinstance(output[key], str):
+            report(f'{path}.{key}', 'expected a string')
+    traceback = output.get('traceback', [])
+    if not (isinstance(traceback, list) and all(isinstance(line, str) for line in traceback)):
+        report(f'{path}.traceback', 'expected a list of strings')
+
+
+def _check_cell(cell: Any, path: str, ids: dict[str, str] | None,
+                report: Callable[[str, str], None]) -> None:
+    """
+    Check one cell. ids maps the ids seen so far to their cells' paths;
+    None means the notebook predates cell ids (nbformat < 4.5).
+    """
+    if not isinstance(cell, dict):
+        report(path, 'expected an object')
+        return
+    cell_type = cell.get('cell_type')
+    keys = CELL_KEYS.get(cell_type)
+    if keys is None:
+        report(f'{path}.cell_type', f'unknown cell type {cell_type!r}')
+        return
+    required, allowed = keys
+    if ids is not None:
+        required = required | {'id'}
+        allowed = allowed | {'id'}
+    _check_keys(cell, required, allowed, path, report)
+
+    if ids is not None and 'id' in cell:
+        cell_id = cell['id']
+        if not isinstance(cell_id, str) or not _ID.fullmatch(cell_id):
+            report(f'{path}.id', 'expected 1-64 letters, digits, - or _')
+        elif cell_id in ids:
+            report(f'{path}.id', f'duplicate id {cell_id!r}, first used by {ids[cell_id]}')
+        else:
+            ids[cell_id] = path
+
+    if 'source' in cell and not _is_multiline(cell['source']):
+        report(f'{path}.source', 'expected a string or a list of strings')
+    if 'metadata' in cell and not isinstance(cell['metadata'], dict):
+        report(f'{path}.metadata', 'expected an object')
+    if 'attachments' in cell and not isinstance(cell['attachments'], dict):
+        report(f'{path}.attachments', 'expected an object')
+    if cell_type == 'code':
+        if 'execution_count' in cell and not _is_count(cell['execution_count']):
+            report(f'{path}.execution_count', 'expected a non-negative integer or null')
+        outputs = cell.get('outputs', [])
+        if not isinstance(outputs, list):
+            report(f'{path}.outputs', 'expected an array')
+        else:
+            for i, output in enumerate(outputs):
+                _check_output(output, f'{path}.outputs[{i}]', report)
+
+
+def _check_metadata(metadata: Any, report: Callable[[str, str], None]) -> None:
+    if not isinstance(metadata, dict):
+        report('$.metadata', 'expected an object')
+        return
+    kernelspec = metadata.get('kernelspec')
+    if kernelspec is not None:
+        if not isinstance(kernelspec, dict):
+            report('$.metadata.kernelspec', 'expected an object')
+        else:
+            for key in ('name', 'display_name'):
+                if not isinstance(kernelspec.get(key), str):
+                    report(f'$.metadata.kernelspec.{key}', 'expected a string')
+    language_info = metadata.get('language_info')
+    if language_info is not None:
+        if not isinstance(language_info, dict):
+            report('$.metadata.language_info', 'expected an object')
+        elif not isinstance(language_info.get('name'), str):
+            report('$.metadata.language_info.name', 'expected a string')
+
+
+def validate_notebook(notebook: Any) -> list[ValidationError]:
+    """Check a decoded notebook; return every problem found."""
+    errors: list[ValidationError] = []
+
+    def report(path: str, message: str) -> None:
+        errors.append(ValidationError(path, message))
+
+    if not isinstance(notebook, dict):
+        report('$', 'expected an object')
+        return errors
+    _check_keys(notebook, NOTEBOOK_KEYS, NOTEBOOK_KEYS, '$', report)
+    if 'metadata' in notebook:
+        _check_metadata(notebook['metadata'], report)
+    if 'nbformat' in notebook and notebook['nbformat'] != 4:
+        report('$.nbformat', f"expected 4, found {notebook['nbformat']!r}")
+    minor = notebook.get('nbformat_minor', 0)
+    if not (_is_int(minor) and minor >= 0):
+        report('$.nbformat_minor', 'expected a non-negative integer')
+        minor = 0
+
+    cells = notebook.get('cells', [])
+    if not isinstance(cells, list):
+        report('$.cells', 'expected an array')
+        return errors
+    ids: dict[str, str] | None = {} if minor >= 5 else None
+    for index, cell in enumerate(cells):
+        _check_cell(cell, f'$.cells[{index}]', ids, report)
+    return errors
+
+
+def _json_path(parts: Sequence[Any]) -> str:
+    path = '$'
+    for part in parts:
+        path += f'[{part}]' if isinstance(part, int) else f'.{part}'
+    return path
+
+
+def validate_full(path: str | PathLike[str]) -> list[ValidationError]:
+    """Check the notebook at path against the full nbformat JSON schema."""
+    import nbformat
+    from nbformat.validator import iter_validate
+
+    with open(path, encoding='utf-8') as f:
+        notebook = nbformat.read(f, as_version=nbformat.NO_CONVERT)
+    return [
+        ValidationError(_json_path(error.absolute_path), error.message)
+        for error in iter_validate(notebook)
+    ]
+
+
+def validate_file(path: str | PathLike[str], full: bool = False) -> list[ValidationError]:
+    """
+    Check the notebook at path; return every problem found.
+
+    With full, a notebook that passes the structural checks is also
+    checked against the nbformat schema.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        notebook = json.loads(data)
+    except ValueError as e:
+        return [ValidationError('$', f'Invalid JSON: {e}')]
+    errors = validate_notebook(notebook)
+    del notebook
+    if full and not errors:
+        errors = validate_full(path)
+    return errors
+
+
+def _validate_one(path: str, full: bool) -> ValidationResult:
+    try:
+        return ValidationResult(path, validate_file(path, full))
+    except Exception as e:  # One unreadable file must not stop the batch
+        return ValidationResult(path, [ValidationError('$', f'{type(e).__name__}: {e}')])
+
+
+def validate_many(
+    paths: Sequence[str],
+    jobs: int | None = None,
+    full: bool = False,
+) -> Iterator[ValidationResult]:
+    """Validate notebooks, in parallel when jobs > 1, yielding results in order."""
+    from .batch import default_jobs
+
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(paths)))
+    validate = partial(_validate_one, full=full)
+    if jobs == 1:
+        yield from map(validate, paths)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(validate, paths, chunksize=chunksize)
@@ -0,0 +1,191 @@
+"""Convert only the notebooks that changed between two git revisions.
+
+``tidy_nb --since REV`` asks ``git diff`` for the notebooks changed since
+REV, then reads all of their contents through a single ``git cat-file
+--batch`` process rather than one git process per file. The notebooks
+are converted from memory, so the cost grows with the size of the diff,
+not the size of the repository.
+
+Only .ipynb files are picked up, as when a directory is searched.
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import threading
+from functools import partial
+from typing import TYPE_CHECKING
+
+from .batch import NOTEBOOK_SUFFIX, UNCHANGED, WRITTEN, Result, default_jobs, target_path
+
+if TYPE_CHECKING:
+    from typing import Iterable, Iterator, Sequence
+
+
+class GitError(RuntimeError):
+    """Raised when a git command fails."""
+
+
+def _git(args: Sequence[str], cwd: str | None = None) -> bytes:
+    try:
+        process = subprocess.run(['git', *args], cwd=cwd, capture_output=True)
+    except OSError as e:
+        raise GitError(f'Could not run git: {e}') from None
+    if process.returncode:
+        message = process.stderr.decode(errors='replace').strip()
+        raise GitError(message or f'git {args[0]} failed.')
+    return process.stdout
+
+
+def parse_revisions(since: str) -> tuple[str, str]:
+    """
+    Split a --since value into the git diff range and the revision to read.
+
+    ``REV`` compares REV with HEAD; ``A..B`` and ``A...B`` are passed to
+    git diff as they are, and the notebooks are read at B.
+    """
+    for separator in ('...', '..'):
+        base, found, head = since.partition(separator)
+        if found:
+            if not base or not head:
+                raise ValueError(f"Invalid revision range {since!r}; expected A..B.")
+            return since, head
+    return f'{since}..HEAD', 'HEAD'
+
+
+def changed_notebooks(
+    since: str,
+    pathspecs: Sequence[str] = (),
+    cwd: str | None = None,
+) -> tuple[list[str], str]:
+    """
+    Return the .ipynb files that were added or modified in since, relative
+    to cwd, and the revision to read them at.
+    """
+    diff_range, head = parse_revisions(since)
+    output = _git(
+        ['diff', '--name-only', '-z', '--no-renames', '--diff-filter=d', '--relative',
+         diff_range, '--', *pathspecs],
+        cwd,
+    )
+    paths = [
+        path for path in output.decode('utf-8', errors='surrogateescape').split('\0')
+        # cat-file --batch reads one object name per line
+        if path.endswith(NOTEBOOK_SUFFIX) and '\n' not in path
+    ]
+    return paths, head
+
+
+def read_blobs(
+    revision: str,
+    paths: Sequence[str],
+    cwd: str | None = None,
+) -> Iterator[tuple[str, bytes | None]]:
+    """
+    Yield (path, contents) for each path as it is at revision, read through
+    one ``git cat-file --batch`` process. Contents is None for a path that
+    is not a file at that revision.
+    """
+    if not paths:
+        return
+    try:
+        process = subprocess.Popen(
+            ['git', 'cat-file', '--batch'], cwd=cwd,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+    except OSError as e:
+        raise GitError(f'Could not run git: {e}') from None
+
+    # Requests are written from a thread: git answers while it reads, and
+    # writing everything up front could fill its output pipe and stall.
+    def send() -> None:
+        try:
+            with process.stdin:
+                for path in paths:
+                    process.stdin.write(f'{revision}:./{path}\n'.encode('utf-8', 'surrogateescape'))
+        except (BrokenPipeError, ValueError):
+            pass
+
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    stdout = process.stdout
+    try:
+        for path in paths:
+            header = stdout.readline().split()
+            if not header:
+                raise GitError('git cat-file exited before answering every request.')
+            if len(header) != 3 or header[1] != b'blob':
+                # "<name> missing", or not a file (a submodule, say)
+                if len(header) == 3:
+                    stdout.read(int(header[2]) + 1)
+                yield path, None
+                continue
+            data = stdout.read(int(header[2]))
+            stdout.read(1)  # Newline after the contents
+            yield path, data
+    finally:
+        stdout.close()
+        sender.join()
+        process.wait()
+
+
+def convert_blob(item: tuple[str, bytes], compact: bool = False,
+                 dataflow: bool = False) -> Result:
+    """Convert a notebook held in memory and write the result next to its path."""
+    from .server import convert_bytes
+    from .writers import write_if_changed
+
+    source, data = item
+    target = target_path(source)
+    try:
+        output = convert_bytes('jupyter_to_marimo', data, compact, dataflow)
+        written = write_if_changed(target, output)
+    except Exception as e:  # One bad file must not stop the batch
+        return Result(source, target, False, f'Error: {type(e).__name__}: {e}')
+    return Result(source, target, True, '', status=WRITTEN if written else UNCHANGED)
+
+
+def _present(
+    blobs: Iterable[tuple[str, bytes | None]],
+    root: str,
+    missing: list[str],
+) -> Iterator[tuple[str, bytes]]:
+    for path, data in blobs:
+        path = os.path.join(root, path)
+        if data is None:
+            missing.append(path)
+        else:
+            yield path, data
+
+
+def convert_since(
+    since: str,
+    pathspecs: Sequence[str] = (),
+    jobs: int | None = None,
+    compact: bool = False,
+    dataflow: bool = False,
+    cwd: str | None = None,
+) -> Iterator[Result]:
+    """
+    Convert the notebooks changed in since, yielding one Result per file.
+
+    pathspecs limit the search as they do for git diff. Outputs are written
+    to the working tree, next to each notebook. Raises GitError if git
+    cannot list the changes.
+    """
+    paths, head = changed_notebooks(since, pathspecs, cwd)
+    missing: list[str] = []
+    blobs = _present(read_blobs(head, paths, cwd), cwd or '', missing)
+    convert = partial(convert_blob, compact=compact, dataflow=dataflow)
+    jobs = default_jobs() if jobs is None else jobs
+    jobs = max(1, min(jobs, len(paths)))
+    if jobs == 1:
+        yield from map(convert, blobs)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(paths) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from executor.map(convert, blobs, chunksize=chunksize)
+    for path in missing:
+        yield Result(path, target_path(path), False, f'Error: not a file at {head}.')
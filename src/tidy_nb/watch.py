@@ -0,0 +1,252 @@
+"""Keep paired .ipynb and marimo .py files in sync while they are edited.
+
+A pair is ``name.ipynb`` next to a marimo ``name.py``. The watcher polls a
+directory tree, waits for a changed file to settle (debouncing editors
+that save in several writes), then updates its partner. Rendered cells
+are kept in an in-process cache, so an edit only re-analyzes the cells
+whose source changed. When a marimo file changes, the paired notebook is
+patched: cells whose source is unchanged keep their outputs, execution
+counts, ids and metadata.
+
+If both files of a pair change between two syncs, neither is synced,
+since either direction would throw away the other's edit; saving one of
+them again picks the one that wins.
+"""
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .batch import MARIMO_SUFFIX, NOTEBOOK_SUFFIX
+from .cache import MemoryCache
+from .reader import source_text
+from .writers import NotebookWriter, write_if_changed
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Callable, Collection
+
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 0.3
+_SKIPPED_DIRS = frozenset({'.git', '.ipynb_checkpoints', '__pycache__'})
+
+
+def patch_notebook(new: dict, old: dict) -> dict:
+    """
+    Carry state from an existing notebook into a freshly generated one.
+
+    Cells are matched by source text, in order. A matched cell is reused
+    as it was, outputs included; the notebook-level metadata is kept.
+    """
+    previous: dict[tuple[str, str], list[dict]] = {}
+    for cell in old.get('cells', []):
+        key = (cell.get('cell_type'), source_text(cell.get('source', '')))
+        previous.setdefault(key, []).append(cell)
+
+    cells = []
+    for cell in new['cells']:
+        key = (cell['cell_type'], source_text(cell['source']))
+        matches = previous.get(key)
+        cells.append(matches.pop(0) if matches else cell)
+
+    patched = dict(new)
+    patched['cells'] = cells
+    for name in ('metadata', 'nbformat', 'nbformat_minor'):
+        if name in old:
+            patched[name] = old[name]
+    return patched
+
+
+def _partner(path: str) -> tuple[str, str]:
+    """The (notebook, marimo file) pair that path belongs to."""
+    if path.endswith(NOTEBOOK_SUFFIX):
+        return path, path[:-len(NOTEBOOK_SUFFIX)] + MARIMO_SUFFIX
+    return path[:-len(MARIMO_SUFFIX)] + NOTEBOOK_SUFFIX, path
+
+
+def _is_marimo(path: str) -> bool:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return '@app.cell' in f.read()
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+class Watcher:
+    """Poll a directory and sync each changed file to its partner."""
+
+    def __init__(
+        self,
+        root: str | PathLike[str],
+        interval: float = DEFAULT_INTERVAL,
+        debounce: float = DEFAULT_DEBOUNCE,
+        report: Callable[[str], None] = print,
+    ):
+        self.root = Path(root)
+        self.interval = interval
+        self.debounce = debounce
+        self.report = report
+        self.cache = MemoryCache()
+        self._known = self.scan()
+        self._pending: dict[str, tuple[tuple[int, int], float]] = {}
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        """Return (mtime_ns, size) for every watched file under root."""
+        found = {}
+        stack = [self.root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in _SKIPPED_DIRS:
+                            stack.append(entry.path)
+                    elif entry.name.endswith((NOTEBOOK_SUFFIX, MARIMO_SUFFIX)):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        found[entry.path] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    def poll(self, now: float | None = None) -> list[str]:
+        """
+        Scan once and return the files that changed and have since been
+        stable for the debounce period, in sorted order.
+        """
+        now = time.monotonic() if now is None else now
+        current = self.scan()
+        for path, stat in current.items():
+            if self._known.get(path) != stat:
+                pending = self._pending.get(path)
+                if pending is None or pending[0] != stat:
+                    self._pending[path] = (stat, now)
+        for path in list(self._pending):
+            if path not in current:
+                del self._pending[path]
+
+        ready = sorted(
+            path for path, (stat, seen) in self._pending.items()
+            if now - seen >= self.debounce
+        )
+        for path in ready:
+            self._known[path] = self._pending.pop(path)[0]
+        for path in set(self._known) - set(current):
+            del self._known[path]
+        return ready
+
+    def conflict(self, path: str, ready: Collection[str] = ()) -> str | None:
+        """
+        Return the partner of path if it changed too and is ready or still
+        settling, so that syncing either file would lose an edit.
+
+        The partner's change is then taken as seen, and neither file is
+        synced until one of them is saved again.
+        """
+        notebook, marimo = _partner(path)
+        partner = marimo if path == notebook else notebook
+        if partner not in ready and partner not in self._pending:
+            return None
+        if not os.path.exists(notebook) or not _is_marimo(marimo):
+            return None  # Not a pair; sync() leaves it alone anyway
+        self._pending.pop(partner, None)
+        try:
+            st = os.stat(partner)
+            self._known[partner] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        return partner
+
+    def sync(self, path: str) -> str | None:
+        """
+        Update the partner of path; return the partner if it was written.
+
+        Only existing pairs are synced, and only with marimo .py files, so
+        plain Python modules next to a notebook are never overwritten.
+        """
+        notebook, marimo = _partner(path)
+        if path == notebook:
+            target = marimo
+            if not _is_marimo(target):
+                return None
+            changed = self._sync_notebook(path, target)
+        else:
+            target = notebook
+            if not os.path.exists(target) or not _is_marimo(path):
+                return None
+            changed = self._sync_marimo(path, target)
+
+        # Our own write must not be picked up as an edit.
+        try:
+            st = os.stat(target)
+            self._known[target] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        self._pending.pop(target, None)
+        return target if changed else None
+
+    def _sync_notebook(self, path: str, target: str) -> bool:
+        from jupyter_to_marimo import convert_jupyter_to_marimo
+
+        before = self._known.get(target)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ok = convert_jupyter_to_marimo(path, target, cache=self.cache)
+        if not ok:
+            raise ValueError(f"could not convert '{path}'")
+        st = os.stat(target)
+        return before != (st.st_mtime_ns, st.st_size)
+
+    def _sync_marimo(self, path: str, target: str) -> bool:
+        from marimo_to_jupyter import create_jupyter_notebook, parse_marimo_notebook
+
+        with open(path, encoding='utf-8') as f:
+            content = f.read()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cells = parse_marimo_notebook(content)
+        if not cells:
+            raise ValueError(f"no cells found in '{path}'")
+        notebook = create_jupyter_notebook(cells)
+        with open(target, encoding='utf-8') as f:
+            notebook = patch_notebook(notebook, json.load(f))
+        # Written the way nbformat and tidy write notebooks
+        out = io.StringIO()
+        writer = NotebookWriter(out, indent=1, sort_keys=True)
+        for cell in notebook['cells']:
+            writer.write_cell(cell)
+        writer.close(**{key: value for key, value in sorted(notebook.items()) if key != 'cells'})
+        out.write('\n')
+        return write_if_changed(target, out.getvalue())
+
+    def run(self, cycles: int | None = None) -> None:
+        """Poll until interrupted, or for the given number of cycles."""
+        while cycles is None or cycles > 0:
+            ready = self.poll()
+            conflicted = set()
+            for path in ready:
+                if path in conflicted:
+                    continue
+                partner = self.conflict(path, ready)
+                if partner is not None:
+                    conflicted.add(partner)
+                    self.report(f'Not syncing {path}: {partner} changed too. '
+                                'Save the one to keep again to sync it.')
+                    continue
+                try:
+                    target = self.sync(path)
+                except Exception as e:  # Keep watching after a bad save
+                    self.report(f'Failed to sync {path}: {e}')
+                    continue
+                if target:
+                    self.report(f'Synced {path} -> {target}')
+            if cycles is not None:
+                cycles -= 1
+            time.sleep(self.interval)
@@ -0,0 +1,185 @@
+"""Streaming writers for converter output.
+
+The converters hand cells to these writers one at a time, so the largest
+thing held in memory is a single rendered cell rather than the whole
+output document.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Any, Iterable, Iterator, TextIO
+
+
+WRITE_BUFFER = 256 * 1024
+
+
+COMPARE_CHUNK = 1024 * 1024
+
+
+def same_contents(a: str | PathLike[str], b: str | PathLike[str]) -> bool:
+    """True if the files at a and b hold the same bytes; False if either is missing."""
+    try:
+        if os.path.getsize(a) != os.path.getsize(b):
+            return False
+        with open(a, 'rb') as fa, open(b, 'rb') as fb:
+            while True:
+                chunk = fa.read(COMPARE_CHUNK)
+                if chunk != fb.read(COMPARE_CHUNK):
+                    return False
+                if not chunk:
+                    return True
+    except OSError:
+        return False
+
+
+def _create_temp(path: Path, mode: int) -> tuple[int, str]:
+    """
+    Create and open a new file next to path, for writing. The process
+    umask applies to mode, as it does for a plain open().
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    for _ in range(100):
+        tmp = os.path.join(path.parent, f'.{path.name}.{os.urandom(6).hex()}.tmp')
+        try:
+            return os.open(tmp, flags, mode), tmp
+        except FileExistsError:
+            continue
+    raise FileExistsError(f'No free temporary file name next to {path}.')
+
+
+@contextlib.contextmanager
+def atomic_output(path: str | PathLike[str], binary: bool = False) -> Iterator[Any]:
+    """
+    Open a buffered text handle whose contents replace path on success.
+
+    Output goes to a temporary file in the same directory, which is renamed
+    over path when the block exits cleanly and removed if it raises, so a
+    failed conversion never leaves a half-written file behind. If path
+    already holds exactly the new contents it is left alone, keeping its
+    mtime, so watchers and build tools see no change. With binary the
+    handle takes bytes instead of text.
+    """
+    path = Path(path)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        mode = None  # A new file gets the mode open() would give it
+    fd, tmp = _create_temp(path, 0o666 if mode is None else 0o600)
+    try:
+        if mode is not None:
+            os.chmod(tmp, mode)  # Keep the replaced file's mode exactly
+        if binary:
+            f = open(fd, 'wb', buffering=WRITE_BUFFER)
+        else:
+            f = open(fd, 'w', encoding='utf-8', buffering=WRITE_BUFFER)
+        with f:
+            yield f
+        if same_contents(tmp, path):
+            os.unlink(tmp)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def write_if_changed(path: str | PathLike[str], content: str | bytes) -> bool:
+    """
+    Atomically replace path with content unless it already holds exactly
+    that; return whether it was written.
+    """
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    with atomic_output(path, binary=True) as f:
+        f.write(data)
+    return True
+
+
+class LineWriter:
+    """Write lines separated by newlines; the streaming form of '\\n'.join."""
+
+    def __init__(self, stream: TextIO):
+        self._stream = stream
+        self._first = True
+
+    def write(self, line: str) -> None:
+        if self._first:
+            self._first = False
+        else:
+            self._stream.write('\n')
+        self._stream.write(line)
+
+    def write_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.write(line)
+
+
+class NotebookWriter:
+    """
+    Stream a notebook as JSON, one cell at a time.
+
+    The indented form is byte-for-byte what ``json.dump(notebook,
+    indent=indent, sort_keys=sort_keys, ensure_ascii=False)`` produces for
+    a notebook whose first key is ``cells``; indent=1 with sort_keys is
+    the form nbformat writes. With compact=True no whitespace is written at
+    all, for output that only machines read.
+    """
+
+    def __init__(self, stream: TextIO, compact: bool = False, indent: int = 2,
+                 sort_keys: bool = False):
+        self._stream = stream
+        self._compact = compact
+        self._cells = 0
+        self._indent = ' ' * indent
+        if compact:
+            self._dumps_args: dict[str, Any] = {'separators': (',', ':')}
+            stream.write('{"cells":[')
+        else:
+            self._dumps_args = {'indent': indent}
+            stream.write(f'{{\n{self._indent}"cells": [')
+        self._dumps_args['sort_keys'] = sort_keys
+
+    def _dumps(self, value: Any, depth: int) -> str:
+        text = json.dumps(value, ensure_ascii=False, **self._dumps_args)
+        if self._compact:
+            return text
+        # json.dumps never emits a raw newline inside a string, so every
+        # newline is structural and can take the nesting indent.
+        return text.replace('\n', '\n' + self._indent * depth)
+
+    def write_cell(self, cell: dict) -> None:
+        if self._compact:
+            self._stream.write(',' if self._cells else '')
+        else:
+            self._stream.write(',\n' if self._cells else '\n')
+            self._stream.write(self._indent * 2)
+        self._stream.write(self._dumps(cell, 2))
+        self._cells += 1
+
+    def close(self, **fields: Any) -> None:
+        """Finish the cells array and write the remaining top-level fields."""
+        write = self._stream.write
+        if self._compact:
+            write(']')
+            for key, value in fields.items():
+                write(f',{json.dumps(key)}:{self._dumps(value, 1)}')
+            write('}')
+            return
+        write(f'\n{self._indent}]' if self._cells else ']')
+        for key, value in fields.items():
+            write(f',\n{self._indent}{json.dumps(key)}: {self._dumps(value, 1)}')
+        write('\n}')
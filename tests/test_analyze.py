@@ -0,0 +1,88 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tidy_nb.analyze import (
+    CorpusSummary, Histogram, TopCounter, read_records, scan_corpus, scan_file,
+)
+from tidy_nb.cli import main
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / 'corpus'
+    root.mkdir()
+    shutil.copy(EXAMPLES / 'vectors.ipynb', root / 'vectors.ipynb')
+    shutil.copy(EXAMPLES / 'Untitled.ipynb', root / 'untitled.ipynb')
+    shutil.copy(EXAMPLES / 'marimo' / 'untitled.py', root / 'app.py')
+    (root / 'plain.py').write_text('import os\n\ndef f():\n    return os.sep\n')
+    (root / 'broken.ipynb').write_text('{"cells": [')
+    return root
+
+
+def paths(root):
+    return [str(root / name) for name in
+            ('broken.ipynb', 'untitled.ipynb', 'vectors.ipynb', 'app.py', 'plain.py')]
+
+
+def test_scan_file(corpus):
+    record = scan_file(str(corpus / 'vectors.ipynb'))
+    notebook = json.loads((corpus / 'vectors.ipynb').read_text())
+    assert record.cells == len(notebook['cells'])
+    assert record.code_cells + record.markdown_cells == record.cells
+    assert record.output_bytes > 0
+    assert scan_file(str(corpus / 'untitled.ipynb')).output_bytes == len('[]')
+    assert record.imports == ('np',)
+    assert record.error is None
+
+    assert scan_file(str(corpus / 'plain.py')).fallback
+    assert not scan_file(str(corpus / 'app.py')).fallback
+    assert scan_file(str(corpus / 'broken.ipynb')).error.startswith('NotebookFormatError')
+
+
+def test_histogram_and_top_counter():
+    histogram = Histogram()
+    for value in [0, 1, 5, 6, 7, 100]:
+        histogram.add(value)
+    assert histogram.quantile(0.5) == 7
+    assert histogram.quantile(1) == 100
+    assert histogram.max == 100 and histogram.mean() == pytest.approx(119 / 6)
+
+    top = TopCounter(capacity=2)
+    for item in 'aaaabbbcd':
+        top.add(item)
+    assert len(top.counts) <= 2
+    assert top.most_common(1)[0][0] == 'a'
+
+
+@pytest.mark.parametrize('suffix', ['.jsonl', '.csv'])
+def test_resume(corpus, tmp_path, suffix):
+    output = tmp_path / f'records{suffix}'
+    full = CorpusSummary()
+    records = list(scan_corpus(paths(corpus), output, full, jobs=1))
+    assert list(read_records(output)) == records
+
+    # Interrupt after two records, mid-way through writing the third
+    lines = output.read_text().splitlines(keepends=True)
+    header = 1 if suffix == '.csv' else 0
+    output.write_text(''.join(lines[:header + 2]) + lines[header + 2][:10])
+    resumed = CorpusSummary()
+    rescanned = list(scan_corpus(paths(corpus), output, resumed, jobs=1, resume=True))
+    assert [record.path for record in rescanned] == paths(corpus)[2:]
+    assert list(read_records(output)) == records
+    assert resumed.report() == full.report()
+
+
+def test_analyze_command(corpus, tmp_path, capsys):
+    output = tmp_path / 'records.jsonl'
+    assert main(['analyze', str(corpus), str(corpus / 'app.py'), str(corpus / 'plain.py'),
+                 '-o', str(output), '-j', '2']) == 0
+    out = capsys.readouterr().out
+    assert f"Failed notebook: {corpus / 'broken.ipynb'}" in out
+    assert 'Notebooks: 5 (2 .ipynb, 2 marimo), 1 failed.' in out
+    assert 'Marimo files parsed by fallback_parse: 1 (50.0%).' in out
+    assert len(output.read_text().splitlines()) == 5
@@ -0,0 +1,88 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from jupyter_to_marimo import convert_jupyter_to_marimo
+from marimo_to_jupyter import convert_marimo_to_jupyter
+from tidy_nb.blobs import OUTPUTS_MARKER, BlobStore, MissingBlobError
+from tidy_nb.cli import main
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+PNG = {'data': {'image/png': 'iVBORw0KGgo' * 100, 'text/plain': ['<Figure>']},
+       'metadata': {}, 'output_type': 'display_data'}
+WIDGETS = {'application/vnd.jupyter.widget-state+json': {'state': {}, 'version_major': 2}}
+
+
+def notebook(*outputs):
+    cells = [{'cell_type': 'markdown', 'metadata': {}, 'source': ['# Plot']}]
+    for i, output in enumerate(outputs):
+        cells.append({'cell_type': 'code', 'execution_count': i + 1, 'metadata': {},
+                      'outputs': output, 'source': [f'plot({i})']})
+    return {'cells': cells, 'metadata': {'widgets': WIDGETS}, 'nbformat': 4,
+            'nbformat_minor': 5}
+
+
+def test_store_deduplicates(tmp_path):
+    store = BlobStore(tmp_path)
+    digest = store.put(b'data')
+    assert store.put(b'data') == digest
+    assert digest in store and store.get(digest) == b'data'
+    assert len(list(tmp_path.rglob('*'))) == 2  # One directory, one blob
+    with pytest.raises(MissingBlobError):
+        store.get('0' * 64)
+    with pytest.raises(MissingBlobError):
+        store.get('../../etc/passwd')
+
+
+def test_round_trip_restores_outputs(tmp_path):
+    store = BlobStore(tmp_path / 'blobs')
+    source = tmp_path / 'plots.ipynb'
+    original = notebook([PNG], [PNG, {'name': 'stdout', 'output_type': 'stream', 'text': ['é\n']}])
+    source.write_text(json.dumps(original))
+
+    assert convert_jupyter_to_marimo(str(source), str(tmp_path / 'plots.py'), blobs=store)
+    marimo = (tmp_path / 'plots.py').read_text()
+    assert marimo.count(OUTPUTS_MARKER) == 2
+    assert 'iVBOR' not in marimo
+    # The image is stored once for both cells, plus the stream and widgets
+    assert len([p for p in (tmp_path / 'blobs').rglob('*') if p.is_file()]) == 3
+
+    assert convert_marimo_to_jupyter(str(tmp_path / 'plots.py'), str(tmp_path / 'back.ipynb'),
+                                     blobs=store)
+    back = json.loads((tmp_path / 'back.ipynb').read_text())
+    code = [cell for cell in back['cells'] if cell['source'][0].startswith('plot')]
+    assert [cell['outputs'] for cell in code] == [cell['outputs'] for cell in original['cells'][1:]]
+    assert [cell['execution_count'] for cell in code] == [1, 2]
+    assert back['metadata']['widgets'] == WIDGETS
+
+    # Without the store the references are ignored
+    assert convert_marimo_to_jupyter(str(tmp_path / 'plots.py'), str(tmp_path / 'bare.ipynb'))
+    bare = json.loads((tmp_path / 'bare.ipynb').read_text())
+    assert all(cell['outputs'] == [] for cell in bare['cells'])
+
+
+def test_cli_blob_store(tmp_path, capsys):
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'vectors.ipynb')
+    blobs = tmp_path / 'blobs'
+    assert main([str(tmp_path / 'vectors.ipynb'), '--blob-store', str(blobs), '--no-cache']) == 0
+    assert OUTPUTS_MARKER in (tmp_path / 'vectors.py').read_text()
+    assert any(blobs.iterdir())
+
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / 'vectors.ipynb'), '--blob-store', str(blobs), '--to', 'marimo'])
+
+
+def test_cell_range_keeps_widgets(tmp_path):
+    from tidy_nb.blobs import WIDGETS_MARKER
+
+    store = BlobStore(tmp_path / 'blobs')
+    source = tmp_path / 'plots.ipynb'
+    source.write_text(json.dumps(notebook([PNG], [PNG])))
+    assert convert_jupyter_to_marimo(str(source), str(tmp_path / 'part.py'), cells=slice(1, 2),
+                                     blobs=store)
+    marimo = (tmp_path / 'part.py').read_text()
+    assert marimo.count(OUTPUTS_MARKER) == 1
+    assert WIDGETS_MARKER in marimo
@@ -0,0 +1,66 @@
+import json
+
+from jupyter_to_marimo import convert_jupyter_to_marimo
+from tidy_nb.cache import ConversionCache
+
+
+def write_notebook(path, sources):
+    cells = [{'cell_type': 'code', 'metadata': {}, 'outputs': [], 'source': [src]}
+             for src in sources]
+    path.write_text(json.dumps({'cells': cells, 'metadata': {}}))
+
+
+def test_file_key_depends_on_content_and_options(tmp_path):
+    path = tmp_path / 'nb.ipynb'
+    path.write_text('{"cells": []}')
+    with ConversionCache(tmp_path / 'cache') as cache:
+        key = cache.file_key(path, 'jupyter_to_marimo')
+        assert key == cache.file_key(path, 'jupyter_to_marimo')
+        assert key != cache.file_key(path, 'jupyter_to_marimo', {'compact': True})
+        assert key != cache.file_key(path, 'marimo_to_jupyter')
+        path.write_text('{"cells": [] }')
+        assert key != cache.file_key(path, 'jupyter_to_marimo')
+
+
+def test_lru_eviction(tmp_path):
+    with ConversionCache(tmp_path, max_bytes=100) as cache:
+        cache.put('a', 'x' * 40)
+        cache.put('b', 'x' * 40)
+        assert cache.get('a') is not None  # a is now more recent than b
+        cache.put('c', 'x' * 40)
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.get('c') is not None
+        assert cache.total_bytes() <= 100
+
+
+def test_cache_persists(tmp_path):
+    with ConversionCache(tmp_path) as cache:
+        cache.put('key', 'value')
+    with ConversionCache(tmp_path) as cache:
+        assert cache.get('key') == 'value'
+
+
+def test_only_changed_cells_rerendered(tmp_path, capsys):
+    nb = tmp_path / 'nb.ipynb'
+    out = tmp_path / 'nb.py'
+    write_notebook(nb, ['a = 1', 'b = a + 1'])
+    with ConversionCache(tmp_path / 'cache') as cache:
+        assert convert_jupyter_to_marimo(str(nb), str(out), cache=cache)
+        first = out.read_text()
+
+        # Unchanged input: no cell is looked at again.
+        cache.hits = cache.misses = 0
+        assert convert_jupyter_to_marimo(str(nb), str(out), cache=cache)
+        assert (cache.hits, cache.misses) == (1, 0)
+        assert out.read_text() == first
+
+        # One new cell in front: existing cells are reused and renumbered.
+        write_notebook(nb, ['z = 0', 'a = 1', 'b = a + 1'])
+        cache.hits = cache.misses = 0
+        assert convert_jupyter_to_marimo(str(nb), str(out), cache=cache)
+        assert (cache.hits, cache.misses) == (2, 2)  # file miss + new cell miss
+
+    capsys.readouterr()
+    assert convert_jupyter_to_marimo(str(nb), str(tmp_path / 'plain.py'))
+    assert out.read_text() == (tmp_path / 'plain.py').read_text()
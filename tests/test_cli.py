@@ -0,0 +1,78 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tidy_nb import batch
+from tidy_nb.cli import main
+
+EXAMPLES = Path(__file__).resolve().parent.parent / 'examples'
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'a' / 'vectors.ipynb')
+    shutil.copy(EXAMPLES / 'Untitled.ipynb', tmp_path / 'b' / 'untitled.ipynb')
+    shutil.copy(EXAMPLES / 'marimo' / 'untitled.py', tmp_path / 'b' / 'app.py')
+    (tmp_path / 'b' / 'broken.ipynb').write_text('{"cells": [')
+    return tmp_path
+
+
+def test_collect_notebooks(tree):
+    found = batch.collect_notebooks([
+        str(tree / 'b'), str(tree / '*' / 'vec*.ipynb'), str(tree / 'b' / 'app.py'),
+        str(tree / 'b' / 'untitled.ipynb'),
+    ])
+    assert found == [
+        str(tree / 'b' / 'broken.ipynb'),
+        str(tree / 'b' / 'untitled.ipynb'),
+        str(tree / 'a' / 'vectors.ipynb'),
+        str(tree / 'b' / 'app.py'),
+    ]
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_batch_conversion_continues_after_failure(tree, capsys, jobs):
+    code = main([str(tree), str(tree / 'b' / 'app.py'), '--jobs', jobs, '--no-cache'])
+    out = capsys.readouterr().out.splitlines()
+    assert code == 1
+    assert out[0].startswith(f"Tidied notebook: {tree / 'a' / 'vectors.ipynb'}")
+    assert out[1] == f"Failed notebook: {tree / 'b' / 'broken.ipynb'}"
+    assert out[-1] == '3 converted, 1 failed.'
+    assert (tree / 'a' / 'vectors.py').exists()
+    assert (tree / 'b' / 'untitled.py').exists()
+    assert (tree / 'b' / 'app.ipynb').exists()
+
+
+def test_no_notebooks(capsys):
+    assert main([]) == 0
+    assert capsys.readouterr().out == ''
+
+
+def test_cached_rerun_skips_unchanged(tree, tmp_path_factory, capsys):
+    cache_dir = str(tmp_path_factory.mktemp('cache'))
+    notebook = str(tree / 'a' / 'vectors.ipynb')
+    assert main([notebook, '--cache-dir', cache_dir, '-j', '1']) == 0
+    output = tree / 'a' / 'vectors.py'
+    mtime = output.stat().st_mtime_ns
+    capsys.readouterr()
+
+    assert main([notebook, '--cache-dir', cache_dir, '-j', '1']) == 0
+    assert output.stat().st_mtime_ns == mtime
+    out = capsys.readouterr().out
+    assert '0 written, 1 skipped, 0 unchanged.\n1 converted, 0 failed.' in out
+
+
+@pytest.mark.parametrize('source', ['a/vectors.ipynb', 'b/app.py'])
+def test_rerun_leaves_identical_output_alone(tree, capsys, source):
+    assert main([str(tree / source), '--no-cache', '-j', '1']) == 0
+    assert '1 written, 0 skipped, 0 unchanged.' in capsys.readouterr().out
+    output = tree / batch.target_path(source)
+    stat = output.stat()
+
+    assert main([str(tree / source), '--no-cache', '-j', '1']) == 0
+    assert '0 written, 0 skipped, 1 unchanged.' in capsys.readouterr().out
+    assert output.stat().st_mtime_ns == stat.st_mtime_ns
+    assert output.stat().st_ino == stat.st_ino
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from jupyter_to_marimo import analyze_cell, build_dataflow_graph, convert_jupyter_to_marimo
+from tidy_nb.dataflow import CycleError, DataflowGraph
+from tidy_nb.reader import iter_stream_cells
+
+
+def graph_of(*sources):
+    return DataflowGraph(analyze_cell(source) for source in sources)
+
+
+def test_bound_and_free_names_respect_scopes():
+    analysis = analyze_cell(
+        "import numpy as np\n"
+        "def f(a, b=default):\n"
+        "    z = a + y\n"
+        "    return z\n"
+        "squares = [i * scale for i in data]\n"
+        "for row in data:\n"
+        "    total += row\n"
+    )
+    assert analysis.bound == {'np', 'f', 'squares', 'row', 'total'}
+    assert analysis.free == {'default', 'y', 'scale', 'data', 'total'}
+
+
+@pytest.mark.parametrize('source', [
+    'df = df.dropna()',
+    'df += 1',
+    'df.loc[0] = 1\ndf = 2',
+    'df = [row for row in df if row]',
+    'for df in df:\n    pass',
+])
+def test_names_read_before_they_are_bound_are_free(source):
+    analysis = analyze_cell(source)
+    assert 'df' in analysis.free and 'df' in analysis.bound
+
+
+def test_names_bound_before_they_are_read_are_not_free():
+    analysis = analyze_cell('x = 1\nx += 1\ndef f():\n    return y\ny = x')
+    assert analysis.free == set()
+
+
+def test_rebinding_cell_takes_a_parameter():
+    graph = graph_of('import pandas as pd\ndf = pd.DataFrame()', 'df = df.dropna()',
+                     'count = 0', 'count += 1')
+    assert graph.params(1) == ['df']
+    assert graph.params(3) == ['count']
+
+
+def test_params_and_returns():
+    graph = graph_of(
+        "import numpy as np",
+        "x = np.arange(3)\n_scratch = 1",
+        "y = x * 2",
+        "print(x, y, _scratch, len(x))",
+    )
+    assert graph.params(1) == ['np']
+    assert graph.params(3) == ['x', 'y']
+    assert graph.returns(0) == ['np']
+    assert graph.returns(1) == ['x']
+    assert graph.returns(3) == []
+    assert graph.parents(3) == [1, 2]
+    assert graph.children(1) == [2, 3]
+
+
+def test_redefinition_resolves_to_nearest_cell_above():
+    graph = graph_of("x = 1", "x = 2", "print(x)", "y = z", "z = 3")
+    assert graph.parents(2) == [1]
+    # Nothing above binds z, so the cell below supplies it
+    assert graph.parents(3) == [4]
+
+
+@pytest.mark.parametrize('reader', ['df = df.dropna()', 'count += 1'])
+def test_cell_reading_its_own_name_first_never_links_to_itself(reader):
+    name = reader.split()[0]
+    graph = graph_of(reader)
+    assert graph.params(0) == [] and graph.topological_order() == [0]
+    # The next cell below that binds the name supplies it instead
+    graph = graph_of(reader, f"{name} = 0", f"{name} = 1")
+    assert graph.params(0) == [name]
+    assert graph.parents(0) == [1]
+    assert graph.topological_order() == [1, 0, 2]
+
+
+def test_topological_order_and_stale_cells():
+    graph = graph_of("b = a", "a = 1", "c = b", "d = 4", "e = c + d")
+    assert graph.topological_order() == [1, 0, 2, 3, 4]
+    assert graph.downstream(1) == [0, 2, 4]
+    assert graph.downstream(4) == []
+    assert graph.stale([3]) == [3, 4]
+    assert graph.stale([1, 3]) == [1, 0, 2, 3, 4]
+
+
+def test_cycle_is_reported():
+    graph = graph_of("a = b", "b = a")
+    with pytest.raises(CycleError, match=r'\[0, 1\]'):
+        graph.topological_order()
+
+
+def test_convert_with_dataflow(tmp_path, monkeypatch):
+    notebook = tmp_path / 'flow.ipynb'
+    notebook.write_text(json.dumps({
+        'cells': [
+            {'cell_type': 'code', 'source': ['import math'], 'metadata': {}, 'outputs': []},
+            {'cell_type': 'markdown', 'source': ['# Title'], 'metadata': {}},
+            {'cell_type': 'code', 'source': ['r = 2\n', 'area = math.pi * r ** 2'],
+             'metadata': {}, 'outputs': []},
+            {'cell_type': 'code', 'source': ['print(area)'], 'metadata': {}, 'outputs': []},
+        ],
+        'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5,
+    }))
+    output = tmp_path / 'flow.py'
+    reads = []
+
+    def counted(*args, **kwargs):
+        reads.append(args)
+        return iter_stream_cells(*args, **kwargs)
+
+    monkeypatch.setattr('jupyter_to_marimo.iter_stream_cells', counted)
+
+    assert convert_jupyter_to_marimo(str(notebook), str(output), dataflow=True)
+    assert len(reads) == 2  # The graph pass also finds the markdown cells
+    text = output.read_text()
+    assert text.index('def imports():') < text.index('def cell_1():')
+    assert 'def cell_1():\n    import math\n    return math' in text
+    assert 'def markdown_cell(mo):' in text
+    assert 'def cell_2(math):\n    r = 2\n\n    area = math.pi * r ** 2\n    return area' in text
+    assert 'def cell_3(area):\n    print(area)\n    return' in text
+
+    with open(notebook, 'rb') as f:
+        graph = build_dataflow_graph(iter_stream_cells(f))
+    assert graph.topological_order() == [0, 1, 2]
+    assert graph.has_markdown
+    assert not build_dataflow_graph([{'cell_type': 'code', 'source': 'x = 1'}]).has_markdown
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from tidy_nb.cli import main
+from tidy_nb.dupes import (
+    DuplicateIndex, IndexFormatError, normalize_source, signature, similarity,
+)
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+PLOT = 'fig, ax = plt.subplots()\nax.plot(xs, ys)\nax.set_title("Results")\nplt.show()\n'
+
+
+def write_notebook(path, *sources):
+    cells = [{'cell_type': 'markdown', 'metadata': {}, 'source': '# Title'}]
+    cells += [{'cell_type': 'code', 'execution_count': None, 'metadata': {}, 'outputs': [],
+               'source': source} for source in sources]
+    path.write_text(json.dumps({'cells': cells, 'metadata': {}, 'nbformat': 4,
+                                'nbformat_minor': 4}))
+    return str(path)
+
+
+def test_normalize_and_similarity():
+    assert normalize_source('\n  x = 1   \n\n\ny = 2\n\n') == '  x = 1\ny = 2'
+    near = PLOT.replace('"Results"', '"Results so far"')
+    assert similarity(signature(PLOT), signature(PLOT)) == 1
+    assert similarity(signature(PLOT), signature(near)) > 0.5
+    assert similarity(signature(PLOT), signature('import os')) < 0.2
+
+
+def test_update_find_and_top(tmp_path):
+    a = write_notebook(tmp_path / 'a.ipynb', 'import numpy as np', PLOT)
+    b = write_notebook(tmp_path / 'b.ipynb', PLOT + '\n\n', 'x = 1')
+    c = write_notebook(tmp_path / 'c.ipynb', 'import numpy as np',
+                       PLOT.replace('"Results"', '"Other results"'))
+    with DuplicateIndex(tmp_path / 'index.sqlite3') as index:
+        assert index.update([a, b, c], jobs=1)[:3] == (3, 0, 0)
+        assert [(o.path, o.cell) for o in index.find(PLOT)] == [(a, 2), (b, 1)]
+        near = index.find(PLOT, threshold=0.5)
+        assert [o.path for o in near] == [a, b, c]
+        assert near[-1].similarity < 1
+        top = index.top()
+        assert sorted((d.text, d.notebooks, d.cells) for d in top) == [
+            (normalize_source(PLOT), 2, 2), ('import numpy as np', 2, 2),
+        ]
+
+        # Only changed and deleted files are touched
+        write_notebook(tmp_path / 'b.ipynb', 'x = 1')
+        os.utime(b, ns=(0, 1))
+        os.remove(c)
+        assert index.update([a, b], jobs=1)[:3] == (1, 1, 1)
+        assert index.top() == []
+        assert index.stats() == (2, 3, 3)
+
+
+def test_dupes_command(tmp_path, capsys):
+    for name in ('one', 'two'):
+        shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / f'{name}.ipynb')
+    shutil.copy(EXAMPLES / 'marimo' / 'vectors.py', tmp_path / 'vectors.py')
+    index = ['dupes', '--index', str(tmp_path / 'cells.sqlite3')]
+    assert main([*index, 'update', str(tmp_path), str(tmp_path / 'vectors.py'), '-j', '1']) == 0
+    assert '3 indexed, 0 unchanged, 0 removed, 0 failed.' in capsys.readouterr().out
+
+    assert main([*index, 'top', '-n', '1']) == 0
+    # The marimo cells keep their return values, so only near-duplicates match
+    assert capsys.readouterr().out.split()[:4] == ['2', 'notebooks', '2', 'cells']
+
+    assert main([*index, 'find', str(tmp_path / 'one.ipynb'), '--cell', '3', '--near']) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[:2] == [f"{tmp_path / 'one.ipynb'}: cell 3", f"{tmp_path / 'two.ipynb'}: cell 3"]
+    assert out[2].startswith(f"{tmp_path / 'vectors.py'}: cell ")
+
+
+def test_other_databases_are_not_reset(tmp_path, capsys):
+    other = tmp_path / 'other.sqlite3'
+    with sqlite3.connect(other) as db:
+        db.execute('CREATE TABLE entries (key TEXT)')
+        db.execute("INSERT INTO entries VALUES ('kept')")
+    db.close()
+    with pytest.raises(IndexFormatError):
+        DuplicateIndex(other)
+    assert main(['dupes', '--index', str(other), 'top']) == 1
+    assert 'not a tidy_nb duplicate-cell index' in capsys.readouterr().err
+    with sqlite3.connect(other) as db:
+        assert db.execute('SELECT key FROM entries').fetchall() == [('kept',)]
+    db.close()
+
+    # An index of an older format is still rebuilt
+    with DuplicateIndex(tmp_path / 'index.sqlite3') as index:
+        index._db.execute('PRAGMA user_version = 0')
+    with DuplicateIndex(tmp_path / 'index.sqlite3') as index:
+        assert index.stats() == (0, 0, 0)
+
+
+@pytest.mark.parametrize('near', ['-0.1', '1.5'])
+def test_near_must_be_a_fraction(tmp_path, near, capsys):
+    with pytest.raises(SystemExit):
+        main(['dupes', '--index', str(tmp_path / 'i'), 'find', '-', '--near', near])
+    assert 'must be from 0 to 1' in capsys.readouterr().err
@@ -0,0 +1,98 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from jupyter_to_marimo import convert_jupyter_to_marimo
+from marimo_to_jupyter import convert_marimo_to_jupyter
+from tidy_nb.cli import main
+from tidy_nb.emit import emit_formats, format_targets, parse_formats
+from tidy_nb.percent import write_percent_script
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+
+def test_parse_formats():
+    assert parse_formats('marimo, percent,marimo') == ('marimo', 'percent')
+    with pytest.raises(ValueError, match="'html'"):
+        parse_formats('marimo,html')
+    with pytest.raises(ValueError):
+        parse_formats(',')
+
+
+def test_format_targets_skip_the_source():
+    assert format_targets('a/nb.ipynb', ('marimo', 'ipynb', 'percent')) == {
+        'marimo': 'a/nb.py',
+        'percent': 'a/nb.pct.py',
+    }
+    assert format_targets('nb.py', ('marimo', 'ipynb')) == {'ipynb': 'nb.ipynb'}
+
+
+def test_percent_script(tmp_path):
+    cells = [
+        {'cell_type': 'markdown', 'source': ['# Title\n', '\n', 'Text']},
+        {'cell_type': 'code', 'source': ['%matplotlib inline\n', 'x = 1\n']},
+        {'cell_type': 'raw', 'source': 'raw'},
+    ]
+    path = tmp_path / 'nb.pct.py'
+    with open(path, 'w') as f:
+        assert write_percent_script(cells, f) == 3
+    text = path.read_text()
+    assert text.endswith(
+        '# ---\n\n'
+        '# %% [markdown]\n# # Title\n#\n# Text\n\n'
+        '# %%\n# %matplotlib inline\nx = 1\n\n'
+        '# %% [raw]\n# raw\n'
+    )
+    compile(text, str(path), 'exec')
+
+
+def test_emit_matches_single_format_converters(tmp_path):
+    source = tmp_path / 'vectors.ipynb'
+    shutil.copy(EXAMPLES / 'vectors.ipynb', source)
+    assert convert_jupyter_to_marimo(str(source), str(tmp_path / 'expected.py'))
+
+    targets = emit_formats(source, ('marimo', 'ipynb', 'percent'))
+    assert set(targets) == {'marimo', 'percent'}
+    assert (tmp_path / 'vectors.py').read_text() == (tmp_path / 'expected.py').read_text()
+    percent = (tmp_path / 'vectors.pct.py').read_text()
+    assert percent.count('# %%') == len(json.loads(source.read_text())['cells'])
+
+    # And back from the marimo file just written
+    assert convert_marimo_to_jupyter(str(tmp_path / 'vectors.py'), str(tmp_path / 'expected.ipynb'))
+    targets = emit_formats(tmp_path / 'vectors.py', ('ipynb', 'percent'))
+    assert (tmp_path / 'vectors.ipynb').read_text() == (tmp_path / 'expected.ipynb').read_text()
+
+
+def test_emit_failure_replaces_nothing(tmp_path):
+    source = tmp_path / 'bad.ipynb'
+    source.write_text('{"cells": [{"cell_type": "code", "source": "x"}, ')
+    (tmp_path / 'bad.py').write_text('old')
+    with pytest.raises(ValueError):
+        emit_formats(source, ('marimo', 'percent'))
+    assert (tmp_path / 'bad.py').read_text() == 'old'
+    assert not (tmp_path / 'bad.pct.py').exists()
+
+
+def test_cli_to(tmp_path, capsys):
+    source = tmp_path / 'vectors.ipynb'
+    shutil.copy(EXAMPLES / 'vectors.ipynb', source)
+    assert main([str(source), '--to', 'marimo,percent', '--dataflow', '-j', '1']) == 0
+    out = capsys.readouterr().out
+    assert f'{source} -> {tmp_path / "vectors.py"}, {tmp_path / "vectors.pct.py"}' in out
+    assert 'def markdown_cell(mo):' in (tmp_path / 'vectors.py').read_text()
+
+    with pytest.raises(SystemExit):
+        main([str(source), '--to', 'html'])
+
+
+def test_profiled_writes_cover_every_cell(tmp_path):
+    from tidy_nb.profile import Profiler
+
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'v.ipynb')
+    cells = len(json.loads((tmp_path / 'v.ipynb').read_text())['cells'])
+    profiler = Profiler()
+    emit_formats(tmp_path / 'v.ipynb', ['percent'], profiler=profiler)
+    writes = [event for event in profiler.events if event[0] == 'write']
+    assert len(writes) == cells + 1  # One per cell, then close()
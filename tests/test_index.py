@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from jupyter_to_marimo import analyze_notebook, convert_jupyter_to_marimo
+from tidy_nb.index import CellIndex, build_index, get_index, index_path, iter_cell_range, parse_cell_range
+from tidy_nb.reader import NotebookFormatError, iter_cells
+
+
+def write_notebook(path, count):
+    cells = [
+        {
+            'cell_type': 'code',
+            'metadata': {},
+            'outputs': [{'output_type': 'stream', 'name': 'stdout', 'text': ['x' * 1000]}],
+            'source': [f'v{i} = {i}'],
+        }
+        for i in range(count)
+    ]
+    path.write_text(json.dumps({'cells': cells, 'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5}, indent=1))
+
+
+def test_parse_cell_range():
+    assert parse_cell_range('100:200') == slice(100, 200)
+    assert parse_cell_range(':5') == slice(None, 5)
+    assert parse_cell_range('7') == slice(7, 8)
+    assert parse_cell_range('-1') == slice(-1, None)
+    with pytest.raises(ValueError):
+        parse_cell_range('a:b')
+
+
+def test_index_spans_hold_each_cell(tmp_path):
+    path = tmp_path / 'nb.ipynb'
+    write_notebook(path, 5)
+    index = build_index(path)
+    data = path.read_bytes()
+    assert len(index) == 5
+    for i, cell in enumerate(iter_cells(path, skip=frozenset())):
+        start, end = index.span(i)
+        assert json.loads(data[start:end]) == cell
+
+
+def test_range_reads_match_full_read(tmp_path):
+    path = tmp_path / 'nb.ipynb'
+    write_notebook(path, 10)
+    expected = list(enumerate(iter_cells(path)))[3:7]
+    assert list(iter_cell_range(path, slice(3, 7))) == expected
+    assert [n for n, _ in iter_cell_range(path, slice(-2, None))] == [8, 9]
+    assert index_path(path).exists()
+
+
+def test_sidecar_invalidated_by_size_and_mtime(tmp_path):
+    path = tmp_path / 'nb.ipynb'
+    write_notebook(path, 3)
+    first = get_index(path)
+    assert CellIndex.load(index_path(path)).offsets == first.offsets
+
+    write_notebook(path, 4)
+    assert len(get_index(path)) == 4
+
+    # Same size, new mtime
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    index = get_index(path)
+    assert index.mtime_ns == os.stat(path).st_mtime_ns
+
+
+def test_broken_notebook(tmp_path):
+    path = tmp_path / 'broken.ipynb'
+    path.write_text('{"nbformat": 4}')
+    with pytest.raises(NotebookFormatError):
+        build_index(path)
+
+
+def test_analyze_and_convert_cell_range(tmp_path, capsys):
+    path = tmp_path / 'nb.ipynb'
+    write_notebook(path, 10)
+    analyze_notebook(str(path), slice(4, 6))
+    out = capsys.readouterr().out
+    assert 'Cell 5: code' in out and 'Cell 6: code' in out
+    assert 'Cell 4:' not in out and 'Cell 7:' not in out
+
+    output = tmp_path / 'nb.py'
+    assert convert_jupyter_to_marimo(str(path), str(output), cells=slice(4, 6))
+    text = output.read_text()
+    assert 'v4 = 4' in text and 'v5 = 5' in text and 'v6' not in text
+
+
+@pytest.mark.parametrize('count', [0, 3])
+def test_range_read_fills_top_level_fields(tmp_path, count):
+    path = tmp_path / 'nb.ipynb'
+    write_notebook(path, count)
+    notebook = json.loads(path.read_text())
+    notebook = {'metadata': {'widgets': {'state': 1}}, **notebook, 'extra': [1]}
+    path.write_text(json.dumps(notebook))
+    fields = {}
+    list(iter_cell_range(path, slice(1, 2), fields=fields))
+    assert fields == {key: value for key, value in notebook.items() if key != 'cells'}
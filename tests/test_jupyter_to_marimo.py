@@ -0,0 +1,56 @@
+import json
+
+from jupyter_to_marimo import (
+    MARIMO_HEADER,
+    MO_IMPORT_CELL,
+    analyze_cell,
+    convert_jupyter_to_marimo,
+    detect_imports,
+    determine_return_variables,
+    extract_variables,
+)
+from tidy_nb.emit import emit_formats
+from tidy_nb.server import convert_bytes
+
+
+def test_analyze_cell_single_pass():
+    code = "import numpy as np\nfrom os import path\nx = np.arange(3)\ny, _z = x, 1\ntmp = y\nN = 3\n"
+    analysis = analyze_cell(code)
+    assert analysis.valid
+    assert analysis.definitions == {'x', 'y', '_z', 'tmp', 'N'}
+    assert analysis.imports == {'np', 'path'}
+    assert {'np', 'x', 'y'} <= analysis.references
+    assert analysis.temporaries == {'_z', 'tmp'}
+    assert analysis.return_variables == ['x', 'y']
+
+
+def test_analyze_cell_is_reused():
+    code = "a = 1"
+    assert analyze_cell(code) is analyze_cell(code)
+
+
+def test_analyze_cell_syntax_error():
+    analysis = analyze_cell("def (:")
+    assert not analysis.valid
+    assert analysis.return_variables == []
+
+
+def test_legacy_helpers_match_analysis():
+    code = "import pandas.io as pdio\ncount += 1\nz: int = 2"
+    assert extract_variables(code) == {'count', 'z'}
+    assert detect_imports(code) == {'pdio'}
+    assert determine_return_variables(code, 0) == ['count', 'z']
+
+
+def test_mo_import_follows_the_header(tmp_path):
+    source = tmp_path / 'nb.ipynb'
+    source.write_text(json.dumps({'cells': [
+        {'cell_type': 'code', 'metadata': {}, 'outputs': [], 'source': ['x = 1']},
+        {'cell_type': 'markdown', 'metadata': {}, 'source': ['# Title']},
+    ], 'metadata': {}, 'nbformat': 4, 'nbformat_minor': 5}))
+    top = '\n'.join(MARIMO_HEADER + MO_IMPORT_CELL) + '\n@app.cell\ndef cell_1():\n    x = 1'
+    assert convert_jupyter_to_marimo(str(source), str(tmp_path / 'out.py'))
+    assert (tmp_path / 'out.py').read_text().startswith(top)
+    assert convert_bytes('jupyter_to_marimo', source.read_bytes()).decode().startswith(top)
+    emit_formats(source, ('marimo',))
+    assert (tmp_path / 'nb.py').read_text() == (tmp_path / 'out.py').read_text()
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('jupyter_client')
+pytest.importorskip('ipykernel')
+
+from tidy_nb.cli import main  # noqa: E402
+from tidy_nb.kernels import KernelPool, execute_many  # noqa: E402
+
+
+def write_notebook(path, *sources):
+    cells = [{'cell_type': 'code', 'execution_count': None, 'metadata': {}, 'outputs': [],
+              'source': source} for source in sources]
+    path.write_text(json.dumps({'cells': cells, 'metadata': {}, 'nbformat': 4,
+                                'nbformat_minor': 4}))
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with KernelPool(1) as pool:
+        yield pool
+
+
+def test_outputs_and_counts_are_written_back(tmp_path, pool):
+    path = write_notebook(
+        tmp_path / 'a.ipynb',
+        ['x = 1', 'print(x)', 'print(x + 1)'],  # Lines without newlines, as generated
+        'import os\nprint(os.getcwd())\nx + 41',
+        '',
+    )
+    [result] = execute_many([path], pool)
+    assert result == (path, 2, None)
+    cells = json.loads(Path(path).read_text())['cells']
+    assert [cell['execution_count'] for cell in cells] == [1, 2, None]
+    assert cells[0]['outputs'] == [{'name': 'stdout', 'output_type': 'stream', 'text': '1\n2\n'}]
+    stream, value = cells[1]['outputs']
+    assert stream['text'] == f'{tmp_path}\n'
+    assert value['data']['text/plain'] == '42'
+
+
+def test_kernel_is_reset_between_notebooks(tmp_path, pool):
+    first = write_notebook(tmp_path / 'first.ipynb', 'secret = 1')
+    second = write_notebook(tmp_path / 'second.ipynb', 'secret', 'never_run = 1')
+    results = list(execute_many([first, second], pool))
+    assert results[0].error is None
+    assert results[1].cells == 1
+    assert 'NameError' in results[1].error
+    cells = json.loads(Path(second).read_text())['cells']
+    assert cells[0]['execution_count'] == 1
+    assert cells[0]['outputs'][0]['output_type'] == 'error'
+    assert cells[1]['execution_count'] is None
+
+
+def test_cli_execute(tmp_path, capsys):
+    (tmp_path / 'app.py').write_text(
+        'import marimo\napp = marimo.App()\n\n\n@app.cell\ndef _():\n    x = 1\n    return (x,)\n'
+        '\n\n@app.cell\ndef _(x):\n    y = x + 1\n    return (y,)\n'
+    )
+    assert main([str(tmp_path / 'app.py'), '--execute', '--no-cache', '-j', '1']) == 0
+    out = capsys.readouterr().out
+    assert f"Executed notebook: {tmp_path / 'app.ipynb'}" in out
+    assert '1 executed, 0 failed.' in out
+
+
+def test_restarted_kernel_runs_in_the_notebooks_directory(tmp_path, pool):
+    path = write_notebook(tmp_path / 'a.ipynb', 'import os\nprint(os.getcwd())')
+    # A session whose reset fails, so the kernel has to be restarted
+    kernel = pool.acquire(str(tmp_path))
+    kernel.run('get_ipython().reset = None')
+    pool.release(kernel)
+    [result] = execute_many([path], pool)
+    assert result.error is None
+    cells = json.loads(Path(path).read_text())['cells']
+    assert cells[0]['outputs'][0]['text'] == f'{tmp_path}\n'
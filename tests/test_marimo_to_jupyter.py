@@ -0,0 +1,57 @@
+from marimo_to_jupyter import parse_marimo_notebook
+
+
+SOURCE = '''import marimo
+
+app = marimo.App()
+
+
+@app.cell(hide_code=True)
+def _(mo):
+    mo.md(
+        r"""
+        # Title
+        """
+    )
+    return
+
+
+@app.cell
+def _(mo,
+      np):
+    # setup
+    x = np.arange(3)
+
+    if x.any():
+        y = x
+    return (x, y)
+
+
+def helper():
+    @app.cell
+    def nested():
+        return 1
+
+
+if __name__ == "__main__":
+    app.run()
+'''
+
+
+def test_parse_top_level_cells_only():
+    cells = parse_marimo_notebook(SOURCE)
+    assert [cell['cell_type'] for cell in cells] == ['code', 'code']
+    assert cells[0]['source'] == 'mo.md(\n    r"""\n    # Title\n    """\n)\nreturn'
+    assert cells[1]['source'] == (
+        '# setup\nx = np.arange(3)\n\nif x.any():\n    y = x\n(x, y)'
+    )
+
+
+def test_parse_single_line_cell():
+    cells = parse_marimo_notebook('@app.cell\ndef _(): x = 1\n')
+    assert cells[0]['source'] == 'x = 1'
+
+
+def test_parse_without_cells_falls_back():
+    cells = parse_marimo_notebook('import os\n\ndef f():\n    pass\n')
+    assert [cell['source'] for cell in cells] == ['import os', 'def f():\n    pass']
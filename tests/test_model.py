@@ -0,0 +1,81 @@
+import copy
+import io
+import json
+import pickle
+
+import pytest
+
+from jupyter_to_marimo import write_marimo_notebook
+from marimo_to_jupyter import NOTEBOOK_METADATA, create_jupyter_notebook, parse_marimo_notebook
+from tidy_nb.model import EMPTY_METADATA, EMPTY_OUTPUTS, Cell, FrozenDict, Notebook, freeze
+
+
+def test_cells_share_empty_containers():
+    notebook = parse_marimo_notebook('@app.cell\ndef _():\n    x = 1\n\n@app.cell\ndef _():\n    y = 2\n')
+    assert len(notebook) == 2
+    assert all(cell.metadata is EMPTY_METADATA for cell in notebook)
+    assert all(cell.outputs is EMPTY_OUTPUTS for cell in notebook)
+    assert notebook[0]['source'] == 'x = 1'
+    assert notebook[1].get('cell_type') == 'code'
+    with pytest.raises(KeyError):
+        notebook[0]['nope']
+
+
+def test_frozen_containers():
+    metadata = freeze({'tags': ['a'], 'nested': {'b': 1}})
+    with pytest.raises(TypeError):
+        metadata['x'] = 1
+    with pytest.raises(TypeError):
+        metadata['tags'].append('b')
+    with pytest.raises(TypeError):
+        EMPTY_OUTPUTS.append({})
+    assert json.dumps(metadata) == '{"tags": ["a"], "nested": {"b": 1}}'
+    mutable = copy.deepcopy(metadata)
+    mutable['tags'].append('b')
+    assert type(mutable) is dict and metadata['tags'] == ['a']
+    assert pickle.loads(pickle.dumps(metadata)) == metadata
+
+
+def test_notebook_interns_short_sources_and_lines():
+    notebook = Notebook()
+    first = notebook.add('code', ''.join(['df', '.head()']))
+    second = notebook.add('code', ''.join(['df.', 'head()']))
+    assert first.source is second.source
+    lines = [cell['source'] for cell in notebook.to_dict()['cells']]
+    assert lines[0][0] is lines[1][0]
+
+
+def test_jupyter_form_is_unchanged():
+    cell = Cell.from_dict({'cell_type': 'markdown', 'source': 'a\nb', 'metadata': {}})
+    assert cell.to_jupyter() == {'cell_type': 'markdown', 'metadata': {}, 'source': ['a', 'b']}
+    notebook = create_jupyter_notebook([{'cell_type': 'code', 'source': '', 'metadata': {},
+                                         'execution_count': None, 'outputs': []}])
+    assert notebook['cells'] == [{'cell_type': 'code', 'metadata': {}, 'source': [''],
+                                  'execution_count': None, 'outputs': []}]
+    assert notebook['metadata'] == NOTEBOOK_METADATA
+    assert isinstance(NOTEBOOK_METADATA, FrozenDict)
+
+
+def test_public_results_are_mutable():
+    notebook = parse_marimo_notebook('@app.cell\ndef _():\n    x = 1\n')
+    notebook[0]['metadata']['tags'] = ['a']
+    notebook[0]['outputs'].append({'output_type': 'stream'})
+    notebook[0]['execution_count'] = 3
+    assert notebook[0].metadata == {'tags': ['a']}
+    assert EMPTY_METADATA == {} and EMPTY_OUTPUTS == []
+    with pytest.raises(KeyError):
+        notebook[0]['nope'] = 1
+
+    jupyter = create_jupyter_notebook(parse_marimo_notebook('@app.cell\ndef _():\n    y = 2\n'))
+    jupyter['metadata']['kernelspec']['name'] = 'other'
+    jupyter['cells'][0]['metadata']['tags'] = ['b']
+    jupyter['cells'][0]['outputs'].append({'output_type': 'stream'})
+    assert NOTEBOOK_METADATA['kernelspec']['name'] != 'other'
+    assert EMPTY_METADATA == {} and EMPTY_OUTPUTS == []
+
+
+def test_parsed_notebook_converts_back_to_marimo():
+    notebook = parse_marimo_notebook('@app.cell\ndef _():\n    x = 1\n    y = x + 1\n    return\n')
+    out = io.StringIO()
+    write_marimo_notebook(notebook, out)
+    assert 'def cell_1():\n    x = 1\n    y = x + 1' in out.getvalue()
@@ -0,0 +1,61 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tidy_nb.batch import convert_file
+from tidy_nb.cli import main
+from tidy_nb.pipeline import convert_pipelined
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+
+@pytest.fixture
+def files(tmp_path):
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'vectors.ipynb')
+    shutil.copy(EXAMPLES / 'Untitled.ipynb', tmp_path / 'untitled.ipynb')
+    shutil.copy(EXAMPLES / 'marimo' / 'untitled.py', tmp_path / 'app.py')
+    (tmp_path / 'broken.ipynb').write_text('{"cells": [')
+    (tmp_path / 'notes.txt').write_text('')
+    return [str(tmp_path / name) for name in (
+        'vectors.ipynb', 'broken.ipynb', 'missing.ipynb', 'notes.txt', 'app.py',
+        'untitled.ipynb',
+    )]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_pipeline_keeps_order_and_continues_after_failures(files, jobs):
+    results = list(convert_pipelined(files, jobs, io_workers=2, depth=1))
+    assert [r.source for r in results] == files
+    assert [r.ok for r in results] == [True, False, False, False, True, True]
+    assert 'NotebookFormatError' in results[1].message
+    assert 'FileNotFoundError' in results[2].message
+    assert results[3].target is None
+
+
+def test_pipeline_matches_convert_file(files, tmp_path):
+    notebook, marimo = files[0], files[4]
+    outputs = [tmp_path / 'vectors.py', tmp_path / 'app.ipynb']
+    assert all(r.ok for r in convert_pipelined([notebook, marimo], 1))
+    pipelined = [path.read_text() for path in outputs]
+    assert convert_file(notebook).ok and convert_file(marimo).ok
+    assert pipelined == [path.read_text() for path in outputs]
+
+
+def test_cli_pipeline(files, capsys):
+    assert main([files[0], files[5], '--pipeline', '-j', '1']) == 0
+    out = capsys.readouterr().out
+    assert f'Tidied notebook: {files[0]}' in out
+    assert '2 converted, 0 failed.' in out
+
+    with pytest.raises(SystemExit):
+        main([files[0], '--pipeline', '--to', 'percent'])
+
+
+def test_pipeline_converters_do_not_print(tmp_path, capsys):
+    # A worker thread must never swap sys.stdout, so the converters are
+    # told to stay quiet instead.
+    (tmp_path / 'bad.py').write_text('def (:\n')
+    results = list(convert_pipelined([str(tmp_path / 'bad.py')], 1))
+    assert results[0].ok
+    assert capsys.readouterr().out == ''
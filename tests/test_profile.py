@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+
+from jupyter_to_marimo import convert_jupyter_to_marimo
+from marimo_to_jupyter import convert_marimo_to_jupyter
+from tidy_nb.cli import main
+from tidy_nb.profile import NULL_PROFILER, Profiler
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+
+def test_null_profiler_records_nothing():
+    cells = [{'cell_type': 'code'}]
+    assert NULL_PROFILER.cells(cells) is cells
+    with NULL_PROFILER.span('render'):
+        pass
+    assert not hasattr(NULL_PROFILER, 'events')
+
+
+def test_jupyter_to_marimo_phases_and_cells(tmp_path):
+    profiler = Profiler()
+    with profiler.span('convert', 'file', path='vectors.ipynb'):
+        assert convert_jupyter_to_marimo(
+            str(EXAMPLES / 'vectors.ipynb'), str(tmp_path / 'out.py'), profiler=profiler)
+
+    totals = profiler.phase_totals()
+    assert {'read', 'decode', 'analyze', 'render', 'write'} <= set(totals)
+    cells = [event for event in profiler.events if event[1] == 'cell']
+    assert len(cells) == 19
+    slowest = profiler.slowest_cells(3)
+    assert len(slowest) == 3
+    assert slowest[0][3] >= slowest[1][3] >= slowest[2][3]
+    summary = profiler.summary(3)
+    assert 'Slowest 3 cell(s):' in summary and 'analyze' in summary
+
+
+def test_marimo_to_jupyter_trace(tmp_path):
+    marimo = tmp_path / 'nb.py'
+    marimo.write_text('import marimo\napp = marimo.App()\n\n@app.cell\ndef _():\n    x = 1\n    return (x,)\n')
+    profiler = Profiler()
+    with profiler.span('convert', 'file', path=str(marimo)):
+        assert convert_marimo_to_jupyter(str(marimo), str(tmp_path / 'nb.ipynb'), profiler=profiler)
+
+    trace = tmp_path / 'trace.json'
+    profiler.write_trace(trace)
+    events = json.loads(trace.read_text())['traceEvents']
+    assert {event['name'] for event in events} >= {'convert', 'read', 'parse', 'cell', 'render', 'write'}
+    assert all(event['ph'] == 'X' and event['ts'] >= 0 for event in events)
+
+
+def test_cli_profile(tmp_path, capsys):
+    notebook = tmp_path / 'vectors.ipynb'
+    notebook.write_bytes((EXAMPLES / 'vectors.ipynb').read_bytes())
+    trace = tmp_path / 'trace.json'
+
+    assert main([str(notebook), '--no-cache', '--jobs', '1', '--profile', str(trace)]) == 0
+    out = capsys.readouterr().out
+    assert 'Profile:' in out and f'{notebook} cell' in out
+    events = json.loads(trace.read_text())['traceEvents']
+    assert any(event['cat'] == 'file' and event['args']['file'] == str(notebook) for event in events)
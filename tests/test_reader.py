@@ -0,0 +1,78 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from tidy_nb.reader import NotebookFormatError, iter_cells, iter_stream_cells
+
+
+def make_notebook(n_cells=3, payload=1000):
+    cells = []
+    for i in range(n_cells):
+        cells.append({
+            'cell_type': 'code',
+            'id': f'cell-{i}',
+            'metadata': {'tags': ['a"b', '\\']},
+            'source': [f'x{i} = "\\u00e9\\"{i}"\n', 'print(x)'],
+            'execution_count': i,
+            'outputs': [{'data': {'image/png': 'A' * payload}, 'note': 'esc\\"[{'}],
+            'attachments': {'img.png': {'image/png': 'B' * payload}},
+        })
+    cells.append({'cell_type': 'markdown', 'metadata': {}, 'source': '# Title'})
+    return {'metadata': {'kernelspec': {}}, 'cells': cells, 'nbformat': 4, 'nbformat_minor': 5}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_stream_matches_json_load(chunk_size):
+    notebook = make_notebook()
+    raw = json.dumps(notebook, indent=1).encode()
+    cells = list(iter_stream_cells(io.BytesIO(raw), chunk_size=chunk_size))
+    expected = [
+        {k: v for k, v in cell.items() if k not in ('outputs', 'attachments')}
+        for cell in notebook['cells']
+    ]
+    assert cells == expected
+
+
+def test_skip_can_be_overridden():
+    raw = json.dumps(make_notebook(1, payload=3)).encode()
+    cell = next(iter_stream_cells(io.BytesIO(raw), skip=frozenset()))
+    assert cell['outputs'][0]['data']['image/png'] == 'AAA'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 64 * 1024])
+def test_measure_skipped_values(chunk_size):
+    notebook = make_notebook(2, payload=10)
+    raw = json.dumps(notebook).encode()
+    cells = list(iter_stream_cells(io.BytesIO(raw), chunk_size=chunk_size, measure=True))
+    assert [(cell['outputs'], cell['attachments']) for cell in cells[:2]] == [
+        (len(json.dumps(original['outputs'])), len(json.dumps(original['attachments'])))
+        for original in notebook['cells'][:2]
+    ]
+    assert 'outputs' not in cells[2]
+
+
+def test_large_outputs_are_not_buffered(tmp_path):
+    path = tmp_path / 'big.ipynb'
+    path.write_text(json.dumps(make_notebook(2, payload=2_000_000)))
+    tracemalloc.start()
+    try:
+        cells = list(iter_cells(path, chunk_size=4096))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert [cell.get('id') for cell in cells] == ['cell-0', 'cell-1', None]
+    # 8 MB of outputs are skipped while holding only one chunk at a time.
+    assert peak < 256 * 1024
+
+
+def test_missing_cells_key():
+    with pytest.raises(NotebookFormatError):
+        list(iter_stream_cells(io.BytesIO(b'{"metadata": {}}')))
+
+
+def test_truncated_file():
+    raw = json.dumps(make_notebook(2)).encode()[:-40]
+    with pytest.raises(NotebookFormatError):
+        list(iter_stream_cells(io.BytesIO(raw)))
@@ -0,0 +1,126 @@
+import asyncio
+import io
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+from jupyter_to_marimo import write_marimo_notebook
+from tidy_nb.cli import main
+from tidy_nb.reader import iter_cells
+from tidy_nb.server import (
+    Item, ServerError, UntrustedSocketError, _private_dir, default_socket_path, is_running,
+    request, serve,
+)
+
+EXAMPLES = Path(__file__).resolve().parent.parent / 'examples'
+
+
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / 's.sock')
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    task = loop.create_task(serve(socket_path, ready=started.set))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield socket_path
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(10)
+
+
+def test_batch_request(server):
+    notebook = (EXAMPLES / 'vectors.ipynb').read_bytes()
+    marimo = (EXAMPLES / 'marimo' / 'untitled.py').read_bytes()
+    results = request([
+        Item('jupyter_to_marimo', notebook),
+        Item('marimo_to_jupyter', marimo, compact=True),
+        Item('jupyter_to_marimo', b'{"no": "cells"}'),
+        Item('sideways', b''),
+    ], server)
+
+    expected = io.StringIO()
+    write_marimo_notebook(iter_cells(EXAMPLES / 'vectors.ipynb'), expected)
+    assert results[0] == expected.getvalue().encode()
+    assert results[1].startswith(b'{"cells":[')
+    assert isinstance(results[2], ServerError)
+    assert isinstance(results[3], ServerError)
+
+
+def test_client_uses_server(server, tmp_path, capsys):
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'v.ipynb')
+    assert is_running(server)
+    assert main(['client', str(tmp_path / 'v.ipynb'), '--socket', server]) == 0
+    assert (tmp_path / 'v.py').read_text().startswith('import marimo')
+    assert 'Tidied notebook' in capsys.readouterr().out
+
+
+def test_client_falls_back_without_server(tmp_path, capsys):
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'v.ipynb')
+    socket_path = str(tmp_path / 'missing.sock')
+    assert not is_running(socket_path)
+    assert main(['client', str(tmp_path / 'v.ipynb'), str(tmp_path / 'x.txt'),
+                 '--socket', socket_path]) == 1
+    out = capsys.readouterr().out
+    assert f"Failed notebook: {tmp_path / 'x.txt'}" in out
+    assert (tmp_path / 'v.py').exists()
+
+
+@pytest.mark.parametrize('uid, name', [(0, 'tidy_nb-0'), (None, 'tidy_nb-default')])
+def test_default_socket_directory_names_the_user(tmp_path, monkeypatch, uid, name):
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    monkeypatch.setattr('tidy_nb.server._uid', lambda: uid)
+    assert default_socket_path() == str(tmp_path / name / 'tidy_nb.sock')
+
+
+def test_default_socket_is_private(tmp_path, monkeypatch):
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    directory = os.path.dirname(default_socket_path())
+    assert os.path.dirname(directory) == str(tmp_path)
+    _private_dir(directory)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+    # A directory someone else could have prepared is refused
+    os.chmod(directory, 0o755)
+    with pytest.raises(UntrustedSocketError, match='0700'):
+        _private_dir(directory)
+
+
+def test_client_refuses_another_users_server(server, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr('tidy_nb.server._uid', lambda: os.getuid() + 1)
+    with pytest.raises(UntrustedSocketError):
+        request([Item('jupyter_to_marimo', b'{}')], server)
+
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'v.ipynb')
+    assert main(['client', str(tmp_path / 'v.ipynb'), '--socket', server]) == 0
+    assert 'another user' in capsys.readouterr().err
+    assert (tmp_path / 'v.py').exists()  # Converted here instead
+
+
+def test_client_reports_a_stuck_server(tmp_path, capsys):
+    socket_path = str(tmp_path / 'stuck.sock')
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'v.ipynb')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(socket_path)
+        listener.listen()  # Connections queue up but are never answered
+        assert main(['client', str(tmp_path / 'v.ipynb'), '--socket', socket_path,
+                     '--timeout', '0.2']) == 1
+    assert 'did not answer in time' in capsys.readouterr().out
+    assert not (tmp_path / 'v.py').exists()
@@ -0,0 +1,57 @@
+"""Startup cost of the CLI, measured with ``python -X importtime``."""
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parent.parent / 'src'
+EXAMPLES = SRC.parent / 'examples'
+
+# Milliseconds of imports allowed beyond interpreter startup. Generous for
+# slow CI machines; override with TIDY_NB_IMPORT_BUDGET_MS.
+BUDGET_MS = float(os.environ.get('TIDY_NB_IMPORT_BUDGET_MS', 150))
+
+HEAVY_MODULES = {'nbconvert', 'nbformat', 'marimo', 'jupytext', 'nbstripout',
+                 'jupyter_client', 'ipykernel', 'jsonschema', 'sqlite3'}
+
+
+def import_times(*args):
+    """Run the CLI; return every imported module and the cost in ms of ours."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'tidy_nb', *args],
+        capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=str(SRC)),
+    )
+    assert proc.returncode == 0, proc.stderr
+    modules = set()
+    total_us = 0
+    started = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip().split('.')[0])
+        # Everything before our package is interpreter startup.
+        started = started or name.strip() == 'tidy_nb'
+        top_level = not name.startswith('  ')  # nested ones count in their parent
+        if started and top_level:
+            total_us += int(cumulative)
+    return modules, total_us / 1000
+
+
+@pytest.mark.parametrize('args', [['--version'], ['--help'], ['watch', '--help']])
+def test_informational_commands_are_fast(args):
+    modules, ms = import_times(*args)
+    assert not modules & HEAVY_MODULES
+    assert ms < BUDGET_MS, f'imports took {ms:.1f} ms'
+
+
+def test_plain_conversion_is_fast(tmp_path):
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'v.ipynb')
+    modules, ms = import_times(str(tmp_path / 'v.ipynb'), '--no-cache')
+    assert not modules & HEAVY_MODULES
+    assert 'multiprocessing' not in modules
+    assert ms < BUDGET_MS, f'imports took {ms:.1f} ms'
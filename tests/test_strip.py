@@ -0,0 +1,133 @@
+import io
+import json
+import os
+
+import pytest
+
+from tidy_nb.cli import main
+from tidy_nb.strip import StripOptions, apply_edits, parse_extra_keys, strip_edits, strip_file
+
+
+def make_notebook(cells, metadata=None):
+    return {
+        'cells': cells,
+        'metadata': metadata if metadata is not None else {'kernelspec': {'name': 'python3'}},
+        'nbformat': 4,
+        'nbformat_minor': 5,
+    }
+
+
+def code_cell(source='x = 1', count=3, outputs=None, metadata=None):
+    return {
+        'cell_type': 'code',
+        'execution_count': count,
+        'metadata': metadata if metadata is not None else {},
+        'outputs': outputs if outputs is not None else [
+            {'output_type': 'stream', 'name': 'stdout', 'text': ['big é "output"\n']},
+        ],
+        'source': [source],
+    }
+
+
+def strip_bytes(data: bytes, options=StripOptions()) -> bytes:
+    src = io.BytesIO(data)
+    dst = io.BytesIO()
+    apply_edits(src, dst, strip_edits(src, options))
+    return dst.getvalue()
+
+
+@pytest.mark.parametrize('indent', [None, 1, 2])
+def test_strip_matches_decoded_result(indent):
+    notebook = make_notebook(
+        [
+            code_cell(metadata={'collapsed': False, 'tags': ['a'], 'scrolled': True}),
+            code_cell(metadata={'tags': ['b'], 'ExecuteTime': {'start': 1}}),
+            code_cell(metadata={'hidden': True, 'execution': {}}),
+            {'cell_type': 'markdown', 'metadata': {'collapsed': True}, 'source': ['# Hi']},
+        ],
+        metadata={'widgets': {'state': {}}, 'kernelspec': {'name': 'python3'}, 'signature': 'x'},
+    )
+    data = json.dumps(notebook, indent=indent, ensure_ascii=False).encode()
+
+    stripped = json.loads(strip_bytes(data))
+
+    assert stripped['metadata'] == {'kernelspec': {'name': 'python3'}}
+    assert [cell['metadata'] for cell in stripped['cells']] == [{'tags': ['a']}, {'tags': ['b']}, {}, {}]
+    for cell in stripped['cells'][:3]:
+        assert cell['outputs'] == []
+        assert cell['execution_count'] is None
+
+
+def test_untouched_bytes_are_copied_verbatim():
+    data = json.dumps(make_notebook([code_cell(source='s = "café"')]), indent=1).encode()
+    stripped = strip_bytes(data)
+    # Non-ASCII escapes in the source are left exactly as they were
+    assert b'"s = \\"caf\\u00e9\\""' in stripped
+    assert strip_bytes(stripped) == stripped
+
+
+def test_keep_output_metadata_and_options():
+    notebook = make_notebook([
+        code_cell(metadata={'keep_output': True}),
+        code_cell(),
+    ])
+    data = json.dumps(notebook, indent=1).encode()
+
+    cells = json.loads(strip_bytes(data))['cells']
+    assert cells[0]['outputs'] and cells[0]['execution_count'] is None
+    assert cells[1]['outputs'] == []
+
+    cells = json.loads(strip_bytes(data, StripOptions(keep_count=True)))['cells']
+    assert cells[1]['outputs'] == [] and cells[1]['execution_count'] == 3
+
+
+@pytest.mark.parametrize('indent', [None, 1])
+def test_kept_outputs_lose_their_counts(indent):
+    result = {'output_type': 'execute_result', 'execution_count': 3, 'metadata': {},
+              'data': {'text/plain': ['1']}}
+    stream = {'output_type': 'stream', 'name': 'stdout', 'text': ['x\n']}
+    notebook = make_notebook([code_cell(outputs=[stream, result, {}, []])])
+    data = json.dumps(notebook, indent=indent).encode()
+
+    cell = json.loads(strip_bytes(data, StripOptions(keep_output=True)))['cells'][0]
+    assert cell['execution_count'] is None
+    assert cell['outputs'] == [stream, {**result, 'execution_count': None}, {}, []]
+
+    cell = json.loads(strip_bytes(data, StripOptions(keep_output=True, keep_count=True)))['cells'][0]
+    assert cell == notebook['cells'][0]
+
+
+def test_extra_keys():
+    options = parse_extra_keys(['metadata.kernelspec', 'cell.metadata.tags'])
+    notebook = make_notebook([code_cell(metadata={'tags': ['a']})])
+    stripped = json.loads(strip_bytes(json.dumps(notebook).encode(), options))
+    assert stripped['metadata'] == {}
+    assert stripped['cells'][0]['metadata'] == {}
+    with pytest.raises(ValueError):
+        parse_extra_keys(['cells.outputs'])
+
+
+def test_clean_notebook_is_not_written(tmp_path):
+    path = tmp_path / 'clean.ipynb'
+    path.write_text(json.dumps(make_notebook([code_cell(count=None, outputs=[])]), indent=1))
+    before = os.stat(path)
+    assert not strip_file(path)
+    after = os.stat(path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_strip_command(tmp_path, capsys):
+    (tmp_path / 'sub').mkdir()
+    dirty = tmp_path / 'sub' / 'dirty.ipynb'
+    dirty.write_text(json.dumps(make_notebook([code_cell()]), indent=1))
+    clean = tmp_path / 'clean.ipynb'
+    clean.write_text(json.dumps(make_notebook([code_cell(count=None, outputs=[])]), indent=1))
+    broken = tmp_path / 'broken.ipynb'
+    broken.write_text('{"nbformat": 4}')
+
+    assert main(['strip', str(tmp_path), '--jobs', '2']) == 1
+    out = capsys.readouterr().out
+    assert f'Stripped notebook: {dirty}' in out
+    assert f'Failed notebook: {broken}' in out
+    assert '1 stripped, 1 unchanged, 1 failed.' in out
+    assert json.loads(dirty.read_text())['cells'][0]['outputs'] == []
@@ -0,0 +1,129 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tidy_nb.cli import main
+from tidy_nb.transforms import (
+    DEFAULT_PASSES, DedupeImports, DropEmptyCells, NormalizeSource, Pass, Pipeline, Renumber,
+    StripOutputs, parse_passes,
+)
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+
+def code(source, count=None, outputs=()):
+    return {'cell_type': 'code', 'execution_count': count, 'metadata': {},
+            'outputs': list(outputs), 'source': source}
+
+
+def run(passes, cells):
+    return list(Pipeline(passes).run([dict(cell) for cell in cells], {}))
+
+
+def test_passes():
+    result = {'data': {}, 'execution_count': 7, 'metadata': {}, 'output_type': 'execute_result'}
+    cells = [
+        code('import os\nimport numpy as np\n', count=3),
+        {'cell_type': 'markdown', 'metadata': {}, 'source': [' \n']},
+        code(['import os\n', 'x = 1; import sys\n', 'import sys\n', 'import numpy as np'],
+             count=7, outputs=[result]),
+        code('%matplotlib inline\nimport os'),
+    ]
+    assert run([DropEmptyCells(), NormalizeSource(), DedupeImports(), Renumber()], cells) == [
+        code(['import os\n', 'import numpy as np\n'], count=1),
+        code(['x = 1; import sys\n', 'import sys\n'], count=2,
+             outputs=[dict(result, execution_count=2)]),
+        code(['%matplotlib inline\n', 'import os']),
+    ]
+    assert run([StripOutputs()], cells)[2]['outputs'] == []
+
+
+def test_declarations_decide_what_is_decoded():
+    assert Pipeline([StripOutputs(), Renumber()]).skip == {'outputs'}
+    assert Pipeline([Renumber(), StripOutputs()]).skip == frozenset()
+    assert Pipeline([DropEmptyCells(), DedupeImports()]).skip == frozenset()
+
+
+def test_single_walk():
+    seen = []
+
+    class Record(Pass):
+        def __init__(self, name):
+            self.name = name
+
+        def cell(self, cell):
+            seen.append((self.name, cell['source']))
+            return cell
+
+    cells = [code('a'), code(''), code('b')]
+    run([Record('first'), DropEmptyCells(), Record('second')], cells)
+    assert seen == [('first', 'a'), ('second', 'a'), ('first', ''), ('first', 'b'),
+                    ('second', 'b')]
+
+
+def test_tidy_file(tmp_path):
+    path = tmp_path / 'vectors.ipynb'
+    shutil.copy(EXAMPLES / 'vectors.ipynb', path)
+    # Nothing to do: the nbformat layout is reproduced byte for byte
+    result = Pipeline([]).tidy_file(path)
+    assert not result.changed
+    assert path.read_bytes() == (EXAMPLES / 'vectors.ipynb').read_bytes()
+
+    result = Pipeline.from_names(['strip-outputs', 'renumber']).tidy_file(path)
+    assert result.changed and result.error is None
+    assert set(result.timings) == {'strip-outputs', 'renumber', 'read/write'}
+    notebook = json.loads(path.read_text())
+    counts = [cell['execution_count'] for cell in notebook['cells']
+              if cell.get('execution_count') is not None]
+    assert counts == list(range(1, len(counts) + 1))
+    assert all(cell.get('outputs', []) == [] for cell in notebook['cells'])
+
+    (tmp_path / 'broken.ipynb').write_text('{"cells": [')
+    assert Pipeline([]).tidy_file(tmp_path / 'broken.ipynb').error
+    assert (tmp_path / 'broken.ipynb').read_text() == '{"cells": ['
+
+
+def test_parse_passes():
+    assert parse_passes('renumber, drop-empty,renumber') == ('renumber', 'drop-empty')
+    with pytest.raises(ValueError, match='bogus'):
+        parse_passes('renumber,bogus')
+
+
+def test_tidy_command(tmp_path, capsys):
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'vectors.ipynb')
+    shutil.copy(EXAMPLES / 'Untitled.ipynb', tmp_path / 'untitled.ipynb')
+    assert main(['tidy', str(tmp_path), '--passes', 'drop-empty', '-j', '1', '--timings']) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert out[:3] == [f"Tidied notebook: {tmp_path / 'untitled.ipynb'}",
+                       f"Tidied notebook: {tmp_path / 'vectors.ipynb'}",
+                       '2 tidied, 0 unchanged, 0 failed.']
+    assert [line.split()[0] for line in out[3:]] == ['drop-empty', 'read/write']
+
+    assert main(['tidy', str(tmp_path), '-j', '2']) == 0
+    assert '1 tidied, 1 unchanged, 0 failed.' in capsys.readouterr().out
+    assert main(['tidy', str(tmp_path), '-j', '2']) == 0
+    assert '0 tidied, 2 unchanged, 0 failed.' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('separator', ['\x0c', '\x1e', '\x85', ' '])
+def test_dedupe_imports_counts_lines_like_ast(separator):
+    # Characters str.splitlines breaks on but Python does not
+    cells = [code('import os\n'),
+             code(f's = "a{separator}b"  # c{separator}d\n\x0c\nimport os\nprint(s)')]
+    assert run([DedupeImports()], cells)[1]['source'] == (
+        f's = "a{separator}b"  # c{separator}d\n\x0c\nprint(s)')
+
+
+def test_default_passes_finish_in_one_run(tmp_path):
+    path = tmp_path / 'nb.ipynb'
+    cells = [code('import os\nx = 1', count=1), code('import os\n', count=2),
+             code('y = x\nimport os', count=3)]
+    path.write_text(json.dumps({'cells': cells, 'metadata': {}, 'nbformat': 4,
+                                'nbformat_minor': 5}))
+    assert Pipeline.from_names(DEFAULT_PASSES).tidy_file(path).changed
+    cells = json.loads(path.read_text())['cells']
+    assert [cell['source'] for cell in cells] == [['import os\n', 'x = 1'], ['y = x\n']]
+    assert [cell['execution_count'] for cell in cells] == [1, 2]
+    assert not Pipeline.from_names(DEFAULT_PASSES).tidy_file(path).changed
@@ -0,0 +1,89 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tidy_nb.cli import main
+from tidy_nb.validate import validate_file, validate_full, validate_notebook
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+
+def validate(notebook):
+    return [str(error) for error in validate_notebook(notebook)]
+
+
+def notebook(*cells, minor=5):
+    return {'cells': list(cells), 'metadata': {}, 'nbformat': 4, 'nbformat_minor': minor}
+
+
+def code(id='a', **fields):
+    return {'cell_type': 'code', 'execution_count': None, 'id': id, 'metadata': {},
+            'outputs': [], 'source': 'x = 1', **fields}
+
+
+@pytest.mark.parametrize('name', ['vectors.ipynb', 'Untitled.ipynb'])
+def test_examples_are_valid(name):
+    assert validate_file(EXAMPLES / name) == []
+
+
+def test_reports_every_error_with_its_path():
+    errors = validate(notebook(
+        code(source=3),
+        code(id='a', execution_count=-1),
+        {'cell_type': 'markdown', 'metadata': {}, 'source': [], 'outputs': []},
+        {'cell_type': 'heading', 'source': ''},
+        code(id='b', outputs=[{'output_type': 'stream', 'name': 'stdout'},
+                              {'output_type': 'display', 'data': {}}]),
+    ))
+    assert errors == [
+        '$.cells[0].source: expected a string or a list of strings',
+        "$.cells[1].id: duplicate id 'a', first used by $.cells[0]",
+        '$.cells[1].execution_count: expected a non-negative integer or null',
+        "$.cells[2]: missing required key 'id'",
+        '$.cells[2].outputs: unexpected key',
+        "$.cells[3].cell_type: unknown cell type 'heading'",
+        "$.cells[4].outputs[0]: missing required key 'text'",
+        "$.cells[4].outputs[1].output_type: unknown output type 'display'",
+    ]
+
+
+def test_top_level_and_ids_by_minor_version():
+    assert validate({'cells': [code()], 'nbformat': 3, 'extra': 1}) == [
+        "$: missing required key 'metadata'",
+        "$: missing required key 'nbformat_minor'",
+        '$.extra: unexpected key',
+        '$.nbformat: expected 4, found 3',
+        '$.cells[0].id: unexpected key',
+    ]
+    assert validate(notebook(code(), minor=4)) == [
+        '$.cells[0].id: unexpected key',
+    ]
+    assert validate([]) == ['$: expected an object']
+
+
+def test_invalid_json(tmp_path):
+    (tmp_path / 'broken.ipynb').write_text('{"cells": [')
+    [error] = validate_file(tmp_path / 'broken.ipynb')
+    assert error.path == '$' and error.message.startswith('Invalid JSON:')
+
+
+def test_full_validation_agrees():
+    pytest.importorskip('nbformat')
+    assert validate_full(EXAMPLES / 'vectors.ipynb') == []
+
+
+def test_validate_command(tmp_path, capsys):
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'good.ipynb')
+    (tmp_path / 'bad.ipynb').write_text(json.dumps(notebook(code(source=None))))
+    assert main(['validate', str(tmp_path), '-j', '1']) == 1
+    out = capsys.readouterr().out
+    assert f"Invalid notebook: {tmp_path / 'bad.ipynb'}\n  $.cells[0].source:" in out
+    assert '1 valid, 1 invalid.' in out
+
+    assert main([str(tmp_path), '--validate', '-j', '1', '--no-cache']) == 1
+    out = capsys.readouterr().out
+    assert f"Tidied notebook: {tmp_path / 'good.ipynb'}" in out
+    assert 'Error: Invalid notebook.\n  $.cells[0].source:' in out
+    assert not (tmp_path / 'bad.py').exists()
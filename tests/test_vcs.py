@@ -0,0 +1,85 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from tidy_nb.cli import main
+from tidy_nb.vcs import GitError, changed_notebooks, convert_since, parse_revisions, read_blobs
+
+EXAMPLES = Path(__file__).parent.parent / 'examples'
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+
+
+def git(repo, *args):
+    subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+        cwd=repo, check=True, capture_output=True,
+    )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, 'init', '-q')
+    (tmp_path / 'old.ipynb').write_text('{"cells": []}')
+    (tmp_path / 'gone.ipynb').write_text('{"cells": []}')
+    git(tmp_path, 'add', '.')
+    git(tmp_path, 'commit', '-q', '-m', 'base')
+    git(tmp_path, 'tag', 'base')
+
+    (tmp_path / 'sub').mkdir()
+    shutil.copy(EXAMPLES / 'vectors.ipynb', tmp_path / 'sub' / 'vectors.ipynb')
+    (tmp_path / 'bad.ipynb').write_text('{"cells": [')
+    (tmp_path / 'notes.py').write_text('x = 1\n')
+    (tmp_path / 'gone.ipynb').unlink()
+    git(tmp_path, 'add', '-A')
+    git(tmp_path, 'commit', '-q', '-m', 'change')
+    return tmp_path
+
+
+def test_parse_revisions():
+    assert parse_revisions('main') == ('main..HEAD', 'HEAD')
+    assert parse_revisions('a..b') == ('a..b', 'b')
+    assert parse_revisions('a...b') == ('a...b', 'b')
+    with pytest.raises(ValueError):
+        parse_revisions('a..')
+
+
+def test_changed_notebooks(repo):
+    assert changed_notebooks('base', cwd=str(repo)) == (['bad.ipynb', 'sub/vectors.ipynb'], 'HEAD')
+    assert changed_notebooks('base', ['sub'], cwd=str(repo))[0] == ['sub/vectors.ipynb']
+    assert changed_notebooks('base', cwd=str(repo / 'sub'))[0] == ['vectors.ipynb']
+    with pytest.raises(GitError):
+        changed_notebooks('no-such-rev', cwd=str(repo))
+
+
+def test_read_blobs_uses_the_revision(repo):
+    (repo / 'old.ipynb').write_text('changed in the working tree')
+    blobs = dict(read_blobs('base', ['old.ipynb', 'sub/vectors.ipynb'], cwd=str(repo)))
+    assert blobs == {'old.ipynb': b'{"cells": []}', 'sub/vectors.ipynb': None}
+
+
+def test_convert_since(repo):
+    results = list(convert_since('base', jobs=1, cwd=str(repo)))
+    assert [(Path(r.source).relative_to(repo).as_posix(), r.ok) for r in results] == [
+        ('bad.ipynb', False),
+        ('sub/vectors.ipynb', True),
+    ]
+    assert '@app.cell' in (repo / 'sub' / 'vectors.py').read_text()
+    assert not (repo / 'old.py').exists()
+
+
+def test_cli_since(repo, capsys, monkeypatch):
+    monkeypatch.chdir(repo)
+    assert main(['--since', 'base', 'sub']) == 0
+    out = capsys.readouterr().out
+    assert 'Tidied notebook: sub/vectors.ipynb -> sub/vectors.py' in out
+    assert '1 converted, 0 failed.' in out
+
+    assert main(['--since', 'no-such-rev']) == 1
+    with pytest.raises(SystemExit):
+        main(['--since', 'base', '--to', 'percent'])
+    with pytest.raises(SystemExit):
+        main(['--since', 'base', '--execute'])
+    assert '--execute' in capsys.readouterr().err
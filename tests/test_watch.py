@@ -0,0 +1,139 @@
+import json
+import os
+
+from tidy_nb.watch import Watcher, patch_notebook
+
+
+def write_notebook(path, cells):
+    path.write_text(json.dumps({'cells': cells, 'metadata': {'kernelspec': {'name': 'k'}},
+                                'nbformat': 4, 'nbformat_minor': 5}))
+
+
+def code_cell(source, outputs=()):
+    return {'cell_type': 'code', 'execution_count': 1, 'metadata': {},
+            'outputs': list(outputs), 'source': source}
+
+
+def touch(path, text):
+    path.write_text(text)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_poll_debounces_changes(tmp_path):
+    nb = tmp_path / 'nb.ipynb'
+    write_notebook(nb, [])
+    watcher = Watcher(tmp_path, debounce=1.0)
+    assert watcher.poll(now=0) == []
+
+    touch(nb, '{"cells": []}')
+    assert watcher.poll(now=10) == []    # seen, not yet settled
+    touch(nb, '{"cells": [] }')
+    assert watcher.poll(now=10.5) == []  # changed again, timer restarts
+    assert watcher.poll(now=11.6) == [str(nb)]
+    assert watcher.poll(now=20) == []
+
+
+def test_sync_notebook_to_marimo_and_back(tmp_path):
+    nb = tmp_path / 'nb.ipynb'
+    py = tmp_path / 'nb.py'
+    write_notebook(nb, [code_cell(['x = 1']), code_cell(['y = 2'])])
+    py.write_text('@app.cell\ndef _():\n    return\n')
+    watcher = Watcher(tmp_path, debounce=0)
+
+    assert watcher.sync(str(nb)) == str(py)
+    assert 'def cell_2():\n    y = 2\n    return y' in py.read_text()
+    assert watcher.poll() == []  # our own write is not an edit
+
+    touch(py, py.read_text().replace('x = 1', 'x = 10'))
+    assert watcher.poll() == [str(py)]
+    assert watcher.sync(str(py)) == str(nb)
+    notebook = json.loads(nb.read_text())
+    assert [cell['source'] for cell in notebook['cells']] == [['x = 10', 'x'], ['y = 2', 'y']]
+    assert notebook['metadata'] == {'kernelspec': {'name': 'k'}}
+    assert watcher.sync(str(py)) is None  # nothing left to write
+
+    # Outputs of cells whose source did not change survive the next edit.
+    notebook['cells'][1]['outputs'] = [{'output_type': 'stream'}]
+    nb.write_text(json.dumps(notebook))
+    touch(py, py.read_text().replace('x = 10', 'x = 11'))
+    assert watcher.sync(str(py)) == str(nb)
+    cells = json.loads(nb.read_text())['cells']
+    assert cells[0]['source'] == ['x = 11', 'x']
+    assert cells[1]['outputs'] == [{'output_type': 'stream'}]
+
+
+def test_synced_notebook_keeps_nbformat_layout(tmp_path):
+    nb = tmp_path / 'nb.ipynb'
+    py = tmp_path / 'nb.py'
+    notebook = {'cells': [code_cell(['x = 1\n', 'x']), code_cell(['y = 2\n', 'y'])],
+                'metadata': {'kernelspec': {'name': 'k'}}, 'nbformat': 4, 'nbformat_minor': 5}
+    nb.write_text(json.dumps(notebook, indent=1, sort_keys=True) + '\n')
+    py.write_text('@app.cell\ndef _():\n    x = 1\n    return x\n\n'
+                  '@app.cell\ndef _():\n    y = 3\n    return y\n')
+    watcher = Watcher(tmp_path, debounce=0)
+    assert watcher.sync(str(py)) == str(nb)
+    notebook['cells'][1] = json.loads(nb.read_text())['cells'][1]
+    assert notebook['cells'][1]['source'] == ['y = 3', 'y']
+    assert nb.read_text() == json.dumps(notebook, indent=1, sort_keys=True) + '\n'
+
+
+def test_unpaired_and_plain_python_are_ignored(tmp_path):
+    nb = tmp_path / 'nb.ipynb'
+    write_notebook(nb, [code_cell(['x = 1'])])
+    (tmp_path / 'nb.py').write_text('print("not marimo")\n')
+    (tmp_path / 'other.py').write_text('@app.cell\ndef _():\n    return\n')
+    watcher = Watcher(tmp_path)
+    assert watcher.sync(str(nb)) is None
+    assert watcher.sync(str(tmp_path / 'other.py')) is None
+    assert (tmp_path / 'nb.py').read_text() == 'print("not marimo")\n'
+
+
+def test_patch_notebook_keeps_metadata():
+    old = {'cells': [code_cell(['a\n', 'b'])], 'metadata': {'m': 1}, 'nbformat_minor': 5}
+    new = {'cells': [{'cell_type': 'code', 'source': ['a', 'b'], 'outputs': []}],
+           'metadata': {}, 'nbformat_minor': 4}
+    patched = patch_notebook(new, old)
+    assert patched['cells'][0] is old['cells'][0]
+    assert patched['metadata'] == {'m': 1}
+    assert patched['nbformat_minor'] == 5
+
+
+def test_pair_edited_on_both_sides_is_not_synced(tmp_path):
+    nb = tmp_path / 'nb.ipynb'
+    py = tmp_path / 'nb.py'
+    write_notebook(nb, [code_cell(['x = 1'])])
+    py.write_text('@app.cell\ndef _():\n    return\n')
+    reports = []
+    watcher = Watcher(tmp_path, interval=0, debounce=0, report=reports.append)
+    watcher.sync(str(nb))
+
+    write_notebook(nb, [code_cell(['x = 2'])])
+    touch(py, py.read_text().replace('x = 1', 'x = 3'))
+    watcher.run(cycles=1)
+    assert reports == [f'Not syncing {nb}: {py} changed too. '
+                       'Save the one to keep again to sync it.']
+    assert 'x = 3' in py.read_text()
+    assert json.loads(nb.read_text())['cells'][0]['source'] == ['x = 2']
+
+    # Saving one of them again syncs it over the other
+    touch(py, py.read_text())
+    watcher.run(cycles=1)
+    assert reports[1] == f'Synced {py} -> {nb}'
+    assert json.loads(nb.read_text())['cells'][0]['source'] == ['x = 3', 'x']
+
+
+def test_partner_still_settling_is_a_conflict(tmp_path):
+    nb = tmp_path / 'nb.ipynb'
+    py = tmp_path / 'nb.py'
+    write_notebook(nb, [code_cell(['x = 1'])])
+    py.write_text('@app.cell\ndef _():\n    return\n')
+    watcher = Watcher(tmp_path, debounce=1.0)
+    touch(nb, nb.read_text())
+    assert watcher.poll(now=0) == []
+    touch(py, py.read_text() + '\n')
+    assert watcher.poll(now=0.5) == []
+    ready = watcher.poll(now=1.2)
+    assert ready == [str(nb)]
+    assert watcher.conflict(str(nb), ready) == str(py)
+    assert watcher.poll(now=5) == []  # The marimo edit is not synced later either
@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import stat
+
+import pytest
+
+from marimo_to_jupyter import create_jupyter_notebook, write_jupyter_notebook
+from tidy_nb.writers import LineWriter, NotebookWriter, atomic_output
+
+CELLS = [
+    {'cell_type': 'code', 'source': 'x = "é\\n"\n{"a": [1, 2]}', 'metadata': {},
+     'execution_count': None, 'outputs': []},
+    {'cell_type': 'markdown', 'source': '', 'metadata': {'tags': ['a']}},
+]
+
+
+@pytest.mark.parametrize('cells', [CELLS, []])
+def test_streamed_notebook_matches_json_dump(cells):
+    stream = io.StringIO()
+    write_jupyter_notebook(cells, stream)
+    expected = json.dumps(create_jupyter_notebook(cells), indent=2, ensure_ascii=False)
+    assert stream.getvalue() == expected
+
+
+@pytest.mark.parametrize('cells', [CELLS, []])
+def test_compact_notebook(cells):
+    stream = io.StringIO()
+    write_jupyter_notebook(cells, stream, compact=True)
+    expected = json.dumps(create_jupyter_notebook(cells), separators=(',', ':'),
+                          ensure_ascii=False)
+    assert stream.getvalue() == expected
+
+
+def test_notebook_writer_fields_order():
+    stream = io.StringIO()
+    writer = NotebookWriter(stream)
+    writer.write_cell({'a': {}})
+    writer.close(metadata={}, nbformat=4)
+    assert list(json.loads(stream.getvalue())) == ['cells', 'metadata', 'nbformat']
+
+
+def test_line_writer_matches_join():
+    lines = ['a', '', 'b', '']
+    stream = io.StringIO()
+    LineWriter(stream).write_lines(lines)
+    assert stream.getvalue() == '\n'.join(lines)
+
+
+def test_atomic_output_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with atomic_output(path) as f:
+            f.write('partial')
+            raise RuntimeError
+    assert path.read_text() == 'old'
+    assert list(tmp_path.iterdir()) == [path]
+
+    with atomic_output(path) as f:
+        f.write('new')
+    assert path.read_text() == 'new'
+
+
+def test_atomic_output_leaves_identical_file_alone(tmp_path):
+    path = tmp_path / 'out.txt'
+    path.write_text('same')
+    before = path.stat()
+    with atomic_output(path) as f:
+        f.write('same')
+    after = path.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert list(tmp_path.iterdir()) == [path]
+
+    with atomic_output(path) as f:
+        f.write('sane')
+    assert path.read_text() == 'sane'
+    assert path.stat().st_ino != before.st_ino
+
+
+def test_nbformat_layout():
+    stream = io.StringIO()
+    writer = NotebookWriter(stream, indent=1, sort_keys=True)
+    for cell in CELLS:
+        writer.write_cell(cell)
+    writer.close(metadata={'b': 1, 'a': [1]}, nbformat=4)
+    notebook = {'cells': CELLS, 'metadata': {'b': 1, 'a': [1]}, 'nbformat': 4}
+    assert stream.getvalue() == json.dumps(notebook, indent=1, sort_keys=True,
+                                           ensure_ascii=False)
+
+
+def test_atomic_output_modes(tmp_path):
+    umask = os.umask(0o027)
+    try:
+        with atomic_output(tmp_path / 'new.txt') as f:
+            f.write('new')
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE((tmp_path / 'new.txt').stat().st_mode) == 0o640
+
+    os.chmod(tmp_path / 'new.txt', 0o604)
+    with atomic_output(tmp_path / 'new.txt') as f:
+        f.write('changed')
+    assert stat.S_IMODE((tmp_path / 'new.txt').stat().st_mode) == 0o604
+    assert os.listdir(tmp_path) == ['new.txt']